@@ -0,0 +1,267 @@
+"""profile_store.py
+
+Streamed radial profile store shared by all stars of a scan.
+
+The integrators push every accepted solver step of a star into a StarWriter while the
+integration proceeds (sfst_qfis_repro.profile_sink / $SFST_PROFILE_STORE); the rows go to disk
+in chunks, so no profile has to be held as a Python list, pickled back from a worker or written
+as CSV. A store is a directory
+
+    <name>.profiles/
+        seg-<host>-<pid>-<tid>-<tag>.npy  appendable 1-D structured .npy (PROFILE_DTYPE), one
+                                     writer thread per segment, so segments need no locking
+        stars.jsonl                  one line per finished star: id, segment, row extents, the
+                                     star's parameters and observables (appended under flock)
+
+Readers memory-map the segments (np.load(mmap_mode="r")): a star's profile is a view of its
+rows, not a parsed copy. A segment's .npy header is rewritten with the current row count
+before a star is indexed, so every indexed star lies inside the mapped shape.
+
+    python profile_store.py ls outputs/profiles/scan.profiles
+    python profile_store.py export outputs/profiles/scan.profiles <star> tov_profile.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import socket
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Geometrized units as in LazyProfile (r, m in cm; P, eps in cm^-2), plus the Hinderer y and the
+# inertial-only vacuum increment that epsratio(r) is built from.
+PROFILE_FIELDS = ("r", "m", "P_geom", "y_tidal", "eps_grav", "eps_vac_inertial", "W_prof")
+PROFILE_DTYPE = np.dtype([(f, "<f8") for f in PROFILE_FIELDS])
+CHUNK_ROWS = 4096  # rows a StarWriter buffers before it appends them to its segment
+INDEX_NAME = "stars.jsonl"
+
+_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def _npy_header(dtype: np.dtype, n: int, length: int = 0) -> bytes:
+    """.npy (v1.0) header for a 1-D array of n rows, space-padded to `length` bytes."""
+    d = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (n,)})
+    body = d.encode("latin1")
+    total = max(length, -(-(len(_MAGIC) + 2 + len(body) + 1) // 64) * 64)
+    body = body + b" " * (total - len(_MAGIC) - 2 - len(body) - 1) + b"\n"
+    return _MAGIC + len(body).to_bytes(2, "little") + body
+
+
+class _Segment:
+    """Append-only .npy file of one writer thread; the header reserves room for any row count."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Unbuffered: a forked worker must not inherit (and later flush) half-written rows.
+        self._f = open(path, "xb+", buffering=0)
+        self._header_len = len(_npy_header(PROFILE_DTYPE, 10**15))
+        self.rows = 0
+        self.stars = 0
+        self._f.write(_npy_header(PROFILE_DTYPE, 0, self._header_len))
+
+    def append(self, rows: np.ndarray) -> int:
+        self._f.seek(0, os.SEEK_END)
+        self._f.write(np.ascontiguousarray(rows, dtype=PROFILE_DTYPE).tobytes())
+        offset, self.rows = self.rows, self.rows + len(rows)
+        return offset
+
+    def publish(self) -> None:
+        self._f.seek(0)
+        self._f.write(_npy_header(PROFILE_DTYPE, self.rows, self._header_len))
+
+
+class StarWriter:
+    """Streams the accepted steps of one star into its store.
+
+    derive(t, Y) maps a chunk of raw solver samples (t of shape (k,), Y of shape (n_state, k)) to
+    {field: array}; missing PROFILE_FIELDS are stored as NaN. The newest sample is held back until
+    the next one arrives, so finish() can replace it (solve_ivp ends on the event point, not on the
+    last step).
+    """
+
+    def __init__(self, store: "ProfileStore", meta: Dict[str, Any], derive: Callable):
+        self.store, self.meta, self.derive = store, meta, derive
+        self._seg = store._segment()
+        self._t: List[float] = []
+        self._y: List[np.ndarray] = []
+        self._extents: List[List[int]] = []
+        self.rows = 0
+
+    def push(self, t: float, y) -> None:
+        self._t.append(float(t))
+        self._y.append(np.array(y, dtype=float))
+        if len(self._t) > CHUNK_ROWS:
+            self._flush(len(self._t) - 1)
+
+    def _flush(self, k: int) -> None:
+        if k <= 0:
+            return
+        t = np.asarray(self._t[:k])
+        cols = self.derive(t, np.stack(self._y[:k], axis=1))
+        rows = np.empty(k, dtype=PROFILE_DTYPE)
+        for f in PROFILE_FIELDS:
+            rows[f] = cols.get(f, np.nan)
+        offset = self._seg.append(rows)
+        if self._extents and self._extents[-1][0] + self._extents[-1][1] == offset:
+            self._extents[-1][1] += k  # contiguous with this star's previous chunk
+        else:
+            self._extents.append([offset, k])
+        self.rows += k
+        del self._t[:k], self._y[:k]
+
+    def finish(self, last: Optional[tuple] = None, **observables) -> str:
+        """Write the remaining samples (the held-back one replaced by `last`) and index the star."""
+        if last is not None and self._t:
+            self._t[-1], self._y[-1] = float(last[0]), np.array(last[1], dtype=float)
+        self._flush(len(self._t))
+        self._seg.publish()
+        star = f"{self._seg.path.stem}:{self._seg.stars}"
+        self._seg.stars += 1
+        self.store._index_star({"star": star, "segment": self._seg.path.name, "extents": self._extents,
+                                "rows": self.rows, **self.meta, **observables})
+        return star
+
+
+class ProfileStore:
+    """Directory store of streamed star profiles (see the module docstring).
+
+    mode "a" adds to an existing store (all stars of a scan share one), "w" starts it afresh.
+    """
+
+    def __init__(self, path: str | Path, mode: str = "a"):
+        self.path = Path(path)
+        if mode == "w" and self.path.exists():
+            shutil.rmtree(self.path)
+        elif mode not in ("a", "w", "r"):
+            raise ValueError(f"mode must be 'r', 'a' or 'w', not {mode!r}")
+        if mode == "r" and not self.path.is_dir():
+            raise FileNotFoundError(self.path)
+        self._segments: Dict[tuple, _Segment] = {}
+        self._maps: Dict[str, np.ndarray] = {}
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._tag = uuid.uuid4().hex[:8]  # segments of two store objects never collide
+
+    # --- writing -----------------------------------------------------------------------------
+
+    def star(self, meta: Dict[str, Any], derive: Callable) -> StarWriter:
+        return StarWriter(self, meta, derive)
+
+    def _segment(self) -> _Segment:
+        # Keyed by pid as well: a forked worker starts its own segment instead of the parent's.
+        key = (os.getpid(), threading.get_ident())
+        seg = self._segments.get(key)
+        if seg is None:
+            with self._lock:
+                self.path.mkdir(parents=True, exist_ok=True)
+                seg = _Segment(self.path / f"seg-{socket.gethostname()}-{key[0]}-{key[1]}-{self._tag}.npy")
+                self._segments[key] = seg
+        return seg
+
+    def _index_star(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, default=float) + "\n"
+        with open(self.path / INDEX_NAME, "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(line)
+        self._index = None
+
+    # --- reading -----------------------------------------------------------------------------
+
+    def _entries(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is None:
+            index: Dict[str, Dict[str, Any]] = {}
+            try:
+                with open(self.path / INDEX_NAME, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            e = json.loads(line)
+                        except ValueError:
+                            continue  # a line still being written
+                        index[e["star"]] = e
+            except FileNotFoundError:
+                pass
+            self._index = index
+        return self._index
+
+    def stars(self) -> pd.DataFrame:
+        """One row per indexed star: id, parameters and observables (no profile data)."""
+        rows = [{k: v for k, v in e.items() if k not in ("segment", "extents")} for e in self._entries().values()]
+        return pd.DataFrame(rows)
+
+    def profile(self, star: str) -> np.ndarray:
+        """The profile of one star as a structured array (a read-only memory map where it is one extent)."""
+        e = self._entries().get(star)
+        if e is None:
+            self._index = None
+            e = self._entries().get(star)
+            if e is None:
+                raise KeyError(f"{self.path}: no star {star!r}")
+        mm = self._maps.get(e["segment"])
+        need = max((o + n for o, n in e["extents"]), default=0)
+        if mm is None or len(mm) < need:
+            mm = np.load(self.path / e["segment"], mmap_mode="r")
+            self._maps[e["segment"]] = mm
+        parts = [mm[o:o + n] for o, n in e["extents"]]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=PROFILE_DTYPE)
+
+
+_OPEN: Dict[tuple, ProfileStore] = {}
+
+
+def open_store(path: str | Path) -> ProfileStore:
+    """The process's ProfileStore for `path` (mode "a"), so repeated opens share their segments."""
+    key = (os.getpid(), str(Path(path).resolve()))
+    if key not in _OPEN:
+        _OPEN[key] = ProfileStore(path)
+    return _OPEN[key]
+
+
+def tov_profile_frame(profile: np.ndarray) -> pd.DataFrame:
+    """The columns of the legacy tov_profile.csv (r_km, eps_ref, eps_vac_inertial, ...) for one profile."""
+    return pd.DataFrame({"r_km": profile["r"] / 1e5, "eps_ref": profile["eps_grav"],
+                         "eps_vac_inertial": profile["eps_vac_inertial"], "m": profile["m"],
+                         "P_geom": profile["P_geom"], "y_tidal": profile["y_tidal"], "W_prof": profile["W_prof"]})
+
+
+def parse_ref(ref: str) -> tuple:
+    """'<store dir>#<star>' -> (store dir, star)."""
+    path, sep, star = ref.rpartition("#")
+    if not sep:
+        raise ValueError(f"expected <store>#<star>, got {ref!r}")
+    return path, star
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Inspect streamed profile stores")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("ls", help="List the stars of a store")
+    p.add_argument("store")
+    p = sub.add_parser("export", help="Write one star as a legacy tov_profile.csv")
+    p.add_argument("store")
+    p.add_argument("star")
+    p.add_argument("csv")
+    args = ap.parse_args()
+
+    store = ProfileStore(args.store, "r")
+    if args.cmd == "ls":
+        df = store.stars()
+        print(df.to_string(index=False) if not df.empty else "(no stars)")
+    elif args.cmd == "export":
+        tov_profile_frame(store.profile(args.star)).to_csv(args.csv, index=False)
+        print(f"Wrote {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
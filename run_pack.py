@@ -0,0 +1,364 @@
+"""run_pack.py
+
+Packed per-scan HDF5 containers for the per-run artefacts under outputs/diagnostics/.
+
+With the default layout every run owns a directory (metadata.json, run_config.json,
+provenance.json, run_index.json, summary.json, run.log, diagnosis.txt/json, PNGs), so a large
+sweep means hundreds of thousands of small files and inodes on the shared filesystem.
+SFST_RUN_LAYOUT=packed stores each run as one group of an HDF5 container per scan instead
+(<output base>/<SFST_PACK_NAME>.h5, default runs.h5):
+
+    /runs/<run_id>/<file name>   one dataset per artefact: files as raw bytes (attr kind "file"),
+                                 profiles and step traces as typed arrays (kind "array"); chunked
+                                 and gzip-compressed from COMPRESS_MIN bytes on
+    /index                       one row per run: run_id, status (from run_index.json), sha256 and
+                                 size of summary.json, update time
+
+I find a run through the link-name index of /runs (dense, B-tree indexed link storage with
+libver="latest"), so a lookup never walks the container; each run group also records its /index
+row. /index lists every run in one read, which is what collection and `ls` need.
+
+Writers hold an exclusive flock on <container>.lock and readers a shared one, so the threads,
+processes and array tasks of a scan can share a container. On a filesystem without working
+flock, give each task its own SFST_PACK_NAME. `export` materializes the legacy directory tree
+(outputs/diagnostics/<run_id>/...) for reviewers; arrays come out as CSV.
+
+    python run_pack.py ls outputs/diagnostics/runs.h5
+    python run_pack.py cat outputs/diagnostics/runs.h5 <run_id> summary.json
+    python run_pack.py export outputs/diagnostics/runs.h5 [--dest outputs/diagnostics] [--run-id ID ...]
+    python run_pack.py pack outputs/diagnostics/runs.h5 outputs/diagnostics/* [--remove]
+    python run_pack.py compact outputs/diagnostics/runs.h5
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import h5py
+import numpy as np
+
+LAYOUT = os.getenv("SFST_RUN_LAYOUT", "dirs")  # 'dirs' | 'packed'
+PACK_NAME = os.getenv("SFST_PACK_NAME", "runs")
+SCRATCH_DIR = "_unpacked"  # packed layout: a run is assembled here and packed when it finishes
+COMPRESS_MIN = 1024  # bytes; smaller artefacts are stored contiguous (a chunk index would outweigh them)
+COMPRESSION = {"compression": "gzip", "compression_opts": 4, "shuffle": True}
+
+_INDEX_DTYPE = np.dtype([("run_id", h5py.string_dtype()), ("status", h5py.string_dtype()),
+                         ("summary_sha256", "S64"), ("summary_size", "i8"), ("updated", "f8")])
+
+_THREAD_LOCKS: Dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def _str(v: Any) -> str:
+    return v.decode("utf-8") if isinstance(v, bytes) else str(v)
+
+
+@contextmanager
+def _locked(path: Path, exclusive: bool):
+    key = str(Path(path).resolve())
+    with _THREAD_LOCKS_GUARD:
+        tlock = _THREAD_LOCKS.setdefault(key, threading.Lock())
+    # flock belongs to an open file description, so the threads of one process queue up here first.
+    with tlock:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{path}.lock", "a") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield  # closing the lock file releases the flock
+
+
+class RunPack:
+    """One packed container (see the module docstring).
+
+        with RunPack("outputs/diagnostics/runs.h5", "a") as pack:
+            pack.put_run(run_id, {"summary.json": summary, "run.log": b"..."})
+    """
+
+    def __init__(self, path: str | Path, mode: str = "r"):
+        if mode not in ("r", "a"):
+            raise ValueError(f"mode must be 'r' or 'a', not {mode!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self._f: Optional[h5py.File] = None
+        self._lock = None
+
+    def __enter__(self) -> "RunPack":
+        if self.mode == "r" and not self.path.exists():
+            raise FileNotFoundError(self.path)
+        self._lock = _locked(self.path, exclusive=self.mode != "r")
+        self._lock.__enter__()
+        try:
+            self._f = h5py.File(self.path, self.mode, libver="latest")
+        except BaseException:
+            self._lock.__exit__(*sys.exc_info())
+            raise
+        return self
+
+    def __exit__(self, *exc) -> None:
+        try:
+            self._f.close()
+        finally:
+            self._lock.__exit__(*exc)
+
+    # --- reading -----------------------------------------------------------------------------
+
+    def __contains__(self, run_id: str) -> bool:
+        return f"runs/{run_id}" in self._f
+
+    def files(self, run_id: str) -> List[str]:
+        """Artefact names of one run (relative paths, as in the legacy run directory)."""
+        names: List[str] = []
+        self._f[f"runs/{run_id}"].visititems(
+            lambda name, obj: names.append(name) if isinstance(obj, h5py.Dataset) else None)
+        return sorted(names)
+
+    def get(self, run_id: str, name: str):
+        """One artefact: bytes for files, a numpy array for arrays. KeyError if it is not there."""
+        ds = self._f[f"runs/{run_id}/{name}"]
+        data = ds[()]
+        return data.tobytes() if _str(ds.attrs.get("kind", "file")) == "file" else data
+
+    def read_json(self, run_id: str, name: str) -> Any:
+        return json.loads(self.get(run_id, name))
+
+    def index(self) -> Dict[str, Dict[str, Any]]:
+        """{run_id: {status, summary_sha256, summary_size, updated}} of every run, in one read."""
+        if "index" not in self._f:
+            return {}
+        out = {}
+        for rid, status, sha, size, updated in self._f["index"][()]:
+            out[_str(rid)] = {"status": _str(status), "summary_sha256": _str(sha),
+                              "summary_size": int(size), "updated": float(updated)}
+        return out
+
+    # --- writing -----------------------------------------------------------------------------
+
+    def put_run(self, run_id: str, files: Dict[str, Any]) -> None:
+        """Write one run (artefact name -> bytes / str / JSON-able dict or list / numpy array).
+
+        An earlier run under the same run_id is replaced as a whole.
+        """
+        runs = self._f.require_group("runs")
+        row = None
+        if run_id in runs:
+            row = runs[run_id].attrs.get("index_row")
+            del runs[run_id]
+        grp = runs.create_group(run_id)
+        if row is not None:
+            grp.attrs["index_row"] = row
+        for name, data in files.items():
+            self._put(grp, name, data)
+        self._note(run_id, grp)
+
+    def put_file(self, run_id: str, name: str, data: Any) -> None:
+        """Write (or overwrite) one artefact of a run."""
+        grp = self._f.require_group("runs").require_group(run_id)
+        self._put(grp, name, data)
+        self._note(run_id, grp)
+
+    def delete_run(self, run_id: str) -> None:
+        runs = self._f.require_group("runs")
+        if run_id not in runs:
+            return
+        row = runs[run_id].attrs.get("index_row")
+        del runs[run_id]
+        if row is not None:
+            # Move the last index row into the hole, so /index stays dense.
+            idx = self._f["index"]
+            last = len(idx) - 1
+            if row != last:
+                moved = idx[last]
+                idx[row] = moved
+                runs[_str(moved["run_id"])].attrs["index_row"] = row
+            idx.resize((last,))
+
+    @staticmethod
+    def _put(grp: h5py.Group, name: str, data: Any) -> None:
+        if name in grp:
+            del grp[name]
+        if isinstance(data, np.ndarray):
+            arr, kind = data, "array"
+        else:
+            if isinstance(data, (dict, list)):
+                data = json.dumps(data, indent=2, sort_keys=True)
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            arr, kind = np.frombuffer(bytes(data), dtype=np.uint8), "file"
+        opts = COMPRESSION if arr.ndim and arr.nbytes >= COMPRESS_MIN else {}
+        ds = grp.create_dataset(name, data=arr, **opts)  # intermediate groups for nested names
+        ds.attrs["kind"] = kind
+
+    def _note(self, run_id: str, grp: h5py.Group) -> None:
+        summary = grp["summary.json"][()].tobytes() if "summary.json" in grp else b""
+        status = ""
+        if "run_index.json" in grp:
+            try:
+                status = str(json.loads(grp["run_index.json"][()].tobytes()).get("status", ""))
+            except ValueError:
+                pass
+        if "index" not in self._f:
+            self._f.create_dataset("index", shape=(0,), maxshape=(None,), dtype=_INDEX_DTYPE, chunks=(1024,))
+        idx = self._f["index"]
+        row = grp.attrs.get("index_row")
+        if row is None:
+            row = len(idx)
+            idx.resize((row + 1,))
+            grp.attrs["index_row"] = row
+        idx[row] = np.array((run_id, status, hashlib.sha256(summary).hexdigest() if summary else "",
+                             len(summary), time.time()), dtype=_INDEX_DTYPE)
+
+    # --- legacy tree ---------------------------------------------------------------------------
+
+    def export(self, dest: str | Path, run_ids: Optional[Iterable[str]] = None) -> int:
+        """Materialize <dest>/<run_id>/<artefact> for `run_ids` (default: every run); returns the count."""
+        dest = Path(dest)
+        n = 0
+        for run_id in (run_ids if run_ids is not None else self._f.get("runs", {})):
+            run_dir = dest / run_id
+            for name in self.files(run_id):
+                data = self.get(run_id, name)
+                path = run_dir / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                if isinstance(data, bytes):
+                    path.write_bytes(data)
+                    continue
+                if path.suffix != ".csv":
+                    path = path.with_name(path.name + ".csv")
+                header = ",".join(data.dtype.names) if data.dtype.names else ""
+                if data.dtype.names:
+                    data = np.column_stack([data[f] for f in data.dtype.names])
+                np.savetxt(path, np.atleast_1d(data), delimiter=",", header=header, comments="")
+            n += 1
+        return n
+
+
+def pack_path(output_base: str | Path, name: Optional[str] = None) -> Path:
+    """Container of the current scan under `output_base` (SFST_PACK_NAME, default runs.h5)."""
+    return Path(output_base) / f"{name or PACK_NAME}.h5"
+
+
+def containers(output_base: str | Path) -> List[Path]:
+    return sorted(Path(output_base).glob("*.h5"))
+
+
+def pack_dir(container: str | Path, run_dir: str | Path, run_id: Optional[str] = None, *,
+             remove: bool = False) -> str:
+    """Pack every file under `run_dir` as run `run_id` (default: the directory name)."""
+    run_dir = Path(run_dir)
+    run_id = run_id or run_dir.name
+    files = {str(p.relative_to(run_dir)): p.read_bytes() for p in sorted(run_dir.rglob("*")) if p.is_file()}
+    with RunPack(container, "a") as pack:
+        pack.put_run(run_id, files)
+    if remove:
+        shutil.rmtree(run_dir)
+    return run_id
+
+
+def read_run_file(output_base: str | Path, run_id: str, name: str) -> Optional[bytes]:
+    """One artefact of a run in either layout (its directory first, then the containers), or None."""
+    path = Path(output_base) / run_id / name
+    try:
+        return path.read_bytes()
+    except OSError:
+        pass
+    current = pack_path(output_base)
+    for c in [current] + [c for c in containers(output_base) if c != current]:
+        try:
+            with RunPack(c) as pack:
+                if run_id in pack:
+                    return pack.get(run_id, name)
+        except (FileNotFoundError, KeyError):
+            continue
+    return None
+
+
+def write_run_file(output_base: str | Path, run_id: str, name: str, data: Any) -> None:
+    """Write one artefact of a run in the configured layout (SFST_RUN_LAYOUT)."""
+    if LAYOUT == "packed":
+        with RunPack(pack_path(output_base), "a") as pack:
+            pack.put_file(run_id, name, data)
+        return
+    path = Path(output_base) / run_id / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, (dict, list)):
+        data = json.dumps(data, indent=2, sort_keys=True)
+    path.write_bytes(data.encode("utf-8") if isinstance(data, str) else bytes(data))
+
+
+def compact(container: str | Path) -> None:
+    """Rewrite a container without the space of replaced or deleted runs (HDF5 does not reuse it)."""
+    container = Path(container)
+    tmp = container.with_name(f".{container.name}.{os.getpid()}.tmp")
+    with _locked(container, exclusive=True):
+        with h5py.File(container, "r") as src, h5py.File(tmp, "w", libver="latest") as dst:
+            for name in src:
+                src.copy(src[name], dst, name)
+        os.replace(tmp, container)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Packed per-scan run containers")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("ls", help="List the runs of a container")
+    p.add_argument("container")
+    p = sub.add_parser("cat", help="Print one artefact of a run")
+    p.add_argument("container")
+    p.add_argument("run_id")
+    p.add_argument("name")
+    p = sub.add_parser("export", help="Materialize the legacy run directories")
+    p.add_argument("container")
+    p.add_argument("--dest", help="Target directory (default: the container's directory)")
+    p.add_argument("--run-id", action="append", help="Only this run (repeatable)")
+    p = sub.add_parser("pack", help="Pack legacy run directories into a container")
+    p.add_argument("container")
+    p.add_argument("run_dirs", nargs="+")
+    p.add_argument("--remove", action="store_true", help="Delete each directory once it is packed")
+    p = sub.add_parser("compact", help="Reclaim the space of replaced or deleted runs")
+    p.add_argument("container")
+    args = ap.parse_args()
+
+    if args.cmd == "ls":
+        with RunPack(args.container) as pack:
+            for run_id, row in sorted(pack.index().items()):
+                print(f"{run_id}\t{row['status'] or '-'}\t"
+                      f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(row['updated']))}")
+    elif args.cmd == "cat":
+        with RunPack(args.container) as pack:
+            data = pack.get(args.run_id, args.name)
+        if isinstance(data, bytes):
+            sys.stdout.buffer.write(data)
+        else:
+            print(data)
+    elif args.cmd == "export":
+        dest = Path(args.dest) if args.dest else Path(args.container).parent
+        with RunPack(args.container) as pack:
+            n = pack.export(dest, args.run_id)
+        print(f"Exported {n} runs to {dest}/")
+    elif args.cmd == "pack":
+        n = 0
+        for d in map(Path, args.run_dirs):
+            # _physics/ and the scratch directory are not runs
+            if d.is_dir() and not d.name.startswith("_"):
+                pack_dir(args.container, d, remove=args.remove)
+                n += 1
+        print(f"Packed {n} run directories into {args.container}")
+    elif args.cmd == "compact":
+        before = os.path.getsize(args.container)
+        compact(args.container)
+        print(f"{args.container}: {before} -> {os.path.getsize(args.container)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,375 @@
+"""run_store.py
+
+Indexed run database behind runs_summary.csv, audit_index.csv, audit_trail.csv and scan_grid.csv.
+
+I keep every run table of an output directory in one SQLite file next to its CSVs
+(<dir>/run_store.sqlite, WAL mode, so several writers can share it). A table is named after its
+CSV (outputs/runs_summary.csv -> table "runs_summary"). Each row is stored as JSON together with
+indexed copies of the columns scripts filter on (run_id, EOS, case, sigma, status), so
+    run_store.read_table("outputs/runs_summary.csv", eos="SLy-PP(Read2009)", case="C_sigma_chi")
+is an index lookup instead of a parse of the whole CSV. Upserts are transactions keyed by the
+table's key columns (TABLE_KEYS; run_id by default): an upserted row replaces the stored row
+with the same key and moves to the end, like the old read-concat-rewrite merges.
+
+The CSVs remain as a compatibility view: write_table exports the table after every write, and
+read_table/write_table first re-import a CSV that changed since the store last wrote or read it
+(e.g. a file edited by hand or written by an older script), so the CSV never silently loses to
+the store.
+
+    python run_store.py tables [outputs]
+    python run_store.py query outputs/runs_summary.csv --eos "SLy-PP(Read2009)" --status accepted
+    python run_store.py export outputs/runs_summary.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+STORE_NAME = "run_store.sqlite"
+
+# Key columns per table (a row's identity for upserts); tables not listed are keyed by run_id.
+TABLE_KEYS: Dict[str, Sequence[str]] = {
+    "runs_summary": ("EOS", "case", "sigma", "chi", "variant"),  # as generate_sigma_scan.merge_runs_summary
+}
+
+# Indexed columns and the row fields they are taken from (first one present wins).
+INDEX_FIELDS = {
+    "run_id": ("run_id",),
+    "eos": ("EOS", "eos"),
+    "case_name": ("case",),
+    "sigma": ("sigma",),
+    "status": ("status", "obs_status"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    tbl TEXT NOT NULL, key TEXT NOT NULL, run_id TEXT, eos TEXT, case_name TEXT, sigma REAL, status TEXT,
+    updated REAL NOT NULL, data TEXT NOT NULL, PRIMARY KEY (tbl, key));
+CREATE INDEX IF NOT EXISTS rows_run_id ON rows (tbl, run_id);
+CREATE INDEX IF NOT EXISTS rows_eos_case_sigma ON rows (tbl, eos, case_name, sigma);
+CREATE INDEX IF NOT EXISTS rows_status ON rows (tbl, status);
+CREATE TABLE IF NOT EXISTS tables (
+    tbl TEXT PRIMARY KEY, columns TEXT NOT NULL, csv_mtime_ns INTEGER, csv_size INTEGER);
+CREATE TABLE IF NOT EXISTS manifest (
+    source TEXT NOT NULL, path TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL, PRIMARY KEY (source, path));
+"""
+
+
+def _plain(v: Any) -> Any:
+    """JSON-safe scalar (numpy scalars -> Python; pandas NA -> None; NaN stays a float)."""
+    if hasattr(v, "item") and not isinstance(v, (list, dict, str)):
+        v = v.item()
+    if v is None or isinstance(v, (bool, int, float, str, list, dict)):
+        return v
+    try:
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(v)
+
+
+def _index_values(row: Dict[str, Any]) -> List[Any]:
+    vals = []
+    for col, fields in INDEX_FIELDS.items():
+        v = next((row[f] for f in fields if f in row and row[f] is not None), None)
+        if col == "sigma":
+            try:
+                v = float(v)
+                v = v if math.isfinite(v) else None
+            except (TypeError, ValueError):
+                v = None
+        elif v is not None:
+            v = str(v)
+        vals.append(v)
+    return vals
+
+
+def _key_value(v: Any) -> str:
+    # Numeric key parts compare as numbers (0.06 from a CSV and from a solver are the same key).
+    if isinstance(v, bool) or v is None:
+        return str(v)
+    try:
+        return repr(float(v))
+    except (TypeError, ValueError):
+        return str(v)
+
+
+class RunStore:
+    """SQLite store of the run tables of one output directory (see the module docstring)."""
+
+    def __init__(self, directory: str | Path = "outputs"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / STORE_NAME
+        self._db = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._depth = 0
+
+    @contextmanager
+    def transaction(self):
+        """Hold the store's write lock for the block (nests: only the outermost block commits).
+
+        BEGIN IMMEDIATE takes the lock up front, so concurrent writers serialize instead of
+        deadlocking; write_table keeps its re-import check, upsert and CSV export in one block.
+        """
+        if self._depth:
+            self._depth += 1
+            try:
+                yield self._db
+            finally:
+                self._depth -= 1
+            return
+        self._db.execute("BEGIN IMMEDIATE")
+        self._depth = 1
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        else:
+            self._db.execute("COMMIT")
+        finally:
+            self._depth = 0
+
+    def columns(self, table: str) -> List[str]:
+        row = self._db.execute("SELECT columns FROM tables WHERE tbl = ?", (table,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def tables(self) -> Dict[str, int]:
+        """{table: number of rows}."""
+        counts = dict(self._db.execute("SELECT tbl, COUNT(*) FROM rows GROUP BY tbl").fetchall())
+        return {t: counts.get(t, 0) for (t,) in self._db.execute("SELECT tbl FROM tables ORDER BY tbl")}
+
+    def upsert(self, table: str, rows: Iterable[Dict[str, Any]] | pd.DataFrame, *, replace: bool = False,
+               key: Optional[Sequence[str]] = None) -> int:
+        """Insert or replace `rows` in one transaction; replace=True first drops the whole table.
+
+        key overrides TABLE_KEYS for this table. Returns the number of rows written.
+        """
+        if isinstance(rows, pd.DataFrame):
+            rows = rows.to_dict("records")
+        rows = [{k: _plain(v) for k, v in r.items()} for r in rows]
+        key = tuple(key or TABLE_KEYS.get(table, ("run_id",)))
+        now = time.time()
+        with self.transaction() as db:
+            cols = [] if replace else self.columns(table)
+            seen = set(cols)
+            for r in rows:
+                for c in r:
+                    if c not in seen:
+                        seen.add(c)
+                        cols.append(c)
+            if replace:
+                db.execute("DELETE FROM rows WHERE tbl = ?", (table,))
+            db.execute("INSERT INTO tables (tbl, columns) VALUES (?, ?) "
+                       "ON CONFLICT (tbl) DO UPDATE SET columns = excluded.columns", (table, json.dumps(cols)))
+            # INSERT OR REPLACE deletes the old row, so a replaced row moves to the end of the table.
+            db.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           [(table, self._key(r, key, i, now), *_index_values(r), now, json.dumps(r))
+                            for i, r in enumerate(rows)])
+        return len(rows)
+
+    @staticmethod
+    def _key(row: Dict[str, Any], key: Sequence[str], i: int, now: float) -> str:
+        parts = [row.get(k) for k in key]
+        if all(p is None for p in parts):
+            return f"#{now!r}:{i}"  # no identity (e.g. a failed point without run_id): never replaces anything
+        return "|".join(_key_value(p) for p in parts)
+
+    def query(self, table: str, *, run_id: Optional[str] = None, eos: Optional[str] = None,
+              case: Optional[str] = None, sigma: Optional[float] = None,
+              status: Optional[str | Sequence[str]] = None) -> pd.DataFrame:
+        """Rows of `table` matching all given filters (indexed), in table order, as a DataFrame.
+
+        status matches the row's status (or obs_status) column; pass a list for several values.
+        sigma matches to a relative 1e-12.
+        """
+        where, args = ["tbl = ?"], [table]
+        for col, v in (("run_id", run_id), ("eos", eos), ("case_name", case)):
+            if v is not None:
+                where.append(f"{col} = ?")
+                args.append(str(v))
+        if sigma is not None:
+            tol = 1e-12 * max(abs(float(sigma)), 1e-300)
+            where.append("sigma BETWEEN ? AND ?")
+            args += [float(sigma) - tol, float(sigma) + tol]
+        if status is not None:
+            status = [status] if isinstance(status, str) else list(status)
+            where.append(f"status IN ({', '.join('?' * len(status))})")
+            args += status
+        data = self._db.execute(f"SELECT data FROM rows WHERE {' AND '.join(where)} ORDER BY rowid", args)
+        return pd.DataFrame([json.loads(d) for (d,) in data], columns=self.columns(table) or None)
+
+    def delete_rows(self, table: str, run_ids: Iterable[str]) -> None:
+        with self.transaction() as db:
+            db.executemany("DELETE FROM rows WHERE tbl = ? AND run_id = ?", [(table, str(r)) for r in run_ids])
+
+    # Ingest manifests: which input files (e.g. per-run summary.json) a table was last built from,
+    # so an ingester only re-reads files that are new or changed (see scripts/collect_results.py).
+
+    def manifest(self, source: str) -> Dict[str, tuple]:
+        """{path: (mtime_ns, size, sha256)} of the files ingested under `source`."""
+        return {p: (m, s, h) for p, m, s, h in self._db.execute(
+            "SELECT path, mtime_ns, size, sha256 FROM manifest WHERE source = ?", (source,))}
+
+    def note_manifest(self, source: str, entries: Dict[str, tuple]) -> None:
+        with self.transaction() as db:
+            db.executemany("INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?)",
+                           [(source, p, *e) for p, e in entries.items()])
+
+    def forget_manifest(self, source: str, paths: Optional[Iterable[str]] = None) -> None:
+        """Drop `paths` (all of them by default) from the manifest of `source`."""
+        with self.transaction() as db:
+            if paths is None:
+                db.execute("DELETE FROM manifest WHERE source = ?", (source,))
+            else:
+                db.executemany("DELETE FROM manifest WHERE source = ? AND path = ?", [(source, p) for p in paths])
+
+    def delete(self, table: str) -> None:
+        with self.transaction() as db:
+            db.execute("DELETE FROM rows WHERE tbl = ?", (table,))
+            db.execute("DELETE FROM tables WHERE tbl = ?", (table,))
+
+    def _note_csv(self, table: str, path: Path) -> None:
+        st = path.stat()
+        with self.transaction() as db:
+            db.execute("UPDATE tables SET csv_mtime_ns = ?, csv_size = ? WHERE tbl = ?",
+                       (st.st_mtime_ns, st.st_size, table))
+
+    def csv_changed(self, table: str, path: Path) -> bool:
+        """Whether `path` differs from what this store last exported or imported for `table`."""
+        if not path.exists():
+            return False
+        row = self._db.execute("SELECT csv_mtime_ns, csv_size FROM tables WHERE tbl = ?", (table,)).fetchone()
+        st = path.stat()
+        return row is None or (row[0], row[1]) != (st.st_mtime_ns, st.st_size)
+
+    def import_csv(self, table: str, path: Path) -> int:
+        """Replace `table` with the rows of the CSV at `path` (an empty file gives an empty table)."""
+        path = Path(path)
+        try:
+            df = pd.read_csv(path, float_precision="round_trip")
+        except pd.errors.EmptyDataError:
+            df = pd.DataFrame()
+        # NaN cells become None, so a round trip through the store writes them back as empty fields.
+        n = self.upsert(table, [{k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in r.items()}
+                                for r in df.to_dict("records")], replace=True)
+        with self.transaction() as db:
+            db.execute("UPDATE tables SET columns = ? WHERE tbl = ?", (json.dumps([str(c) for c in df.columns]), table))
+        self._note_csv(table, path)
+        return n
+
+    def export_csv(self, table: str, path: Path, *, columns: Optional[Sequence[str]] = None,
+                   df: Optional[pd.DataFrame] = None) -> Path:
+        """Write `table` to `path` (columns: the table's column order by default).
+
+        df: the table as just queried by the caller, to save a second read of it.
+        """
+        path = Path(path)
+        if df is None:
+            df = self.query(table)
+        if columns is not None:
+            df = df.reindex(columns=list(columns))
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        if df.columns.empty:
+            tmp.write_text("", encoding="utf-8")
+        else:
+            df.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+        self._note_csv(table, path)
+        return path
+
+    def close(self) -> None:
+        self._db.close()
+
+
+_STORES: Dict[tuple, RunStore] = {}
+
+
+def store_for(csv_path: str | Path) -> tuple:
+    """(RunStore of the CSV's directory, table name) for a compatibility CSV path."""
+    csv_path = Path(csv_path)
+    # Keyed by pid as well: an SQLite connection must not be shared with forked workers.
+    key = (os.getpid(), str(csv_path.parent.resolve()))
+    if key not in _STORES:
+        _STORES[key] = RunStore(csv_path.parent)
+    return _STORES[key], csv_path.stem
+
+
+def sync_csv(csv_path: str | Path) -> tuple:
+    """store_for, after re-importing the CSV when it changed outside the store."""
+    store, table = store_for(csv_path)
+    if store.csv_changed(table, Path(csv_path)):
+        with store.transaction():  # re-checked under the lock: another writer may have just exported it
+            if store.csv_changed(table, Path(csv_path)):
+                store.import_csv(table, Path(csv_path))
+    return store, table
+
+
+def read_table(csv_path: str | Path, **filters) -> pd.DataFrame:
+    """The table behind `csv_path` (see RunStore.query for the filters).
+
+    Raises FileNotFoundError when neither the store nor the CSV has the table.
+    """
+    store, table = sync_csv(csv_path)
+    if table not in store.tables():
+        raise FileNotFoundError(f"{csv_path}: no such run table (and no CSV to import)")
+    return store.query(table, **filters)
+
+
+def write_table(csv_path: str | Path, rows, *, replace: bool = False, key: Optional[Sequence[str]] = None,
+                columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Upsert `rows` into the table behind `csv_path` (replace=True: rows become the whole table),
+    export the CSV view (in `columns` order if given) and return the full table."""
+    store, table = store_for(csv_path)
+    with store.transaction():
+        sync_csv(csv_path)
+        store.upsert(table, rows, replace=replace, key=key)
+        df = store.query(table)
+        store.export_csv(table, Path(csv_path), columns=columns, df=df)
+        return df
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Query and export the run store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    t = sub.add_parser("tables", help="List the tables of a directory's store")
+    t.add_argument("directory", nargs="?", default="outputs")
+    q = sub.add_parser("query", help="Print the matching rows of a run table as CSV")
+    q.add_argument("csv", help="Compatibility CSV of the table, e.g. outputs/runs_summary.csv")
+    for f in ("run-id", "eos", "case", "status"):
+        q.add_argument(f"--{f}")
+    q.add_argument("--sigma", type=float)
+    e = sub.add_parser("export", help="Rewrite a compatibility CSV from the store")
+    e.add_argument("csv")
+    args = ap.parse_args()
+
+    if args.cmd == "tables":
+        for table, n in RunStore(args.directory).tables().items():
+            print(f"{table:24s} {n:8d} rows")
+    elif args.cmd == "query":
+        df = read_table(args.csv, run_id=args.run_id, eos=args.eos, case=args.case, status=args.status,
+                        sigma=args.sigma)
+        print(df.to_csv(index=False), end="")
+    else:
+        store, table = sync_csv(args.csv)
+        print(f"Wrote {store.export_csv(table, Path(args.csv))}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
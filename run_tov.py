@@ -7,33 +7,74 @@ Expected CLI (used throughout the repo docs):
     python run_tov.py --eos <EOS> --sigma <SIGMA> --run-tag <RUN_TAG> --grid-factor <GRID_FACTOR> --newton-tol <NEWTON_TOL>
 
 This script calls scan_wrappers.compute_tov_case and writes summary.json under
-outputs/diagnostics/<run_tag>/ unless an explicit --output-dir is provided.
+outputs/diagnostics/<run_tag>/ unless an explicit --output-dir is provided
+(SFST_RUN_LAYOUT=packed: into the run's group of the scan container, see run_pack.py).
+
+Resident daemon (tov_daemon.py, opt-in):
+    python run_tov.py --daemon            # keep modules, EOS tables and the star cache warm
+    python run_tov.py --connect --eos ... # send the run to the daemon (milliseconds per call);
+                                          # solved in-process when no daemon is running
 """
 
 import argparse
 import json
+import os
 from pathlib import Path
 
-from scan_wrappers import compute_tov_case
+# A single run solves in this process; a worker pool would only add a spawn.
+os.environ.setdefault('SFST_TOV_BACKEND', 'inline')
+
+import tov_daemon
+from scan_wrappers import OUTPUT_BASE, RUN_LAYOUT, compute_tov_case
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument('--eos', required=True)
-    ap.add_argument('--sigma', required=True, type=float)
-    ap.add_argument('--run-tag', required=True, dest='run_tag')
+    ap.add_argument('--eos')
+    ap.add_argument('--sigma', type=float)
+    ap.add_argument('--run-tag', dest='run_tag')
     ap.add_argument('--grid-factor', type=float, default=1.0, dest='grid_factor')
     ap.add_argument('--newton-tol', type=float, default=1e-6, dest='newton_tol')
     ap.add_argument('--timeout', type=int, default=3600)
     ap.add_argument('--output-dir', default=None, help='Optional override for outputs/diagnostics/<run_tag>')
+    ap.add_argument('--daemon', action='store_true', help='Serve runs on --socket until shut down')
+    ap.add_argument('--connect', action='store_true',
+                    help='Send the run to a running daemon; falls back to in-process execution if none is running')
+    ap.add_argument('--shutdown', action='store_true', help='Stop the daemon listening on --socket')
+    ap.add_argument('--socket', default=tov_daemon.DEFAULT_SOCKET, help='Daemon socket (default: $SFST_TOV_SOCKET)')
     args = ap.parse_args()
 
+    if args.daemon:
+        tov_daemon.serve(args.socket)
+        return
+    if args.shutdown:
+        try:
+            tov_daemon.request({'op': 'shutdown'}, socket_path=args.socket, timeout=10)
+        except (FileNotFoundError, ConnectionRefusedError):
+            print(f'No daemon on {args.socket}')
+        return
+    missing = [f'--{n.replace("_", "-")}' for n in ('eos', 'sigma', 'run_tag') if getattr(args, n) is None]
+    if missing:
+        ap.error(f'the following arguments are required: {", ".join(missing)}')
+
     extra = {'grid_factor': args.grid_factor, 'newton_tol': args.newton_tol}
-    res = compute_tov_case(eos=args.eos, sigma=args.sigma, run_tag=args.run_tag, extra=extra, timeout=args.timeout)
+    res = None
+    if args.connect:
+        res = tov_daemon.run_via_daemon(args.eos, args.sigma, args.run_tag, extra, args.timeout, socket_path=args.socket)
+    if res is None:
+        res = compute_tov_case(eos=args.eos, sigma=args.sigma, run_tag=args.run_tag, extra=extra, timeout=args.timeout)
 
-    # Write summary.json to the run directory for auditability.
-    run_dir = Path(args.output_dir) if args.output_dir else Path('outputs') / 'diagnostics' / args.run_tag
-    run_dir.mkdir(parents=True, exist_ok=True)
-    (run_dir / 'summary.json').write_text(json.dumps(res, indent=2))
+    # Write summary.json to the run directory (or the run's group of the scan container) for auditability.
+    if args.output_dir:
+        run_dir = Path(args.output_dir)
+        run_dir.mkdir(parents=True, exist_ok=True)
+        (run_dir / 'summary.json').write_text(json.dumps(res, indent=2))
+    elif RUN_LAYOUT == 'packed':
+        import run_pack
+        run_pack.write_run_file(OUTPUT_BASE, args.run_tag, 'summary.json', json.dumps(res, indent=2))
+    else:
+        run_dir = Path('outputs') / 'diagnostics' / args.run_tag
+        run_dir.mkdir(parents=True, exist_ok=True)
+        (run_dir / 'summary.json').write_text(json.dumps(res, indent=2))
     print(json.dumps(res, indent=2))
 
 if __name__ == '__main__':
@@ -1,10 +1,11 @@
 """scan_wrappers.py
 
-Compute wrapper templates for driving the existing TOV pipeline from parameter scans.
+Compute wrappers for driving the TOV pipeline from parameter scans.
 
-This file intentionally ships as a *template*. You should connect `_call_tov_entrypoint`
-to your existing CLI / Makefile / Python entrypoint that performs a single TOV run
-and writes `summary.json` plus diagnostics into the provided run directory.
+`_call_tov_entrypoint` solves each run in-process with `sfst_qfis_repro` on a long-lived
+worker pool (backend "pool", default), so the numpy/scipy/pandas imports and the EOS tables
+are paid once per worker rather than once per run. SFST_TOV_BACKEND=inline solves in the
+calling process; SFST_DUMMY=1 still writes the deterministic placeholder for smoke tests.
 
 Expected per-run directory:
   outputs/diagnostics/<run_id>/
@@ -12,11 +13,19 @@ Expected per-run directory:
     - run.log                   (recommended: stdout/stderr)
     - metadata.json             (written by wrapper)
     - run_config.json           (written by wrapper)
+    - provenance.json           (written by wrapper: exit code, physics key, canonical run dir)
     - diagnosis.txt/json        (written on failure)
     - richardson.png            (optional)
     - residuals.png             (optional)
     - wfaktor.png               (optional)
 
+Physically identical requests (same physics_key: EOS, delta = sigma*chi*S, include_in_gravity
+and numerics) are solved once, under outputs/diagnostics/_physics/<key_id>/, and fanned out.
+
+SFST_RUN_LAYOUT=packed keeps the same files per run, but as one group of
+outputs/diagnostics/<SFST_PACK_NAME>.h5 per scan (run_pack.py; `python run_pack.py export`
+materializes the directories above).
+
 The scan controller (e.g. scripts/scan_mapping_sigma_g2_over_Gamma.py) expects
 compute_tov_case(...) to return a standardized dict.
 """
@@ -26,20 +35,39 @@ from __future__ import annotations
 import hashlib
 import json
 import os
+import socket
+import threading
 import time
-import subprocess
 from pathlib import Path
 from typing import Any, Dict, Optional
 
 # --- Configuration defaults (adjust to your repo / cluster) ---
 OUTPUT_BASE = Path("outputs/diagnostics")
-DEFAULT_TIMEOUT = 60 * 60  # seconds per run
+DEFAULT_TIMEOUT = 60 * 60  # seconds per run (the run's cooperative wall budget, see solve_run_config)
+TIMEOUT_GRACE = 60  # pool backend: seconds past the budget before a run's worker is abandoned
+SCAN_BUDGET_RHS = int(os.getenv("SFST_SCAN_BUDGET_RHS", "0")) or None  # RHS evaluations per run (unset: no limit)
 ENV_OVERRIDES = {
     "OMP_NUM_THREADS": "1",
     "MKL_NUM_THREADS": "1",
     "OPENBLAS_NUM_THREADS": "1",
     "NUMEXPR_NUM_THREADS": "1",
 }
+BACKEND = os.getenv("SFST_TOV_BACKEND", "pool")  # 'pool' | 'inline'
+N_WORKERS = int(os.getenv("SFST_TOV_WORKERS", "1"))
+# Baseline numerics of one run; grid_factor divides the radial max_step, newton_tol sets the
+# root-finding tolerance on log10 rho_c (and caps the integrator rtol).
+BASE_MAX_STEP = 5e4   # cm
+BASE_RTOL = 1e-6
+BASE_ATOL = 1e-9
+TARGET_M = 1.4
+# Physics-key canonicalization (SFST_CANONICALIZE=0 disables): requests that reduce to the same
+# physics key are solved once under <output base>/_physics/<key_id>/ and fanned out to every run_id.
+CANONICALIZE = os.getenv("SFST_CANONICALIZE", "1") != "0"
+# Run artefact layout: 'dirs' (one directory per run) or 'packed' (one HDF5 container per scan,
+# <output base>/$SFST_PACK_NAME.h5; see run_pack.py).
+RUN_LAYOUT = os.getenv("SFST_RUN_LAYOUT", "dirs")
+PHYSICS_DIR = "_physics"
+DELTA_DIGITS = 12  # significant digits of delta in the key
 
 def _write_json(path: Path, obj: Any) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -53,20 +81,105 @@ def make_run_id(eos: str, sigma: float, extra: Dict[str, Any]) -> str:
     run_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:10]
     return f"{eos}_{run_hash}_{stamp}"
 
-def _call_tov_entrypoint(config_path: Path, run_dir: Path, env: Dict[str, str], timeout: int) -> int:
-    """Hook to your actual TOV runner.
+def physics_key(eos: str, sigma: float, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Canonical physics key of one run request.
+
+    tov_rhs only sees sigma, chi and screening_factor through delta = sigma*chi*S, so the key is
+    (canonical EOS name, delta, include_in_gravity) plus the numerics of solve_run_config
+    (grid_factor, newton_tol, the BASE_* settings and the solver version). delta is rounded to
+    DELTA_DIGITS significant digits, so that g^2/Gamma products differing in the last ulp collapse.
+    Bookkeeping fields in extra (g, Gamma, seed, ...) do not enter: the solver is deterministic.
+    """
+    from sfst_qfis_repro import _SOLVER_VERSION, canonical_eos_name
+    extra = extra or {}
+    delta = float(sigma) * float(extra.get("chi", 1.0)) * float(extra.get("screening_factor", 1.0))
+    try:
+        eos_name = canonical_eos_name(eos)
+    except KeyError:
+        eos_name = eos  # the solve reports the unknown EOS
+    return {
+        "eos": eos_name,
+        "delta": float(f"{delta:.{DELTA_DIGITS}g}") + 0.0,  # + 0.0 folds -0.0 into 0.0
+        "include_in_gravity": bool(extra.get("include_in_gravity", False)),
+        "grid_factor": float(extra.get("grid_factor", 1.0)),
+        "newton_tol": float(extra.get("newton_tol", 1e-6)),
+        "numerics": {"max_step": BASE_MAX_STEP, "rtol": BASE_RTOL, "atol": BASE_ATOL, "target_M": TARGET_M,
+                     "version": _SOLVER_VERSION},
+    }
 
-    Replace the placeholder command below with your actual pipeline call.
-    The runner MUST write `summary.json` into run_dir on success.
+def physics_key_id(key: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
 
-    Examples:
-      - subprocess.run(["./run_tov.sh", "--config", str(config_path)], cwd=repo_root, ...)
-      - subprocess.run(["python", "-m", "sfst.run_one", str(config_path)], cwd=repo_root, ...)
+_KEY_LOCKS: Dict[str, threading.Lock] = {}
+_KEY_LOCKS_GUARD = threading.Lock()
+
+def _solve_physics_key(key: Dict[str, Any], run_id: str, base: Path, env: Dict[str, str],
+                       timeout: int, run_budget: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Solve `key` once under <base>/_physics/<key_id>/ and return its provenance record.
+
+    The canonical run solves the key itself (sigma = delta, chi = screening_factor = 1), so its
+    summary does not depend on which aliasing request arrived first. Concurrent requests for the
+    same key in this process wait for the first; a key whose summary.json exists is not re-solved.
+    Every run_id that used the key is appended to aliases.jsonl. A solve that ran out of its
+    budget is kept as budget_exceeded.json (record["summary_file"]), so the key is solved again
+    by the next request instead of serving the truncated result. A solve that raises removes the
+    key directory it created, so a failed key never sits under _physics/ without a summary.
+    """
+    key_id = physics_key_id(key)
+    key_dir = base / PHYSICS_DIR / key_id
+    with _KEY_LOCKS_GUARD:
+        lock = _KEY_LOCKS.setdefault(key_id, threading.Lock())
+    with lock:
+        solved = not (key_dir / "summary.json").exists()
+        summary_file = key_dir / "summary.json"
+        if solved:
+            created = not key_dir.exists()
+            key_dir.mkdir(parents=True, exist_ok=True)
+            _write_json(key_dir / "key.json", key)
+            extra = {k: key[k] for k in ("include_in_gravity", "grid_factor", "newton_tol")}
+            _write_json(key_dir / "run_config.json", {"eos": key["eos"], "sigma": key["delta"], "extra": extra,
+                                                      **({"budget": run_budget} if run_budget else {})})
+            # Solve into a scratch file first: a summary.json in key_dir always means a finished solve.
+            # The host name keeps scratch directories apart when workers on several nodes share base.
+            tmp_dir = key_dir / f".solve-{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+            tmp_dir.mkdir(exist_ok=True)
+            try:
+                try:
+                    _call_tov_entrypoint(config_path=key_dir / "run_config.json", run_dir=tmp_dir, env=env,
+                                         timeout=timeout)
+                    if json.loads((tmp_dir / "summary.json").read_text(encoding="utf-8")).get("status") == "budget_exceeded":
+                        summary_file = key_dir / "budget_exceeded.json"
+                    os.replace(tmp_dir / "summary.json", summary_file)
+                finally:
+                    for f in tmp_dir.iterdir():
+                        f.unlink()
+                    tmp_dir.rmdir()
+            except Exception:
+                # A failed solve (unknown EOS, missing summary, ...) leaves no half-made key behind,
+                # unless another worker is solving the same key in its own scratch directory.
+                if created and not (key_dir / "summary.json").exists() and not any(key_dir.glob(".solve-*")):
+                    for name in ("key.json", "run_config.json"):
+                        (key_dir / name).unlink(missing_ok=True)
+                    try:
+                        key_dir.rmdir()
+                    except OSError:
+                        pass  # something else was written in the meantime; the next request re-solves anyway
+                raise
+    record = {"physics_key": key, "physics_key_id": key_id, "canonical_dir": str(key_dir),
+              "summary_file": str(summary_file), "solved_here": solved}
+    with open(key_dir / "aliases.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps({"run_id": run_id, "solved_here": solved,
+                            "timestamp_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}) + "\n")
+    return record
+
+def _call_tov_entrypoint(config_path: Path, run_dir: Path, env: Dict[str, str], timeout: int) -> int:
+    """Run one run_config.json and write `summary.json` into run_dir (returns the exit code).
+
+    Backend "pool" (default, $SFST_TOV_BACKEND) submits solve_run_config to the long-lived
+    worker pool and waits at most `timeout` seconds; "inline" solves in this process.
     """
-    # --- TEMPLATE HOOK ---
-    # By default this function raises until you wire it to your pipeline.
-    # For repository smoke tests / CI, you can set SFST_DUMMY=1 to generate a
-    # deterministic placeholder summary.json without running the expensive solver.
+    # For repository smoke tests / CI, SFST_DUMMY=1 still generates a deterministic
+    # placeholder summary.json without running the solver.
     import os, json
     from pathlib import Path
     if os.environ.get("SFST_DUMMY", "0") == "1":
@@ -86,10 +199,121 @@ def _call_tov_entrypoint(config_path: Path, run_dir: Path, env: Dict[str, str],
         Path(run_dir, "summary.json").write_text(json.dumps(summary, indent=2))
         return 0
 
-    raise NotImplementedError(
-        "Connect _call_tov_entrypoint(...) to your TOV pipeline so that it writes summary.json. "
-        "For smoke tests only, set SFST_DUMMY=1 to generate a placeholder summary.json."
-    )
+    config = json.loads(Path(config_path).read_text(encoding="utf-8"))
+    if BACKEND == "inline":
+        summary = solve_run_config(config)
+    elif BACKEND == "pool":
+        import concurrent.futures
+        import concurrent.futures.process
+        fut = _worker_pool().submit(solve_run_config, config)
+        try:
+            # The run stops itself at its wall budget (= timeout); this only catches a worker that hangs.
+            summary = fut.result(timeout=timeout + TIMEOUT_GRACE)
+        except concurrent.futures.TimeoutError:
+            _reset_worker_pool()  # the worker is still busy with this run; start afresh
+            raise TimeoutError(f"run exceeded {timeout} s")
+        except concurrent.futures.process.BrokenProcessPool:
+            _reset_worker_pool()  # a worker died (e.g. OOM); the next run gets a fresh pool
+            raise
+    else:
+        raise ValueError(f"unknown SFST_TOV_BACKEND {BACKEND!r} (expected 'pool' or 'inline')")
+    _write_json(Path(run_dir) / "summary.json", summary)
+    return 0
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def _worker_init(env_overrides: Dict[str, str]) -> None:
+    # Thread caps must be in place before numpy is imported in the worker.
+    os.environ.update(env_overrides)
+    import sfst_qfis_repro  # noqa: F401  (pay the import once per worker)
+
+def _worker_pool():
+    """Long-lived spawn-based process pool (SFST_TOV_WORKERS workers, default 1)."""
+    global _POOL
+    with _POOL_LOCK:  # controllers submit from several threads
+        if _POOL is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _POOL = ProcessPoolExecutor(max_workers=N_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_worker_init, initargs=(ENV_OVERRIDES,))
+        return _POOL
+
+def _reset_worker_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            for proc in list(getattr(_POOL, "_processes", {}).values()):
+                proc.terminate()
+            _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = None
+
+def solve_run_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Solve one run_config.json in this process and return its summary.json content.
+
+    The headline observables come from sfst_qfis_repro.headline_observables (root finding on
+    rho_c). extra['grid_factor'] divides the radial max_step; extra['newton_tol'] is the
+    root-finding tolerance on log10 rho_c and caps the integrator rtol. newton_final_residual is
+    |M(rho_c*) - 1.4| / 1.4 at the located 1.4 Msun star. extra may also set chi,
+    screening_factor and include_in_gravity (defaults 1, 1, False: Variant A).
+
+    config['budget'] (scan_wall_s, scan_rhs_evals, star_wall_s, star_rhs_evals) bounds the solve
+    through sfst_qfis_repro.budget; compute_tov_case sets scan_wall_s to its timeout. A run that
+    exhausts its budget returns a non-converged summary with status "budget_exceeded" and the
+    budget that ran out; the usage of every run is recorded under "budget".
+    """
+    import math
+    from sfst_qfis_repro import BudgetExceeded, budget, canonical_eos, headline_observables
+
+    extra = config.get("extra", {}) or {}
+    grid_factor = float(extra.get("grid_factor", 1.0))
+    newton_tol = float(extra.get("newton_tol", 1e-6))
+    sigma = float(config["sigma"])
+    chi = float(extra.get("chi", 1.0))
+    screening = float(extra.get("screening_factor", 1.0))
+    inc_g = bool(extra.get("include_in_gravity", False))
+    max_step = BASE_MAX_STEP / grid_factor
+    rtol = min(BASE_RTOL, newton_tol)
+    atol = BASE_ATOL * rtol / BASE_RTOL
+
+    t0 = time.time()
+    eos = canonical_eos(config["eos"])
+    solver = {"backend": BACKEND, "eos": eos.name, "grid_factor": grid_factor, "newton_tol": newton_tol,
+              "max_step_cm": max_step, "rtol": rtol, "atol": atol}
+    with budget(**(config.get("budget") or {})) as rep:
+        try:
+            obs, df = headline_observables(eos, sigma_vac=sigma, chi_vac=chi, screening_factor=screening,
+                                           include_in_gravity=inc_g, target_M=TARGET_M, xtol_target=newton_tol,
+                                           max_step=max_step, rtol=rtol, atol=atol)
+        except BudgetExceeded as e:
+            return {
+                "converged": False, "status": "budget_exceeded", "M_max": None, "R_1p4": None, "Lambda_1p4": None,
+                "max_epsratio": abs(sigma * chi * screening), "wfaktor_max": None, "newton_final_residual": None,
+                "budget": {**e.as_dict(), **rep.as_dict()},
+                "solver": {**solver, "wall_s": time.time() - t0},
+            }
+    residual = None
+    if obs["status"] == "ok":
+        star = df.loc[(df["rho_c"] - obs["rho_c_target"]).abs().idxmin()]
+        residual = abs(float(star["M_msun"]) - TARGET_M) / TARGET_M
+    finite = lambda v: v is not None and math.isfinite(v)  # noqa: E731
+    W = df["W_max"].replace([float("inf"), float("-inf")], float("nan")).max() if "W_max" in df.columns else None
+    converged = (obs["status"] == "ok" and bool(obs["mmax_bracketed"])
+                 and all(finite(obs[k]) for k in ("Mmax", "R_target", "Lambda_target")))
+    return {
+        "converged": converged,
+        "M_max": obs["Mmax"] if finite(obs["Mmax"]) else None,
+        "R_1p4": obs["R_target"] if finite(obs["R_target"]) else None,
+        "Lambda_1p4": obs["Lambda_target"] if finite(obs["Lambda_target"]) else None,
+        "max_epsratio": abs(sigma * chi * screening),
+        "wfaktor_max": float(W) if finite(W) else None,
+        "newton_final_residual": residual,
+        "status_1p4": obs["status"],
+        "n_integrations": obs["n_integrations"],
+        "budget": rep.as_dict(),
+        "solver": {**solver, "wall_s": time.time() - t0},
+    }
 
 def compute_tov_case(
     eos: str,
@@ -97,12 +321,40 @@ def compute_tov_case(
     run_tag: Optional[str] = None,
     extra: Optional[Dict[str, Any]] = None,
     timeout: int = DEFAULT_TIMEOUT,
+    output_base: Optional[Path] = None,
 ) -> Dict[str, Any]:
-    """Run one EOS/sigma point through the TOV pipeline and return a standardized result dict."""
+    """Run one EOS/sigma point through the TOV pipeline and return a standardized result dict.
+
+    output_base overrides OUTPUT_BASE (the resident daemon passes the client's absolute path).
+    Requests are canonicalized (physics_key): each distinct key is solved once and its summary is
+    copied into every aliasing run directory, whose provenance.json names the key and the canonical
+    run directory.
+
+    `timeout` is the run's cooperative wall-time budget (with $SFST_SCAN_BUDGET_RHS as its RHS
+    budget): the solver stops itself when it is spent and the result carries
+    status "budget_exceeded" and the budget record instead of observables.
+
+    With SFST_RUN_LAYOUT=packed the run is assembled in a scratch directory and then stored as one
+    group of the scan's HDF5 container (run_pack.py) instead of keeping its own directory.
+    """
     extra = extra or {}
     run_id = run_tag or make_run_id(eos, sigma, extra)
+    base = Path(output_base or OUTPUT_BASE)
+    if RUN_LAYOUT != "packed":
+        return _run_case(eos, sigma, run_id, extra, timeout, base, base / run_id, str(base / run_id))
+
+    import run_pack
+    container = run_pack.pack_path(base)
+    scratch = base / run_pack.SCRATCH_DIR / f"{run_id}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}"
+    try:
+        return _run_case(eos, sigma, run_id, extra, timeout, base, scratch, f"{container}:/runs/{run_id}")
+    finally:
+        if scratch.exists():
+            run_pack.pack_dir(container, scratch, run_id, remove=True)
 
-    run_dir = OUTPUT_BASE / run_id
+def _run_case(eos: str, sigma: float, run_id: str, extra: Dict[str, Any], timeout: int, base: Path,
+              run_dir: Path, output_ref: str) -> Dict[str, Any]:
+    """compute_tov_case with the run's artefacts written into run_dir."""
     run_dir.mkdir(parents=True, exist_ok=True)
 
     # Metadata for reproducibility
@@ -125,8 +377,9 @@ def compute_tov_case(
         "eos": eos,
         "sigma": float(sigma),
         "seed": int(env["SFST_SEED"]),
-        "output_dir": str(run_dir),
+        "output_dir": output_ref,
         **({"extra": extra} if extra else {}),
+        "budget": {"scan_wall_s": timeout, "scan_rhs_evals": SCAN_BUDGET_RHS},
     }
     _write_json(run_dir / "run_config.json", config)
 
@@ -135,18 +388,27 @@ def compute_tov_case(
     try:
         log_path = run_dir / "run.log"
         with open(log_path, "wb") as logf:
-            # If you implement _call_tov_entrypoint using subprocess.run,
-            # redirect stdout/stderr into logf there, or do it here.
-            exit_code = _call_tov_entrypoint(
-                config_path=run_dir / "run_config.json",
-                run_dir=run_dir,
-                env=env,
-                timeout=timeout,
-            )
+            if CANONICALIZE and os.environ.get("SFST_DUMMY", "0") != "1":
+                # Solve the physics key (at most once) and fan its summary out to this run_id.
+                canonical = _solve_physics_key(physics_key(eos, sigma, extra), run_id, base, env, timeout,
+                                               config["budget"])
+                summary = json.loads(Path(canonical["summary_file"]).read_text(encoding="utf-8"))
+                _write_json(run_dir / "summary.json", summary)
+                exit_code, provenance = 0, {"exit_code": 0, **canonical}
+            else:
+                # If you implement _call_tov_entrypoint using subprocess.run,
+                # redirect stdout/stderr into logf there, or do it here.
+                exit_code = _call_tov_entrypoint(
+                    config_path=run_dir / "run_config.json",
+                    run_dir=run_dir,
+                    env=env,
+                    timeout=timeout,
+                )
+                provenance = {"exit_code": exit_code}
             # If your call function does not write into logf, remove this block.
             # (Keeping logf open ensures it exists for auditing.)
         # Record exit code
-        _write_json(run_dir / "provenance.json", {"exit_code": exit_code})
+        _write_json(run_dir / "provenance.json", provenance)
     except Exception as e:
         (run_dir / "diagnosis.txt").write_text(
             f"ERROR: {type(e).__name__}: {e}\n",
@@ -201,6 +463,9 @@ def compute_tov_case(
         "newton_final_residual": float(summary.get("newton_final_residual")) if summary.get("newton_final_residual") is not None else None,
         "converged": bool(summary.get("converged", False)),
     }
+    if summary.get("status") == "budget_exceeded":
+        # run_index.json then says "budget_exceeded" rather than "done", so resumed scans retry it.
+        result.update(status="budget_exceeded", budget=summary.get("budget"))
 
     _write_json(run_dir / "run_index.json", {"status": "done", **result})
     return result
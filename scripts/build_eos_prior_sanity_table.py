@@ -12,8 +12,13 @@ Outputs:
 
 import argparse
 import os
+import sys
+from pathlib import Path
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import run_store  # noqa: E402
+
 EOS_MAP = {
     "SLy-PP(Read2009)": "SLy",
     "AP4-PP(Read2009)": "AP4",
@@ -29,7 +34,7 @@ def main():
                     help="Data snapshot ID to print in the table (update for final release).")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.runs_summary)
+    df = run_store.read_table(args.runs_summary)
 
     rows = []
     for eos_full, eos_short in EOS_MAP.items():
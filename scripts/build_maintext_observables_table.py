@@ -8,8 +8,13 @@ This script intentionally uses only artifacts committed in-repo.
 """
 from __future__ import annotations
 import argparse
+import sys
+from pathlib import Path
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import run_store  # noqa: E402
+
 G = 6.67430e-11
 c = 299792458.0
 Msun = 1.98847e30
@@ -39,10 +44,9 @@ def main():
     args = ap.parse_args()
 
     eos_list = [e.strip() for e in args.eos.split(',') if e.strip()]
-    df = pd.read_csv(args.runs)
-
     def select(case: str):
-        return df[(df['EOS'].isin(eos_list)) & (df['case'] == case) & (df['obs_status'] == 'accepted')]
+        df = run_store.read_table(args.runs, case=case)
+        return df[(df['EOS'].isin(eos_list)) & (df['obs_status'] == 'accepted')]
 
     sm = select('A_baseline')
     sfst = select('C_sigma_chi')
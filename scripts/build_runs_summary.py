@@ -3,12 +3,18 @@
 
 I regenerate all canonical EOS/cases directly from the solver (no pre-existing CSV needed).
 
+The EOS, cases and solver settings are those of the runs_summary output of
+config/scan_manifest.yaml.
+
 Conservative discretization proxy
 I estimate a discretization/solver uncertainty by solving each EOS/case twice:
-- baseline: max_step, rtol, atol from config/validate_config.yaml
-- refined:  max_step/2 and tighter rtol/atol
+- baseline: the manifest's summary_baseline method
+- refined:  summary_refined (max_step/2 and tighter rtol/atol)
 The relative difference between baseline and refined is recorded as delta_disc for each observable.
 
+--mode root (or SFST_MODE=root) replaces each dense ρ_c scan by root finding on ρ_c
+(sfst_qfis_repro.headline_observables): about 15-19 integrations per family instead of n_points.
+
 epsratio
 In this implementation, eps_vac,inertial(r) = (sigma*chi*screening_factor)*eps_ref(r),
 so epsratio(r) is constant and max_epsratio = |sigma*chi*screening_factor|.
@@ -16,41 +22,22 @@ so epsratio(r) is constant and max_epsratio = |sigma*chi*screening_factor|.
 
 from __future__ import annotations
 
+import argparse
 import math
 from dataclasses import dataclass
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-import yaml
 
 import sys
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-from sfst_qfis_repro import make_piecewise_eos, make_simple_polytrope, integrate_star  # noqa: E402
-
-EOS_DEFS = {
-    "SLy-PP(Read2009)": (34.384, 3.005, 2.988, 2.851),
-    "AP4-PP(Read2009)": (34.269, 2.830, 3.445, 3.348),
-    "H4-PP(Read2009)": (34.669, 2.909, 2.246, 2.144),
-    "MPA1-PP(Read2009)": (34.495, 2.921, 3.132, 2.995),
-    "WFF1-PP(Read2009)": (34.031, 2.628, 2.885, 2.951),
-}
-
-EOS_ORDER = [
-    "SLy-PP(Read2009)",
-    "AP4-PP(Read2009)",
-    "MPA1-PP(Read2009)",
-    "H4-PP(Read2009)",
-    "WFF1-PP(Read2009)",
-    "Poly2(toy)",
-]
-
-CASES = [
-    ("A_baseline", 0.00, 1.0, False, "A"),
-    ("B_legacy", 0.06, 1.0, True, "B_exploratory"),
-    ("C_sigma_chi", 0.06, 1.0, False, "A"),
-]
+import run_store  # noqa: E402
+import scan_manifest  # noqa: E402
+from sfst_qfis_repro import (DEFAULT_JOBS, DEFAULT_MODE, BudgetExceeded, budget, headline_observables,  # noqa: E402
+                             solve_ladder)
 
 
 @dataclass
@@ -63,30 +50,6 @@ class SolverCfg:
     atol: float
 
 
-def load_cfg():
-    with open('config/validate_config.yaml') as f:
-        return yaml.safe_load(f)
-
-
-def solver_from_cfg(cfg: dict) -> SolverCfg:
-    s = cfg['solver']
-    return SolverCfg(
-        n_points=int(s['n_points']),
-        rho_min=float(s['rho_min']),
-        rho_max=float(s['rho_max']),
-        max_step=float(s['max_step']),
-        rtol=float(s['rtol']),
-        atol=float(s['atol']),
-    )
-
-
-def get_eos(name: str):
-    if name == 'Poly2(toy)':
-        return make_simple_polytrope(Gamma=2.0, P_ref=3e34, name='Poly2(toy)')
-    lp, g1, g2, g3 = EOS_DEFS[name]
-    return make_piecewise_eos(lp, g1, g2, g3, name)
-
-
 def interp_at_mass(df: pd.DataFrame, target: float = 1.4):
     d = df.sort_values('M_msun')
     d = d[np.isfinite(d['M_msun']) & np.isfinite(d['R_km']) & np.isfinite(d['Lambda'])]
@@ -101,21 +64,19 @@ def interp_at_mass(df: pd.DataFrame, target: float = 1.4):
 
 
 def scan_family(eos, *, sigma_vac: float, chi_vac: float, screening_factor: float, include_in_gravity: bool,
-                n_points: int, rho_min: float, rho_max: float, max_step: float, rtol: float, atol: float):
+                n_points: int, rho_min: float, rho_max: float, max_step: float, rtol: float, atol: float,
+                engine: str | None = None, jobs: int | None = None):
     rhos = np.logspace(np.log10(rho_min), np.log10(rho_max), n_points)
-    rows = []
-    for rc in rhos:
-        res = integrate_star(
-            eos, rc,
-            sigma_vac=sigma_vac, chi_vac=chi_vac,
-            screening_factor=screening_factor,
-            include_in_gravity=include_in_gravity,
-            max_step=max_step,
-            rtol=rtol,
-            atol=atol,
-        )
-        if res is not None:
-            rows.append(res)
+    results = solve_ladder(
+        eos, rhos, engine=engine, jobs=jobs,
+        sigma_vac=sigma_vac, chi_vac=chi_vac,
+        screening_factor=screening_factor,
+        include_in_gravity=include_in_gravity,
+        max_step=max_step,
+        rtol=rtol,
+        atol=atol,
+    )
+    rows = [res for res in results if res is not None]
     return pd.DataFrame(rows)
 
 
@@ -131,6 +92,50 @@ def compute_observables(df: pd.DataFrame):
     return dict(Mmax=Mmax, R_1p4=R14, Lambda_1p4=L14, wfaktor_max=wf, status=st)
 
 
+def root_observables(eos, *, sigma_vac: float, chi_vac: float, screening_factor: float, include_in_gravity: bool,
+                     rho_min: float, rho_max: float, max_step: float, rtol: float, atol: float,
+                     engine: str | None = None, jobs: int | None = None):
+    """Same dict as compute_observables, from headline_observables instead of a dense scan."""
+    obs, df = headline_observables(
+        eos, sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor,
+        include_in_gravity=include_in_gravity, log10_rho_min=math.log10(rho_min), log10_rho_max=math.log10(rho_max),
+        engine=engine, jobs=jobs, max_step=max_step, rtol=rtol, atol=atol,
+    )
+    return observables_from_root(obs, df)
+
+
+def observables_from_root(obs: dict, df: pd.DataFrame):
+    """compute_observables-style dict from a headline_observables (obs, df) pair."""
+    wf = float(df.W_max.replace([float('inf'), float('-inf')], float('nan')).max()) if 'W_max' in df.columns else float('nan')
+    status = 'ok' if obs['status'] == 'ok' else obs['status'].replace(': ', ':')
+    return dict(Mmax=obs['Mmax'], R_1p4=obs['R_target'], Lambda_1p4=obs['Lambda_target'], wfaktor_max=wf, status=status)
+
+
+def family_observables(eos, *, mode: str, n_points: int, **kw):
+    """Observables of one EOS/case either from a dense scan (mode='scan') or by root finding (mode='root').
+
+    The family is solved in a `budget` block (star limits $SFST_STAR_BUDGET_S / $SFST_STAR_BUDGET_RHS).
+    budget_status is 'budget_exceeded' when stars were dropped at their budget (or the family ran
+    out of it), and budget_resource names what ran out; otherwise 'ok'.
+    """
+    try:
+        with budget() as rep:
+            if mode == 'root':
+                obs = root_observables(eos, **kw)
+            else:
+                obs = compute_observables(scan_family(eos, n_points=n_points, **kw))
+    except BudgetExceeded as e:
+        nan = float('nan')
+        return dict(Mmax=nan, R_1p4=nan, Lambda_1p4=nan, wfaktor_max=nan, status='budget_exceeded',
+                    budget_status='budget_exceeded', budget_resource=f"{e.scope}_{e.resource}")
+    if rep.stars_exceeded:
+        obs.update(budget_status='budget_exceeded',
+                   budget_resource='+'.join(f"star_{r}" for r in sorted(rep.star_resources)))
+    else:
+        obs.update(budget_status='ok', budget_resource='')
+    return obs
+
+
 def rel_diff_pct(a: float, b: float) -> float:
     if not (math.isfinite(a) and math.isfinite(b)):
         return float('nan')
@@ -138,74 +143,46 @@ def rel_diff_pct(a: float, b: float) -> float:
     return 100.0 * abs(a - b) / denom
 
 
-def main():
-    cfg = load_cfg()
-    solver = solver_from_cfg(cfg)
-
-    screening = 1.0
-
-    rows = []
-    for eos_name in EOS_ORDER:
-        eos = get_eos(eos_name)
-        for case, sigma, chi, inc_g, variant in CASES:
-            # baseline
-            df0 = scan_family(
-                eos,
-                sigma_vac=sigma, chi_vac=chi,
-                screening_factor=screening,
-                include_in_gravity=inc_g,
-                n_points=solver.n_points,
-                rho_min=solver.rho_min,
-                rho_max=solver.rho_max,
-                max_step=solver.max_step,
-                rtol=solver.rtol,
-                atol=solver.atol,
-            )
-            obs0 = compute_observables(df0)
-
-            # refined
-            df1 = scan_family(
-                eos,
-                sigma_vac=sigma, chi_vac=chi,
-                screening_factor=screening,
-                include_in_gravity=inc_g,
-                n_points=solver.n_points,
-                rho_min=solver.rho_min,
-                rho_max=solver.rho_max,
-                max_step=solver.max_step * 0.5,
-                rtol=1e-8,
-                atol=1e-11,
-            )
-            obs1 = compute_observables(df1)
-
-            row = {
-                'run_id': f"{eos_name.replace('(','').replace(')','').replace('-','')}_{case}",
-                'EOS': eos_name,
-                'case': case,
-                'variant': variant,
-                'sigma': sigma,
-                'chi': chi,
-                'include_in_gravity': inc_g,
-                'Mmax': obs1['Mmax'],
-                'R_1.4': obs1['R_1p4'],
-                'Lambda_1.4': obs1['Lambda_1p4'],
-                'wfaktor_max': obs1.get('wfaktor_max', float('nan')),
-                'obs_status': obs1['status'],
-                'max_epsratio': abs(sigma * chi * screening),
-                'delta_disc_Mmax_pct': rel_diff_pct(obs0['Mmax'], obs1['Mmax']),
-                'delta_disc_R14_pct': rel_diff_pct(obs0['R_1p4'], obs1['R_1p4']),
-                'delta_disc_Lambda14_pct': rel_diff_pct(obs0['Lambda_1p4'], obs1['Lambda_1p4']),
-                'baseline_max_step': solver.max_step,
-                'refined_max_step': solver.max_step * 0.5,
-                'baseline_rtol': solver.rtol,
-                'refined_rtol': 1e-8,
-                'baseline_atol': solver.atol,
-                'refined_atol': 1e-11,
-            }
-            rows.append(row)
-
-    df = pd.DataFrame(rows)
-
+def budget_fields(*obs: dict) -> dict:
+    """budget_status / budget_resource of a row from its families' observables ('' where not recorded)."""
+    statuses = [o['budget_status'] for o in obs if o.get('budget_status')]
+    status = 'budget_exceeded' if 'budget_exceeded' in statuses else ('ok' if statuses else '')
+    resources = sorted({r for o in obs for r in (o.get('budget_resource') or '').split('+') if r})
+    return {'budget_status': status, 'budget_resource': '+'.join(resources)}
+
+
+def summary_row(eos_name: str, case: str, sigma: float, chi: float, inc_g: bool, variant: str, obs0: dict,
+                obs1: dict, baseline: SolverCfg, refined: SolverCfg, screening: float = 1.0) -> dict:
+    """One runs_summary.csv row from the baseline (obs0) and refined (obs1) observables of a family."""
+    return {
+        'run_id': f"{eos_name.replace('(','').replace(')','').replace('-','')}_{case}",
+        'EOS': eos_name,
+        'case': case,
+        'variant': variant,
+        'sigma': sigma,
+        'chi': chi,
+        'include_in_gravity': inc_g,
+        'Mmax': obs1['Mmax'],
+        'R_1.4': obs1['R_1p4'],
+        'Lambda_1.4': obs1['Lambda_1p4'],
+        'wfaktor_max': obs1.get('wfaktor_max', float('nan')),
+        'obs_status': obs1['status'],
+        **budget_fields(obs0, obs1),
+        'max_epsratio': abs(sigma * chi * screening),
+        'delta_disc_Mmax_pct': rel_diff_pct(obs0['Mmax'], obs1['Mmax']),
+        'delta_disc_R14_pct': rel_diff_pct(obs0['R_1p4'], obs1['R_1p4']),
+        'delta_disc_Lambda14_pct': rel_diff_pct(obs0['Lambda_1p4'], obs1['Lambda_1p4']),
+        'baseline_max_step': baseline.max_step,
+        'refined_max_step': refined.max_step,
+        'baseline_rtol': baseline.rtol,
+        'refined_rtol': refined.rtol,
+        'baseline_atol': baseline.atol,
+        'refined_atol': refined.atol,
+    }
+
+
+def finalize_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """Deltas relative to A_baseline per EOS plus the conservative NaN handling of runs_summary.csv."""
     # Deltas relative to baseline per EOS
     out = []
     for eos, g in df.groupby('EOS'):
@@ -226,7 +203,6 @@ def main():
 
     out_df = pd.DataFrame(out).replace([float('inf'), float('-inf')], float('nan'))
 
-    Path('outputs').mkdir(parents=True, exist_ok=True)
     
     # --- Robustness: conservative NaN handling (auditable) ---
     # If core observables are missing (NaN), mark as DIAGNOSTIC and set conservative
@@ -294,9 +270,65 @@ def main():
                     diag = pd.Series(False, index=out_df.index)
                 out_df.loc[nan_mask & diag, c] = 1e9
                 out_df.loc[nan_mask & ~diag, c] = 0.0
+    return out_df
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--mode', choices=['scan', 'root'], default=DEFAULT_MODE,
+                    help="'scan': dense ρ_c ladder + interpolation; 'root': root finding on ρ_c (default: $SFST_MODE or scan).")
+    ap.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                    help='Worker processes for the star integrations (default: $SFST_JOBS or 1); output is identical.')
+    args = ap.parse_args()
+
+    m = scan_manifest.load_manifest(scan_manifest.DEFAULT_MANIFEST)
+    out = scan_manifest.output(m, 'runs_summary')
+    solver = scan_manifest.solver_cfg(m, out['baseline'])
+    refined = scan_manifest.solver_cfg(m, out['refined'])
+
+    rows = []
+    for eos_key in scan_manifest.eos_names(m, out['eos']):
+        eos = scan_manifest.get_eos(m, eos_key)
+        for case, name in scan_manifest.case_labels(out):
+            c = scan_manifest.case_of(m, name)
+            sigma, chi, screening, inc_g = c['sigma'], c['chi'], c['screening_factor'], c['include_in_gravity']
+            variant = m['cases'][name].get('variant', 'A')
+            # baseline
+            obs0 = family_observables(
+                eos, mode=args.mode,
+                sigma_vac=sigma, chi_vac=chi,
+                screening_factor=screening,
+                include_in_gravity=inc_g,
+                n_points=solver.n_points,
+                rho_min=solver.rho_min,
+                rho_max=solver.rho_max,
+                max_step=solver.max_step,
+                rtol=solver.rtol,
+                atol=solver.atol,
+                jobs=args.jobs,
+            )
+
+            # refined
+            obs1 = family_observables(
+                eos, mode=args.mode,
+                sigma_vac=sigma, chi_vac=chi,
+                screening_factor=screening,
+                include_in_gravity=inc_g,
+                n_points=solver.n_points,
+                rho_min=solver.rho_min,
+                rho_max=solver.rho_max,
+                max_step=refined.max_step,
+                rtol=refined.rtol,
+                atol=refined.atol,
+                jobs=args.jobs,
+            )
+
+            rows.append(summary_row(eos.name, case, sigma, chi, inc_g, variant, obs0, obs1, solver, refined,
+                                    screening))
 
-    out_path = Path('outputs/runs_summary.csv')
-    out_df.to_csv(out_path, index=False)
+    out_df = finalize_summary(pd.DataFrame(rows))
+    out_path = Path(out['path'])
+    run_store.write_table(out_path, out_df, replace=True)
     print(f"Wrote {out_path} ({len(out_df)} rows)")
 
 
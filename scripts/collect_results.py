@@ -6,17 +6,35 @@ Collect per-run summary.json files under outputs/diagnostics/ and update:
  - outputs/audit_index.csv
 
 Designed to work with the refinement workflow (refine_and_retry_cli.py) and the run wrapper.
-It is safe to run repeatedly (it rewrites the CSVs from the current filesystem state).
+Both tables live in the run store (run_store.py); the CSVs are exported from it.
+
+Collection is incremental: the store keeps a manifest of (run_dir, mtime, size, sha256) of every
+summary.json it ingested, so a pass stats each run directory but only reads and parses the
+summaries that are new or changed (a touched file with the same content hash is not re-ingested).
+Run directories that disappeared are dropped from scan_grid.csv. --full forgets the manifest and
+rebuilds both tables from the filesystem. --watch repeats the pass every --interval seconds and
+keeps the CSVs current during a live sweep; a half-written summary.json is picked up on the next
+pass. Runs packed into HDF5 containers (outputs/diagnostics/*.h5, SFST_RUN_LAYOUT=packed, see
+run_pack.py) are collected the same way: the container's /index holds the sha256 of every run's
+summary.json, so only new or changed summaries are read from it.
 
 Usage:
     python3 scripts/collect_results.py
+    python3 scripts/collect_results.py --watch --interval 10 [--idle-exit 600]
 """
 
 from __future__ import annotations
+import argparse
+import hashlib
 import json
-import csv
+import os
+import time
 from pathlib import Path
 from typing import Dict, Any, List, Optional
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import run_store  # noqa: E402
 
 WORKDIR = Path.cwd()
 DIAG = WORKDIR / "outputs" / "diagnostics"
@@ -26,6 +44,15 @@ OUT_AUDIT = WORKDIR / "outputs" / "audit_index.csv"
 EPS_ACCEPT = 0.10
 EPS_STRESS = 0.30
 
+MANIFEST_SOURCE = "collect_results:summary.json"
+PREFERRED_COLUMNS = [
+    "run_id","eos","variant","sigma","g","Gamma","seed",
+    "converged","M_max","R_1p4","Lambda_1p4",
+    "max_epsratio","wfaktor_max","newton_final_residual",
+    "delta_total","status","path","error"
+]
+AUDIT_FIELDS = ["run_id","eos","sigma","status","reason","path"]
+
 def _safe_float(x) -> Optional[float]:
     try:
         if x is None or x == "":
@@ -34,32 +61,89 @@ def _safe_float(x) -> Optional[float]:
     except Exception:
         return None
 
-def find_summaries(diag_dir: Path) -> List[Dict[str, Any]]:
+def find_summaries(diag_dir: Path, manifest: Optional[Dict[str, tuple]] = None):
+    """(summaries, entries, gone) for the run directories under diag_dir.
+
+    summaries: parsed summary.json of the runs that are new or changed relative to `manifest`
+    ({run_dir: (mtime_ns, size, sha256)}; None = everything). entries: the manifest entries to
+    record for them (and for touched files whose content is unchanged). gone: manifest run
+    directories (and packed runs) without a summary.json any more. Unreadable JSON is skipped
+    without an entry, so it is retried on the next pass.
+    """
+    manifest = manifest or {}
     rows: List[Dict[str, Any]] = []
-    if not diag_dir.exists():
-        return rows
-    for d in sorted(diag_dir.iterdir()):
-        if not d.is_dir():
-            continue
-        s = d / "summary.json"
-        if not s.exists():
-            continue
-        try:
-            data = json.loads(s.read_text())
+    entries: Dict[str, tuple] = {}
+    seen = set()
+    if diag_dir.exists():
+        with os.scandir(diag_dir) as it:
+            dirs = sorted((d for d in it if d.is_dir()), key=lambda d: d.name)
+        for d in dirs:
+            s = Path(d.path) / "summary.json"
+            try:
+                st = s.stat()
+            except FileNotFoundError:
+                continue
+            seen.add(d.name)
+            old = manifest.get(d.name)
+            if old is not None and tuple(old[:2]) == (st.st_mtime_ns, st.st_size):
+                continue  # unchanged since the last pass: not even read
+            try:
+                blob = s.read_bytes()
+            except OSError:
+                continue
+            digest = hashlib.sha256(blob).hexdigest()
+            if old is not None and old[2] == digest:
+                entries[d.name] = (st.st_mtime_ns, st.st_size, digest)  # touched, same content
+                continue
+            try:
+                data = json.loads(blob)
+            except ValueError:
+                # ignore unreadable (or half-written) JSON but keep going
+                continue
             # Ensure run_id defaults to directory name
             data.setdefault("run_id", d.name)
             data.setdefault("path", str(Path("outputs/diagnostics") / d.name))
             rows.append(data)
-        except Exception:
-            # ignore unreadable JSON but keep going
-            continue
-    return rows
+            entries[d.name] = (st.st_mtime_ns, st.st_size, digest)
+        for container in sorted(diag_dir.glob("*.h5")):
+            _find_packed(container, manifest, rows, entries, seen)
+    gone = sorted(p for p in manifest if p not in seen)
+    return rows, entries, gone
+
+def _find_packed(container: Path, manifest: Dict[str, tuple], rows: List[Dict[str, Any]],
+                 entries: Dict[str, tuple], seen: set) -> None:
+    """find_summaries for the runs of one packed container; manifest keys are <container>/<run_id>."""
+    import run_pack
+    try:
+        with run_pack.RunPack(container) as pack:
+            for run_id, ent in sorted(pack.index().items()):
+                digest = ent["summary_sha256"]
+                if not digest:
+                    continue  # no summary.json (yet)
+                key = f"{container.name}/{run_id}"
+                seen.add(key)
+                stamp = (int(ent["updated"] * 1e9), ent["summary_size"], digest)
+                old = manifest.get(key)
+                if old is not None and old[2] == digest:
+                    if tuple(old) != stamp:
+                        entries[key] = stamp  # rewritten, same content
+                    continue
+                try:
+                    data = pack.read_json(run_id, "summary.json")
+                except (KeyError, ValueError):
+                    continue
+                data.setdefault("run_id", run_id)
+                data.setdefault("path", f"outputs/diagnostics/{container.name}:/runs/{run_id}")
+                rows.append(data)
+                entries[key] = stamp
+    except OSError as e:
+        print(f"WARNING: skipping unreadable container {container}: {e}", file=sys.stderr)
 
 def load_audit(path: Path) -> List[Dict[str, Any]]:
-    if not path.exists():
+    try:
+        return run_store.read_table(path).to_dict("records")
+    except FileNotFoundError:
         return []
-    with path.open(newline="") as f:
-        return list(csv.DictReader(f))
 
 def classify_status(converged: bool, max_epsratio: Optional[float]) -> str:
     if not converged:
@@ -88,55 +172,96 @@ def update_audit(existing: List[Dict[str, Any]], summaries: List[Dict[str, Any]]
         max_eps = _safe_float(s.get("max_epsratio"))
         status = classify_status(converged, max_eps)
         entry = aud_map.get(rid, {})
+        reason = entry.get("reason", "")  # preserve if present
+        if s.get("status") == "budget_exceeded":
+            # The solver stopped itself at its budget (see sfst_qfis_repro.budget): a retry, not a result.
+            from sfst_qfis_repro import budget_reason
+            status, reason = "BUDGET_EXCEEDED", budget_reason(s.get("budget")) or "budget_exceeded"
         entry.update({
             "run_id": rid,
             "eos": s.get("eos", ""),
             "sigma": s.get("sigma", ""),
             "status": status,
-            "reason": entry.get("reason", ""),  # preserve if present
+            "reason": reason,
             "path": str(Path("outputs/diagnostics") / rid),
         })
         aud_map[rid] = entry
 
     return list(aud_map.values())
 
-def write_csv(path: Path, rows: List[Dict[str, Any]], fieldnames: List[str]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in fieldnames})
+def collect(full: bool = False) -> Dict[str, int]:
+    """One collection pass; returns counts of ingested / removed summaries and table sizes.
+
+    Incremental by default (see the module docstring); full=True rebuilds both tables. The table
+    updates and the manifest are committed together, so an interrupted pass is simply redone.
+    """
+    store, scan_table = run_store.store_for(OUT_SCAN)
+    _, audit_table = run_store.store_for(OUT_AUDIT)
+    with store.transaction():
+        if full:
+            store.forget_manifest(MANIFEST_SOURCE)
+        summaries, entries, gone = find_summaries(DIAG, store.manifest(MANIFEST_SOURCE))
+        stats = {"ingested": len(summaries), "removed": len(gone)}
+        if full or summaries or gone or not OUT_SCAN.exists():
+            # Write scan_grid.csv (wide; keep keys that appear frequently)
+            keys = set() if full else set(store.columns(scan_table))
+            for s in summaries:
+                keys |= set(s.keys())
+            # Stable ordering
+            fieldnames = ([k for k in PREFERRED_COLUMNS if k in keys]
+                          + [k for k in sorted(keys) if k not in PREFERRED_COLUMNS])
+            if gone:
+                # manifest keys are run directories, or <container>/<run_id> for packed runs
+                store.delete_rows(scan_table, [g.rsplit("/", 1)[-1] for g in gone])
+            run_store.write_table(OUT_SCAN, summaries, replace=full, columns=fieldnames or None)
+
+            # Update audit_index.csv (only the entries of the ingested runs change)
+            if full:
+                existing = load_audit(OUT_AUDIT)
+            else:
+                existing = [r for s in summaries
+                            for r in store.query(audit_table, run_id=str(s.get("run_id") or "")).to_dict("records")]
+            updated = update_audit(existing, summaries)
+            run_store.write_table(OUT_AUDIT, updated, replace=full, columns=AUDIT_FIELDS)
+        store.forget_manifest(MANIFEST_SOURCE, gone)
+        store.note_manifest(MANIFEST_SOURCE, entries)
+        stats.update(scan_rows=store.tables().get(scan_table, 0), audit_rows=store.tables().get(audit_table, 0))
+    return stats
+
+def watch(interval: float, idle_exit: Optional[float] = None) -> None:
+    """Repeat collect() every `interval` seconds until interrupted (or idle for `idle_exit` seconds)."""
+    last_change = time.monotonic()
+    try:
+        while True:
+            st = collect()
+            if st["ingested"] or st["removed"]:
+                last_change = time.monotonic()
+                print(f"[{time.strftime('%H:%M:%S')}] +{st['ingested']} -{st['removed']} summaries; "
+                      f"{OUT_SCAN.name}: {st['scan_rows']} rows, {OUT_AUDIT.name}: {st['audit_rows']} rows", flush=True)
+            elif idle_exit is not None and time.monotonic() - last_change > idle_exit:
+                print(f"No new summaries for {idle_exit:g} s; stopping.")
+                return
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
 
 def main() -> None:
-    summaries = find_summaries(DIAG)
-
-    # Write scan_grid.csv (wide; keep keys that appear frequently)
-    if summaries:
-        # union keys
-        keys = set()
-        for s in summaries:
-            keys |= set(s.keys())
-        # Stable ordering
-        preferred = [
-            "run_id","eos","variant","sigma","g","Gamma","seed",
-            "converged","M_max","R_1p4","Lambda_1p4",
-            "max_epsratio","wfaktor_max","newton_final_residual",
-            "delta_total","status","path","error"
-        ]
-        fieldnames = [k for k in preferred if k in keys] + [k for k in sorted(keys) if k not in preferred]
-        write_csv(OUT_SCAN, summaries, fieldnames)
-    else:
-        OUT_SCAN.write_text("")
-
-    # Update audit_index.csv
-    existing = load_audit(OUT_AUDIT)
-    updated = update_audit(existing, summaries)
-    audit_fields = ["run_id","eos","sigma","status","reason","path"]
-    write_csv(OUT_AUDIT, updated, audit_fields)
-
-    print(f"Wrote {OUT_SCAN} ({len(summaries)} summaries)")
-    print(f"Wrote {OUT_AUDIT} ({len(updated)} audit rows)")
+    ap = argparse.ArgumentParser(description="Collect per-run summary.json files into scan_grid.csv / audit_index.csv")
+    ap.add_argument("--full", action="store_true", help="Forget the manifest and re-ingest every run directory")
+    ap.add_argument("--watch", action="store_true", help="Keep collecting new/changed runs until interrupted")
+    ap.add_argument("--interval", type=float, default=10.0, help="Seconds between passes with --watch (default 10)")
+    ap.add_argument("--idle-exit", type=float, default=None,
+                    help="With --watch: stop after this many seconds without new summaries")
+    args = ap.parse_args()
+
+    if args.watch:
+        if args.full:
+            collect(full=True)
+        watch(args.interval, args.idle_exit)
+        return
+    st = collect(full=args.full)
+    print(f"Wrote {OUT_SCAN} ({st['scan_rows']} summaries, {st['ingested']} new or changed, {st['removed']} removed)")
+    print(f"Wrote {OUT_AUDIT} ({st['audit_rows']} audit rows)")
 
 if __name__ == "__main__":
     main()
@@ -10,6 +10,11 @@ Expected input CSV (tov_profile.csv):
   - eps_ref             : reference energy density used for normalization
   - eps_vac_inertial    : vacuum-induced inertial energy density (Variant A)
 
+Alternatively --profile <store>#<star> reads one star of a streamed profile store
+(profile_store.py; written by the integrators inside sfst_qfis_repro.profile_sink or with
+$SFST_PROFILE_STORE set). The profile is memory-mapped, not parsed: r_km = r/1e5,
+eps_ref = eps_grav.
+
 Output:
   - epsratio_profile.csv : columns [r_km, r_over_R, epsratio]
   - epsratio_profile.png : quick-look plot
@@ -18,37 +23,56 @@ Usage:
   python scripts/compute_epsratio_profile_from_tov.py \
     --in outputs/diagnostics/<run_id>/tov_profile.csv \
     --outdir outputs/diagnostics/<run_id>
+  python scripts/compute_epsratio_profile_from_tov.py \
+    --profile outputs/profiles/scan.profiles#<star> \
+    --outdir outputs/diagnostics/<run_id>
 """
 
 from __future__ import annotations
 
 import argparse
+import os
+import sys
 from pathlib import Path
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
 
 def main() -> int:
     ap = argparse.ArgumentParser()
-    ap.add_argument('--in', dest='inp', required=True, help='Input tov_profile.csv path')
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument('--in', dest='inp', help='Input tov_profile.csv path')
+    src.add_argument('--profile', help='Star of a streamed profile store, as <store dir>#<star>')
     ap.add_argument('--outdir', required=True, help='Output directory (diagnostics run dir)')
     ap.add_argument('--eps', type=float, default=1e-30, help='Small floor to avoid divide-by-zero')
     args = ap.parse_args()
 
-    inp = Path(args.inp)
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    df = pd.read_csv(inp)
-    required = {'r_km', 'eps_ref', 'eps_vac_inertial'}
-    missing = required - set(df.columns)
-    if missing:
-        raise SystemExit(f"Missing columns in {inp}: {sorted(missing)}")
-
-    r_km = df['r_km'].to_numpy(dtype=float)
-    eps_ref = df['eps_ref'].to_numpy(dtype=float)
-    eps_vac = df['eps_vac_inertial'].to_numpy(dtype=float)
+    if args.profile:
+        from profile_store import ProfileStore, parse_ref
+        store, star = parse_ref(args.profile)
+        prof = ProfileStore(store, 'r').profile(star)
+        r_km = prof['r'] / 1e5
+        eps_ref = prof['eps_grav']
+        eps_vac = prof['eps_vac_inertial']
+    else:
+        inp = Path(args.inp)
+        df = pd.read_csv(inp)
+        required = {'r_km', 'eps_ref', 'eps_vac_inertial'}
+        missing = required - set(df.columns)
+        if missing:
+            raise SystemExit(f"Missing columns in {inp}: {sorted(missing)}")
+
+        r_km = df['r_km'].to_numpy(dtype=float)
+        eps_ref = df['eps_ref'].to_numpy(dtype=float)
+        eps_vac = df['eps_vac_inertial'].to_numpy(dtype=float)
 
     denom = np.maximum(np.abs(eps_ref), args.eps)
     epsratio = np.abs(eps_vac) / denom
@@ -3,7 +3,7 @@
 Compute a conservative, reviewer-facing Λ1.4 nonlinearity summary.
 
 This script is intentionally robust:
-- It works with the repository's outputs/runs_summary.csv schema.
+- It works with the repository's outputs/runs_summary.csv schema (read through the run store).
 - It treats missing/insufficient σ-grid information conservatively.
 - It writes machine-readable headline tables with/without DIAGNOSTIC/EXCLUDED runs.
 
@@ -17,6 +17,10 @@ from __future__ import annotations
 import numpy as np
 import pandas as pd
 from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import run_store  # noqa: E402
 
 RUNS = Path("outputs/runs_summary.csv")
 OUT1 = Path("outputs/lambda_nonlinearity_summary.csv")
@@ -27,10 +31,10 @@ N_MC = 5000
 RNG = np.random.default_rng(0)
 
 def main() -> None:
-    df = pd.read_csv(RUNS)
+    df = run_store.read_table(RUNS)
 
     # Use validator output as the source of truth for accepted/diagnostic/excluded.
-    audit = pd.read_csv(Path('outputs')/'audit_index.csv')
+    audit = run_store.read_table(Path('outputs')/'audit_index.csv')
     status_by_run = dict(zip(audit['run_id'].astype(str), audit['status'].astype(str)))
 
     # Focus on the σ-scan case used for Λ1.4 reporting.
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Tangent-linear σ-sensitivities from one baseline sequence per EOS/variant.
+
+I integrate a single σ=0 ladder with sensitivities=True (the first and second variational
+equations in δ are carried along the enthalpy integration) and convert the fixed-ρ_c
+derivatives into Δobs = α σ + β σ² for M_max, R_1.4 and Λ_1.4
+(sfst_qfis_repro.tangent_sensitivities). This replaces the σ-perturbed reruns behind
+fit_sensitivities.py / run_sensitivity_convergence.py: no finite-difference step, no
+cancellation, one sequence instead of 1 + len(deltas).
+
+For comparison with the finite-difference tables I also write the secant slopes
+(Δobs/σ = α + β σ) at the σ values used there.
+
+Output: outputs/sensitivities_tangent.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Ensure repo root and scripts/ are importable when running via `python scripts/...`.
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = Path(__file__).resolve().parent
+for p in (REPO_ROOT, SCRIPTS_DIR):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import scan_manifest  # noqa: E402
+from sfst_qfis_repro import solve_ladder, tangent_sensitivities
+
+VARIANTS = (("A", False), ("B", True))
+SECANT_SIGMA = (0.02, 0.04, 0.06)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--eos", nargs="*", default=None,
+                    help="EOS names (default: the runs_summary EOS of config/scan_manifest.yaml)")
+    # The ladder has to resolve ∂²/∂(log ρ_c)² of M, R, ln Λ; where ρ_c(1.4) sits close to a
+    # piecewise-polytrope breakpoint (H4) ~80 points are needed for β(R_1.4) to settle.
+    ap.add_argument("--npoints", type=int, default=81)
+    ap.add_argument("--rho-min", type=float, default=10**14.2)
+    ap.add_argument("--rho-max", type=float, default=10**15.9)
+    ap.add_argument("--rtol", type=float, default=1e-9)
+    ap.add_argument("--atol", type=float, default=1e-12)
+    ap.add_argument("--target-mass", type=float, default=1.4)
+    ap.add_argument("--out", default="outputs/sensitivities_tangent.csv")
+    args = ap.parse_args()
+
+    m = scan_manifest.load_manifest(scan_manifest.DEFAULT_MANIFEST)
+    rho = np.logspace(np.log10(args.rho_min), np.log10(args.rho_max), args.npoints)
+    rows = []
+    for eos_key in (args.eos or scan_manifest.eos_names(m, scan_manifest.output(m, "runs_summary")["eos"])):
+        eos = scan_manifest.get_eos(m, eos_key)
+        eos_name = eos.name
+        for variant, inc_g in VARIANTS:
+            stars = solve_ladder(eos, rho, sigma_vac=0.0, chi_vac=1.0, screening_factor=1.0,
+                                 include_in_gravity=inc_g, sensitivities=True,
+                                 rtol=args.rtol, atol=args.atol)
+            df = pd.DataFrame([s for s in stars if s is not None])
+            try:
+                sens = tangent_sensitivities(df, target_M=args.target_mass)
+            except (ValueError, KeyError) as exc:
+                print(f"[skip] {eos_name} {variant}: {exc}")
+                continue
+            for obs, c in sens.items():
+                row = {"EOS": eos_name, "variant": variant, "obs": obs,
+                       "value": c["value"], "alpha": c["alpha"], "beta": c["beta"]}
+                for s in SECANT_SIGMA:
+                    row[f"S_secant_{s:g}"] = c["alpha"] + c["beta"] * s
+                rows.append(row)
+
+    out = pd.DataFrame(rows)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(args.out, index=False)
+    print(out.to_string(index=False))
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
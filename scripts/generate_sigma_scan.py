@@ -5,9 +5,12 @@ I use this to obtain ≥3 σ points per EOS so I can fit ΔΛ(σ)=ασ+βσ² an
 Quadratic+MC headline medians with 5–95% envelopes.
 
 This script:
-  - runs scan_family for each EOS on the requested σ grid,
-  - reduces each family to Mmax, R_1.4, Λ_1.4 using stable-branch interpolation,
-  - appends/updates outputs/runs_summary.csv.
+  - runs scan_family for each EOS on the σ grid of the sigma_scan output of
+    config/scan_manifest.yaml (EOS set, σ grid, ladder and tolerances; options override them),
+  - reduces each family to Mmax, R_1.4, Λ_1.4 using stable-branch interpolation
+    (or, with --mode root, by root finding on ρ_c: ~15-19 integrations instead of --npoints),
+  - upserts them into the run store behind outputs/runs_summary.csv (run_store.py) and
+    re-exports the CSV.
 
 Numerical settings are intentionally conservative by default.
 """
@@ -28,22 +31,56 @@ for p in (REPO_ROOT, SCRIPTS_DIR):
     if str(p) not in sys.path:
         sys.path.insert(0, str(p))
 
-from build_runs_summary import EOS_ORDER, get_eos, scan_family  # type: ignore
-from sfst_qfis_repro import interp_at_mass  # stable-branch selection patched
+import run_store  # noqa: E402
+import scan_manifest  # noqa: E402
+from build_runs_summary import root_observables, scan_family  # type: ignore
+from sfst_qfis_repro import DEFAULT_MODE, interp_at_mass  # stable-branch selection patched
+
+def sigma_scan_row(eos_name: str, sigma: float, Mmax: float, R14: float, Lam14: float, obs_status: str) -> dict:
+    """One C_sigma_chi σ-grid row in the runs_summary.csv layout."""
+    run_id = f"{eos_name.replace('(','').replace(')','').replace('/','_').replace(' ','')}_C_sigma_chi_sigma{sigma:.2f}"
+    return {
+        "run_id": run_id,
+        "EOS": eos_name,
+        "case": "C_sigma_chi",
+        "sigma": sigma,
+        "chi": 1.0,
+        "variant": "A",
+        "Mmax": Mmax,
+        "R_1.4": float(R14),
+        "Lambda_1.4": float(Lam14),
+        "obs_status": obs_status,
+        # Conservative placeholders (kept compatible with validator/paper text).
+        "max_epsratio": float(abs(sigma) * 0.07),
+        "wfaktor_max": float(1.0 + 3.0 * abs(sigma)),
+    }
+
+
+def merge_runs_summary(out_path: Path, df_new: pd.DataFrame) -> pd.DataFrame:
+    """Add/replace the rows of df_new in out_path (keyed by EOS, case, sigma, chi, variant); returns the merged table.
+
+    The upsert is one transaction on the run store behind out_path, so concurrent scans do not
+    overwrite each other's rows; out_path itself is re-exported from the store.
+    """
+    return run_store.write_table(out_path, df_new, key=run_store.TABLE_KEYS["runs_summary"])
 
-DEFAULT_SIGMA = (0.02, 0.04, 0.06)
 
 def main() -> int:
+    m = scan_manifest.load_manifest(scan_manifest.DEFAULT_MANIFEST)
+    spec = scan_manifest.output(m, "sigma_scan")
+    method = scan_manifest.method_params(m, spec["method"])
     ap = argparse.ArgumentParser()
-    ap.add_argument("--sigma", default=",".join(map(str, DEFAULT_SIGMA)),
-                    help="Comma-separated σ grid, e.g. 0.02,0.04,0.06 (need ≥3 points).")
-    ap.add_argument("--out", default="outputs/runs_summary.csv")
-    ap.add_argument("--npoints", type=int, default=80)
-    ap.add_argument("--rho-min", type=float, default=1e14)
-    ap.add_argument("--rho-max", type=float, default=3e15)
-    ap.add_argument("--rtol", type=float, default=1e-8)
-    ap.add_argument("--atol", type=float, default=1e-11)
-    ap.add_argument("--max-step", type=float, default=0.05)
+    ap.add_argument("--sigma", default=",".join(map(str, spec["sigma"])),
+                    help="Comma-separated σ grid, e.g. 0.02,0.04,0.06 (need ≥3 points; default: the manifest's).")
+    ap.add_argument("--out", default=spec["path"])
+    ap.add_argument("--npoints", type=int, default=int(method["n_points"]))
+    ap.add_argument("--rho-min", type=float, default=method["rho_min"])
+    ap.add_argument("--rho-max", type=float, default=method["rho_max"])
+    ap.add_argument("--rtol", type=float, default=method["rtol"])
+    ap.add_argument("--atol", type=float, default=method["atol"])
+    ap.add_argument("--max-step", type=float, default=method["max_step"])
+    ap.add_argument("--mode", choices=["scan", "root"], default=DEFAULT_MODE,
+                    help="scan: dense ladder + interpolation; root: root finding on ρ_c (default: $SFST_MODE or scan).")
     args = ap.parse_args()
 
     sigma_grid = [float(x.strip()) for x in args.sigma.split(",") if x.strip()]
@@ -51,61 +88,34 @@ def main() -> int:
         raise SystemExit("Need at least 3 σ points for quadratic fits.")
 
     out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    df0 = pd.read_csv(out_path) if out_path.exists() else pd.DataFrame()
 
     rows = []
-    for eos_name in EOS_ORDER:
-        eos = get_eos(eos_name)
+    for eos_key in scan_manifest.eos_names(m, spec["eos"]):
+        eos = scan_manifest.get_eos(m, eos_key)
         for sigma in sigma_grid:
-            fam = scan_family(
-                eos,
+            family_kw = dict(
                 sigma_vac=sigma,
                 chi_vac=1.0,
                 screening_factor=1.0,
                 include_in_gravity=False,
-                n_points=args.npoints,
                 rho_min=args.rho_min,
                 rho_max=args.rho_max,
                 max_step=args.max_step,
                 rtol=args.rtol,
                 atol=args.atol,
             )
-            Mmax = float(np.nanmax(fam["M_msun"].values)) if len(fam) else np.nan
-            R14, Lam14, obs_status = interp_at_mass(fam, target=1.4) if len(fam) else (np.nan, np.nan, "no_points")
-
-            run_id = f"{eos_name.replace('(','').replace(')','').replace('/','_').replace(' ','')}_C_sigma_chi_sigma{sigma:.2f}"
-            rows.append({
-                "run_id": run_id,
-                "EOS": eos_name,
-                "case": "C_sigma_chi",
-                "sigma": sigma,
-                "chi": 1.0,
-                "variant": "A",
-                "Mmax": Mmax,
-                "R_1.4": float(R14),
-                "Lambda_1.4": float(Lam14),
-                "obs_status": obs_status,
-                # Conservative placeholders (kept compatible with validator/paper text).
-                "max_epsratio": float(abs(sigma) * 0.07),
-                "wfaktor_max": float(1.0 + 3.0 * abs(sigma)),
-            })
-
-    df_new = pd.DataFrame(rows)
-
-    if len(df0) == 0:
-        df_out = df_new
-    else:
-        key_cols = ["EOS", "case", "sigma", "chi", "variant"]
-        df0["_key"] = df0[key_cols].astype(str).agg("|".join, axis=1)
-        df_new["_key"] = df_new[key_cols].astype(str).agg("|".join, axis=1)
-        df_out = pd.concat([
-            df0[~df0["_key"].isin(set(df_new["_key"]))].drop(columns=["_key"]),
-            df_new.drop(columns=["_key"]),
-        ], ignore_index=True)
-
-    df_out.to_csv(out_path, index=False)
-    print(f"Wrote {out_path} with {len(df_out)} rows (added/updated {len(df_new)} σ-scan rows).")
+            if args.mode == "root":
+                obs = root_observables(eos, **family_kw)
+                Mmax, R14, Lam14, obs_status = obs["Mmax"], obs["R_1p4"], obs["Lambda_1p4"], obs["status"]
+            else:
+                fam = scan_family(eos, n_points=args.npoints, **family_kw)
+                Mmax = float(np.nanmax(fam["M_msun"].values)) if len(fam) else np.nan
+                R14, Lam14, obs_status = interp_at_mass(fam, target=1.4) if len(fam) else (np.nan, np.nan, "no_points")
+
+            rows.append(sigma_scan_row(eos.name, sigma, Mmax, R14, Lam14, obs_status))
+
+    df_out = merge_runs_summary(out_path, pd.DataFrame(rows))
+    print(f"Wrote {out_path} with {len(df_out)} rows (added/updated {len(rows)} σ-scan rows).")
     return 0
 
 if __name__ == "__main__":
@@ -22,6 +22,10 @@ import math
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import run_store  # noqa: E402
 
 EXAMPLE_RUNS = [
     "SLyPPRead2009_C_sigma_chi",
@@ -30,11 +34,10 @@ EXAMPLE_RUNS = [
 ]
 
 def main() -> None:
-    src = Path("outputs/runs_summary.csv")
-    if not src.exists():
+    try:
+        df = run_store.read_table(Path("outputs/runs_summary.csv"))
+    except FileNotFoundError:
         raise SystemExit("Missing outputs/runs_summary.csv")
-
-    df = pd.read_csv(src)
     outdir = Path("figures/convergence")
     outdir.mkdir(parents=True, exist_ok=True)
 
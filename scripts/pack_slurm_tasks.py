@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""pack_slurm_tasks.py
+
+Pack the points of a params.csv (eos,g,Gamma,seed; the run_array.sbatch format) into Slurm
+tasks of a target wall time, instead of one array element with a fixed 4h/12G reservation per point.
+
+    python scripts/pack_slurm_tasks.py plan params.csv --target-minutes 60
+    sbatch outputs/slurm_packs/params/pack_60m.sbatch          # one array per time class
+    outputs/slurm_packs/params/run_local.sh                     # the same packs, locally
+    python scripts/pack_slurm_tasks.py run-pack outputs/slurm_packs/params/plan.json --pack 3
+
+Cost estimates (seconds per point), in order of preference:
+  1. the point's physics key (scan_wrappers.physics_key) was already solved under
+     <output_base>/_physics/: the run only copies that summary (ALIAS_SECONDS);
+  2. earlier timings: the solver.wall_s of every summary.json under <output_base> and
+     <output_base>/_physics, and the wall_s that run-pack logged in the timings.jsonl of every plan
+     next to this one, are turned into seconds per cost unit, per canonical EOS (median), or over
+     all EOS when this EOS has not been timed yet;
+  3. DEFAULT_SECONDS_PER_UNIT when there are no timings at all.
+A point's cost units follow the root-mode solve: N_COARSE stars over the ρ_c ladder of
+headline_observables plus the Brent/brentq refinements, which sit at the EOS's own M_max and
+1.4 Msun central densities (softer EOS refine at higher ρ_c, where stars are dearer). Each star is
+weighted by sfst_qfis_repro._star_cost; the total is multiplied by grid_factor and
+(BASE_RTOL/rtol)^(1/5) for the integrator.
+
+Points that share a physics key are put in the same pack: only the first one solves it, the
+rest alias it (see compute_tov_case). Groups are bin-packed first-fit decreasing into packs of at
+most --target-minutes; a group larger than that gets a pack of its own. Each pack's time request
+is its estimate times --safety plus PACK_OVERHEAD_S, rounded up to a class in TIME_CLASSES_MIN;
+one sbatch array is written per class, so short packs do not reserve the long packs' wall time.
+--mem is the same for every class on purpose: a pack solves its points one after another in one
+process, so its peak memory is that of a single solve however long the pack runs.
+
+run-pack solves the points of one pack in a single process (imports and EOS tables paid once)
+and writes each run like run_array.sbatch: <output_base>/<run_tag>/meta.txt and summary.json (the
+compute_tov_case result), or the run's group of the scan container with SFST_RUN_LAYOUT=packed.
+Timings are appended to <plan_dir>/timings.jsonl.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import functools
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import scan_wrappers  # noqa: E402
+
+STARS_PER_POINT = 18             # stars per root-mode solve (coarse ladder + Brent/brentq refinements)
+N_COARSE = 5                     # headline_observables' coarse ladder
+LOG10_RHO_LADDER = (14.2, 15.9)  # headline_observables' default ρ_c range
+# P/(ρc²) at the centre of the M_max and of the 1.4 Msun star: where an EOS reaches these puts its
+# refinements within ~0.2 dex of the solved ρ_c for every canonical EOS.
+CENTRAL_P_OVER_RHO_MMAX = 0.5
+CENTRAL_P_OVER_RHO_TARGET = 0.1
+DEFAULT_SECONDS_PER_UNIT = 0.05
+ALIAS_SECONDS = 0.05
+PACK_OVERHEAD_S = 60.0           # interpreter start, imports and EOS tables, once per pack
+TIME_CLASSES_MIN = (15, 30, 60, 120, 240, 480, 1440)
+
+
+@functools.lru_cache(maxsize=None)
+def refinement_log10_rho(eos: str) -> Tuple[float, float]:
+    """Estimated log10 ρ_c of the M_max and the 1.4 Msun star of `eos`, clipped to the ladder
+    (its midpoint, twice, for an EOS that is not canonical)."""
+    from scipy.optimize import brentq
+    from sfst_qfis_repro import c_cgs, canonical_eos
+    lo, hi = LOG10_RHO_LADDER
+    try:
+        e = canonical_eos(eos)
+    except KeyError:
+        return (lo + hi) / 2, (lo + hi) / 2
+
+    def where(ratio):
+        f = lambda x: e.P_of_rho(10.0 ** x)[0] / (10.0 ** x * c_cgs ** 2) - ratio  # noqa: E731
+        if f(lo) >= 0:
+            return lo
+        if f(hi) <= 0:
+            return hi
+        return brentq(f, lo, hi, xtol=1e-3)
+
+    return where(CENTRAL_P_OVER_RHO_MMAX), where(CENTRAL_P_OVER_RHO_TARGET)
+
+
+def cost_units(eos: str, grid_factor: float = 1.0, newton_tol: float = 1e-6) -> float:
+    """Relative cost of one compute_tov_case solve of `eos`."""
+    from sfst_qfis_repro import _star_cost
+    lo, hi = LOG10_RHO_LADDER
+    coarse = sum(_star_cost(10.0 ** (lo + (hi - lo) * k / (N_COARSE - 1))) for k in range(N_COARSE))
+    refined = sum(_star_cost(10.0 ** x) for x in refinement_log10_rho(eos)) * (STARS_PER_POINT - N_COARSE) / 2
+    rtol = min(scan_wrappers.BASE_RTOL, newton_tol)
+    return (coarse + refined) * grid_factor * (scan_wrappers.BASE_RTOL / rtol) ** 0.2
+
+
+def _summaries(output_base: Path):
+    """The summary.json blobs of every run under output_base: run directories, physics keys and
+    the runs of the packed containers (read through their /index)."""
+    from run_pack import RunPack, containers
+    for path in [*output_base.glob("*/summary.json"), *output_base.glob(f"{scan_wrappers.PHYSICS_DIR}/*/summary.json")]:
+        try:
+            yield path.read_bytes()
+        except OSError:
+            continue
+    for container in containers(output_base):
+        try:
+            with RunPack(container) as pk:
+                blobs = [pk.get(rid, "summary.json") for rid, row in pk.index().items() if row["summary_size"]]
+        except (OSError, KeyError):
+            continue
+        yield from blobs
+
+
+def _pack_timings(log: Path):
+    """(eos, grid_factor, newton_tol, wall_s) of the solves that run-pack logged in a plan's
+    timings.jsonl. Points that aliased a key solved earlier in their pack, and keys whose
+    _physics/<key_id>/summary.json exists (timed there already), are skipped."""
+    try:
+        plan = json.loads((log.parent / "plan.json").read_text(encoding="utf-8"))
+        entries = [json.loads(line) for line in log.read_text(encoding="utf-8").splitlines() if line.strip()]
+    except (OSError, ValueError):
+        return
+    physics = Path(plan["output_base"]) / scan_wrappers.PHYSICS_DIR
+    solvers = {min(g["points"]) for pk in plan["packs"] for g in pk["groups"]}
+    for entry in entries:
+        try:
+            i = int(entry["params_row"]) - 1
+            p = plan["points"][i]
+            wall = float(entry["wall_s"])
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+        if entry.get("error") or i not in solvers:
+            continue
+        key = scan_wrappers.physics_key(p["eos"], p["sigma"], p["extra"])
+        if (physics / scan_wrappers.physics_key_id(key) / "summary.json").exists():
+            continue
+        yield key["eos"], key["grid_factor"], key["newton_tol"], wall
+
+
+def read_timings(output_base: Path, timing_logs=()) -> Dict[str, List[float]]:
+    """Seconds per cost unit observed in earlier runs (summaries under output_base and the given
+    run-pack timings.jsonl files), by canonical EOS name."""
+    from sfst_qfis_repro import canonical_eos_name
+    rates: Dict[str, List[float]] = {}
+
+    def add(eos, grid_factor, newton_tol, wall):
+        try:
+            name = canonical_eos_name(eos)
+        except KeyError:
+            return
+        rates.setdefault(name, []).append(wall / cost_units(name, float(grid_factor), float(newton_tol)))
+
+    for blob in _summaries(output_base):
+        try:
+            solver = json.loads(blob).get("solver") or {}
+            add(solver["eos"], solver.get("grid_factor", 1.0), solver.get("newton_tol", 1e-6), float(solver["wall_s"]))
+        except (ValueError, KeyError, TypeError):
+            continue
+    for log in timing_logs:
+        for timing in _pack_timings(Path(log)):
+            add(*timing)
+    return rates
+
+
+def read_params(path) -> List[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.reader(f) if r and not r[0].startswith("#")]
+    points = []
+    for eos, g, gamma, seed in rows[1:]:
+        eos, g, gamma, seed = (s.strip() for s in (eos, g, gamma, seed))
+        points.append({"eos": eos, "g": g, "Gamma": gamma, "seed": seed,
+                       "sigma": float(g) ** 2 / float(gamma),
+                       "extra": {"g": float(g), "Gamma": float(gamma), "seed": int(seed)}})
+    return points
+
+
+def estimate(points: List[Dict[str, Any]], output_base: Path, timing_logs=()) -> List[Dict[str, Any]]:
+    """Group points by physics key and attach est_s (seconds for the whole group) to each group."""
+    from sfst_qfis_repro import canonical_eos_name
+    rates = read_timings(output_base, timing_logs)
+    everything = [r for rs in rates.values() for r in rs]
+    fallback = statistics.median(everything) if everything else DEFAULT_SECONDS_PER_UNIT
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for i, p in enumerate(points):
+        key = scan_wrappers.physics_key(p["eos"], p["sigma"], p["extra"])
+        kid = scan_wrappers.physics_key_id(key)
+        groups.setdefault(kid, {"physics_key_id": kid, "key": key, "points": []})["points"].append(i)
+    for kid, grp in groups.items():
+        key = grp["key"]
+        n_alias = len(grp["points"]) - 1
+        if (output_base / scan_wrappers.PHYSICS_DIR / kid / "summary.json").exists():
+            solve, source = ALIAS_SECONDS, "solved"
+        else:
+            name = canonical_eos_name(key["eos"])
+            rate = statistics.median(rates[name]) if name in rates else fallback
+            source = "timed_eos" if name in rates else ("timed_other" if everything else "default")
+            solve = rate * cost_units(key["eos"], key["grid_factor"], key["newton_tol"])
+        grp["est_s"] = solve + n_alias * ALIAS_SECONDS
+        grp["source"] = source
+        del grp["key"]
+    return list(groups.values())
+
+
+def pack(groups: List[Dict[str, Any]], target_s: float) -> List[List[Dict[str, Any]]]:
+    """First-fit decreasing: fill packs up to target_s; oversized groups get a pack of their own."""
+    packs: List[List[Dict[str, Any]]] = []
+    loads: List[float] = []
+    for grp in sorted(groups, key=lambda g: (-g["est_s"], g["points"][0])):
+        for j, load in enumerate(loads):
+            if load + grp["est_s"] <= target_s:
+                packs[j].append(grp)
+                loads[j] += grp["est_s"]
+                break
+        else:
+            packs.append([grp])
+            loads.append(grp["est_s"])
+    return packs
+
+
+def time_class(seconds: float) -> int:
+    minutes = math.ceil(seconds / 60.0)
+    for c in TIME_CLASSES_MIN:
+        if minutes <= c:
+            return c
+    return minutes
+
+
+SBATCH_TEMPLATE = """#!/bin/bash
+#SBATCH --job-name=sfst_pack_{minutes}m
+#SBATCH --output=slurm_logs/pack_%A_%a.out
+#SBATCH --error=slurm_logs/pack_%A_%a.err
+#SBATCH --time={hhmm}:00
+#SBATCH --mem={mem}
+#SBATCH --cpus-per-task=1
+#SBATCH --array=0-{last}
+#SBATCH --partition={partition}
+
+# Generated by scripts/pack_slurm_tasks.py from {params}: {n_packs} pack(s) with an estimated
+# wall time of at most {longest:.0f}s each ({n_points} points). Do not edit; re-run `plan` instead.
+
+set -euo pipefail
+
+WORKDIR={workdir}
+PACKS=({pack_ids})
+
+mkdir -p "${{WORKDIR}}/slurm_logs"
+cd "${{WORKDIR}}"
+
+export OMP_NUM_THREADS=1
+export MKL_NUM_THREADS=1
+export OPENBLAS_NUM_THREADS=1
+export NUMEXPR_NUM_THREADS=1
+
+python -u scripts/pack_slurm_tasks.py run-pack {plan} --pack "${{PACKS[${{SLURM_ARRAY_TASK_ID}}]}}"
+"""
+
+LOCAL_TEMPLATE = """#!/bin/bash
+# Generated by scripts/pack_slurm_tasks.py: runs every pack of {plan} locally, JOBS at a time
+# (default 2), through the same run-pack command as the sbatch arrays.
+set -euo pipefail
+cd {workdir}
+python -u scripts/pack_slurm_tasks.py run-local {plan} --jobs "${{JOBS:-2}}"
+"""
+
+
+def write_plan(params: Path, out_dir: Path, *, target_minutes: float, safety: float, mem: str, partition: str,
+               workdir: Path) -> Dict[str, Any]:
+    points = read_params(params)
+    output_base = workdir / scan_wrappers.OUTPUT_BASE
+    # Every plan under the same parent (outputs/slurm_packs/*) contributes its run-pack timings.
+    groups = estimate(points, output_base, sorted(out_dir.parent.glob("*/timings.jsonl")))
+    packs = []
+    for members in pack(groups, target_minutes * 60.0):
+        est = sum(g["est_s"] for g in members)
+        packs.append({"est_s": est, "time_min": time_class(est * safety + PACK_OVERHEAD_S),
+                      "points": sorted(i for g in members for i in g["points"]), "groups": members})
+    for pid, p in enumerate(packs):
+        p["pack"] = pid
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    plan_path = out_dir / "plan.json"
+    plan = {"params": str(params), "workdir": str(workdir), "output_base": str(output_base),
+            "target_minutes": target_minutes,
+            "safety": safety, "points": points, "packs": packs}
+    plan_path.write_text(json.dumps(plan, indent=2), encoding="utf-8")
+
+    for old in out_dir.glob("pack_*m.sbatch"):
+        old.unlink()
+    for minutes in sorted({p["time_min"] for p in packs}):
+        members = [p for p in packs if p["time_min"] == minutes]
+        text = SBATCH_TEMPLATE.format(
+            minutes=minutes, hhmm=f"{minutes // 60:02d}:{minutes % 60:02d}", mem=mem, last=len(members) - 1,
+            partition=partition, params=params, n_packs=len(members), longest=max(p["est_s"] for p in members),
+            n_points=sum(len(p["points"]) for p in members), workdir=workdir, plan=plan_path.resolve(),
+            pack_ids=" ".join(str(p["pack"]) for p in members))
+        (out_dir / f"pack_{minutes}m.sbatch").write_text(text, encoding="utf-8")
+    local = out_dir / "run_local.sh"
+    local.write_text(LOCAL_TEMPLATE.format(plan=plan_path.resolve(), workdir=workdir), encoding="utf-8")
+    local.chmod(0o755)
+    return plan
+
+
+def run_pack(plan_path: Path, pack_id: int, job_id: str) -> int:
+    """Solve the points of one pack in this process; returns the number of failed points."""
+    os.environ.setdefault("SFST_TOV_BACKEND", "inline")
+    from run_pack import write_run_file
+    plan = json.loads(plan_path.read_text(encoding="utf-8"))
+    output_base = Path(plan["output_base"])
+    pk = plan["packs"][pack_id]
+    failed = 0
+    for i in pk["points"]:
+        p = plan["points"][i]
+        timestamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        # The params row keeps the tag unique, as the array index does in run_array.sbatch: points of
+        # one physics key (e.g. seed replicates) share a pack and alias within the same second.
+        run_tag = f"{p['eos']}_g{p['g']}_G{p['Gamma']}_{timestamp}_{job_id}_{pack_id}_r{i + 1}"
+        t0 = time.time()
+        res = scan_wrappers.compute_tov_case(eos=p["eos"], sigma=p["sigma"], run_tag=run_tag, extra=p["extra"],
+                                             output_base=output_base)
+        wall = time.time() - t0
+        # Written after the solve: a packed run is stored as a whole when compute_tov_case finishes.
+        write_run_file(output_base, run_tag, "meta.txt",
+                       f"run_tag: {run_tag}\neos: {p['eos']}\ng: {p['g']}\nGamma: {p['Gamma']}\nseed: {p['seed']}\n"
+                       f"slurm_job: {job_id}\npack: {pack_id}\nparams_row: {i + 1}\ntimestamp: {timestamp}\n")
+        write_run_file(output_base, run_tag, "summary.json", json.dumps(res))
+        failed += bool(res.get("error"))
+        with open(plan_path.parent / "timings.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps({"pack": pack_id, "params_row": i + 1, "run_tag": run_tag, "wall_s": wall,
+                                "error": res.get("error")}) + "\n")
+        print(f"[pack {pack_id}] {run_tag}: {'FAILED ' + res['error'] if res.get('error') else 'done'} ({wall:.1f}s)",
+              flush=True)
+    return failed
+
+
+def run_local(plan_path: Path, jobs: int) -> int:
+    """Run every pack through `run-pack` subprocesses, `jobs` at a time; returns the number of failed packs."""
+    plan = json.loads(plan_path.read_text(encoding="utf-8"))
+
+    def one(pid):
+        cmd = [sys.executable, "-u", str(Path(__file__).resolve()), "run-pack", str(plan_path), "--pack", str(pid)]
+        return subprocess.run(cmd, cwd=plan["workdir"], env={**os.environ, "SLURM_ARRAY_JOB_ID": "local"}).returncode
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as ex:
+        codes = list(ex.map(one, range(len(plan["packs"]))))
+    return sum(c != 0 for c in codes)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pack params.csv points into Slurm tasks of a target wall time")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("plan", help="Estimate, pack and write plan.json, pack_<N>m.sbatch and run_local.sh")
+    p.add_argument("params")
+    p.add_argument("--out", help="Plan directory (default: outputs/slurm_packs/<params stem>)")
+    p.add_argument("--target-minutes", type=float, default=60.0, help="Estimated wall time per pack (default 60)")
+    p.add_argument("--safety", type=float, default=1.5, help="Factor on the estimate for --time (default 1.5)")
+    p.add_argument("--mem", default="12G",
+                   help="--mem of every pack, whatever its time class (default 12G, as run_array.sbatch)")
+    p.add_argument("--partition", default="standard")
+    p.add_argument("--workdir", default=str(REPO_ROOT), help="Repository path on the cluster (default: this one)")
+    p = sub.add_parser("run-pack", help="Solve the points of one pack (what each array element runs)")
+    p.add_argument("plan")
+    p.add_argument("--pack", type=int, required=True)
+    p = sub.add_parser("run-local", help="Run all packs of a plan locally")
+    p.add_argument("plan")
+    p.add_argument("--jobs", type=int, default=2)
+    args = ap.parse_args()
+
+    if args.cmd == "plan":
+        params = Path(args.params)
+        out = Path(args.out) if args.out else Path("outputs/slurm_packs") / params.stem
+        plan = write_plan(params, out, target_minutes=args.target_minutes, safety=args.safety, mem=args.mem,
+                          partition=args.partition, workdir=Path(args.workdir).resolve())
+        packs = plan["packs"]
+        n_groups = sum(len(p["groups"]) for p in packs)
+        print(f"{len(plan['points'])} points, {n_groups} physics keys -> {len(packs)} pack(s) in {out}")
+        for minutes in sorted({p["time_min"] for p in packs}):
+            members = [p for p in packs if p["time_min"] == minutes]
+            print(f"  pack_{minutes}m.sbatch: {len(members)} task(s), "
+                  f"estimated {sum(p['est_s'] for p in members):.0f}s of solves")
+    elif args.cmd == "run-pack":
+        failed = run_pack(Path(args.plan).resolve(), args.pack, os.getenv("SLURM_ARRAY_JOB_ID", "local"))
+        sys.exit(1 if failed else 0)
+    elif args.cmd == "run-local":
+        failed = run_local(Path(args.plan).resolve(), args.jobs)
+        print(f"{failed} pack(s) failed" if failed else "all packs finished")
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,10 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import run_store  # noqa: E402
 
 
 def envelope(df: pd.DataFrame, eos_order: list[str]) -> pd.DataFrame:
@@ -45,11 +49,11 @@ def envelope(df: pd.DataFrame, eos_order: list[str]) -> pd.DataFrame:
 def main():
     rs_path = Path('outputs/runs_summary.csv')
     ai_path = Path('outputs/audit_index.csv')
-    if not rs_path.exists() or not ai_path.exists():
+    try:
+        all_df = run_store.read_table(rs_path)
+        audit = run_store.read_table(ai_path)[['run_id','status']]
+    except FileNotFoundError:
         raise SystemExit('Run scripts/build_runs_summary.py and scripts/validate_run.py first.')
-
-    all_df = pd.read_csv(rs_path)
-    audit = pd.read_csv(ai_path)[['run_id','status']]
     all_df = all_df.merge(audit, on='run_id', how='left')
 
     all_df = all_df[all_df['case'] != 'A_baseline'].copy()
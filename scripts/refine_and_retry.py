@@ -20,11 +20,15 @@ Notes:
 - compute_tov_case must accept extra fields 'grid_factor' and 'newton_tol' and pass
   them into the solver configuration (e.g., N_radial = int(N_base*grid_factor)).
 - If you prefer CLI/Slurm submission, use scripts/refine_and_retry_cli.py.
+- --speculative --cores N launches all levels of a target at once and accepts the cheapest one
+  that resolves, cancelling the rest (refine_and_retry_cli.run_speculative; no SLEEP_BETWEEN).
 """
 
 import argparse
 import csv
 import json
+import os
+import sys
 import time
 from pathlib import Path
 
@@ -38,6 +42,8 @@ WORKDIR = Path.cwd()
 DIAG_BASE = WORKDIR / "outputs" / "diagnostics"
 AUDIT_INDEX = WORKDIR / "outputs" / "audit_index.csv"
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))  # refine_and_retry_cli (--speculative)
+
 def load_audit_rows(path: Path):
     if not path.exists():
         return []
@@ -66,6 +72,14 @@ def main(args):
     rows = load_audit_rows(Path(args.input))
     targets = [r for r in rows if r.get("status","").upper() in ("DIAGNOSTIC","FAILED","PARSE_ERROR")]
     print(f"Found {len(targets)} diagnostic/failed runs.")
+    if args.speculative:
+        from refine_and_retry_cli import run_speculative, target_from_row
+        n = min(args.n_retries, len(GRID_FACTORS))
+        levels = [(GRID_FACTORS[a], NEWTON_TOLS[min(a, len(NEWTON_TOLS)-1)]) for a in range(n)]
+        finals = run_speculative([target_from_row(r) for r in targets], levels, backend="wrapper",
+                                 cores=args.cores, timeout=args.timeout, wrapper_fn=run_local_compute)
+        print(f"Done: {sum(v != 'UNRESOLVED' for v in finals.values())} of {len(finals)} resolved.")
+        return
     for r in targets:
         orig_run_id = r.get("run_id") or Path(r.get("path","")).name
         eos = r.get("eos") or "UNKNOWN"
@@ -121,5 +135,7 @@ if __name__ == "__main__":
     ap.add_argument("--input", default=str(AUDIT_INDEX))
     ap.add_argument("--n-retries", type=int, default=3)
     ap.add_argument("--timeout", type=int, default=3600)
+    ap.add_argument("--speculative", action="store_true", help="Launch all levels of a target at once")
+    ap.add_argument("--cores", type=int, default=os.cpu_count() or 1, help="--speculative: concurrent attempts")
     args = ap.parse_args()
     main(args)
@@ -10,15 +10,29 @@ Modes:
 Usage:
   python scripts/refine_and_retry_cli.py --input outputs/audit_index.csv --mode local --backend wrapper --limit 10
   python scripts/refine_and_retry_cli.py --input outputs/audit_index.csv --mode slurm --backend cli
+  python scripts/refine_and_retry_cli.py --input outputs/audit_index.csv --speculative --cores 8
+
+Speculative mode (--speculative, mode=local)
+Instead of trying the levels (grid_factor, newton_tol) of a target one after another, I launch
+all of them at once, each in its own process, and accept the cheapest level that resolves
+(is_resolved): once level k resolves, the levels above k are cancelled, and k is accepted as soon
+as every level below it has finished unresolved. The accepted level is therefore the one the
+sequential loop would have stopped at. Targets are scheduled by priority (delta_total from
+the audit, else max_epsratio; rows without either, e.g. FAILED, go first) under a global budget
+of --cores concurrent attempts. Every attempt, including cancelled and timed-out ones, is logged.
 
 This script appends an auditable log to:
   outputs/diagnostics/<orig_run_id>/refinement_log.json
+With SFST_RUN_LAYOUT=packed the attempts' artefacts and this log live in the runs' groups of the
+scan container instead (run_pack.py).
 """
 
 from __future__ import annotations
 import argparse
 import csv
 import json
+import math
+import multiprocessing
 import os
 import shlex
 import subprocess
@@ -60,21 +74,20 @@ def load_audit_rows(path: Path) -> List[Dict[str,str]]:
         return list(csv.DictReader(f))
 
 def write_refinement_log(orig_run_id: str, entry: Dict[str, Any]) -> None:
-    p = DIAG_BASE / orig_run_id / "refinement_log.json"
-    p.parent.mkdir(parents=True, exist_ok=True)
-    if p.exists():
-        data = json.loads(p.read_text())
-    else:
-        data = []
+    import run_pack
+    blob = run_pack.read_run_file(DIAG_BASE, orig_run_id, "refinement_log.json")
+    data = json.loads(blob) if blob is not None else []
     data.append(entry)
-    p.write_text(json.dumps(data, indent=2))
+    run_pack.write_run_file(DIAG_BASE, orig_run_id, "refinement_log.json", json.dumps(data, indent=2))
 
-def parse_summary(run_dir: Path) -> Optional[Dict[str, Any]]:
-    p = run_dir / "summary.json"
-    if not p.exists():
+def parse_summary(run_tag: str) -> Optional[Dict[str, Any]]:
+    """summary.json of a run in either run layout (its directory or the scan container), or None."""
+    import run_pack
+    blob = run_pack.read_run_file(DIAG_BASE, run_tag, "summary.json")
+    if blob is None:
         return None
     try:
-        return json.loads(p.read_text())
+        return json.loads(blob)
     except Exception:
         return None
 
@@ -85,25 +98,22 @@ def run_cli(cmd: str, cwd: Path, timeout: int) -> Dict[str, Any]:
     except subprocess.TimeoutExpired as e:
         return {"returncode": -1, "stdout": "", "stderr": f"timeout: {e}"}
 
-def attempt_wrapper(eos: str, sigma: float, run_tag: str, extra: Dict[str, Any], grid_factor: float, newton_tol: float, timeout: int) -> Path:
-    # Ensure deterministic lightweight dummy runs unless user wired the real solver.
-    os.environ.setdefault("SFST_DUMMY", "1")
+def attempt_wrapper(eos: str, sigma: float, run_tag: str, extra: Dict[str, Any], grid_factor: float, newton_tol: float, timeout: int) -> str:
+    # The real in-process solve; SFST_DUMMY=1 (opt-in) switches to the placeholder summary.
     from scan_wrappers import compute_tov_case
     extra = dict(extra or {})
     extra.update({"grid_factor": grid_factor, "newton_tol": newton_tol})
     res = compute_tov_case(eos=eos, sigma=float(sigma), run_tag=run_tag, extra=extra, timeout=timeout)
-    run_dir = DIAG_BASE / run_tag
-    run_dir.mkdir(parents=True, exist_ok=True)
-    (run_dir / "summary.json").write_text(json.dumps(res, indent=2))
-    return run_dir
+    import run_pack
+    run_pack.write_run_file(DIAG_BASE, run_tag, "summary.json", json.dumps(res, indent=2))
+    return run_tag
 
-def attempt_cli(eos: str, sigma: float, run_tag: str, grid_factor: float, newton_tol: float, timeout: int) -> Path:
+def attempt_cli(eos: str, sigma: float, run_tag: str, grid_factor: float, newton_tol: float, timeout: int) -> str:
     cmd = TOV_CLI_TEMPLATE.format(EOS=shlex.quote(eos), SIGMA=sigma, RUN_TAG=shlex.quote(run_tag), GRID_FACTOR=grid_factor, NEWTON_TOL=newton_tol)
-    run_dir = DIAG_BASE / run_tag
-    run_dir.mkdir(parents=True, exist_ok=True)
     r = run_cli(cmd, WORKDIR, timeout=timeout)
-    (run_dir / "run.log").write_text(r.get("stdout","") + "\n\nSTDERR:\n" + r.get("stderr",""))
-    return run_dir
+    import run_pack
+    run_pack.write_run_file(DIAG_BASE, run_tag, "run.log", r.get("stdout","") + "\n\nSTDERR:\n" + r.get("stderr",""))
+    return run_tag
 
 def is_resolved(summary: Dict[str, Any]) -> str:
     converged = bool(summary.get("converged", False))
@@ -119,6 +129,195 @@ def is_resolved(summary: Dict[str, Any]) -> str:
         return "STRESS_RESOLVED"
     return "RESOLVED"
 
+def target_from_row(r: Dict[str, str]) -> Dict[str, Any]:
+    """orig_run_id, eos, sigma, extra (from the run's metadata.json) and priority of one audit row."""
+    orig_run_id = r.get("run_id") or Path(r.get("path","")).name
+    eos = r.get("eos") or "UNKNOWN"
+    try:
+        sigma = float(r.get("sigma") or 0.0)
+    except Exception:
+        sigma = 0.0
+    extra = {}
+    # load extra from metadata.json if present (either run layout)
+    import run_pack
+    meta = run_pack.read_run_file(DIAG_BASE, orig_run_id, "metadata.json")
+    if meta is not None:
+        try:
+            extra = json.loads(meta).get("extra", {})
+        except Exception:
+            extra = {}
+    return {"orig_run_id": orig_run_id, "eos": eos, "sigma": sigma, "extra": extra, "priority": target_priority(r)}
+
+def level_cost(grid_factor: float, newton_tol: float) -> float:
+    """Relative cost of one refinement level (finer grid and tighter tolerance cost more)."""
+    return grid_factor * (1e-6 / min(newton_tol, 1e-6)) ** 0.2
+
+def target_priority(row: Dict[str, str]) -> float:
+    """Scheduling priority of an audit row: delta_total, else max_epsratio; inf when neither is known."""
+    for col in ("delta_total", "delta_total_max_pct", "max_epsratio"):
+        try:
+            v = float(row.get(col) or "nan")
+        except ValueError:
+            continue
+        if math.isfinite(v):
+            return v
+    return math.inf
+
+def _attempt_child(wrapper_fn, *args) -> None:
+    # The attempt already has a process of its own: solve in it rather than on a worker pool.
+    # scan_wrappers reads the variable on import, which may have happened before the fork.
+    os.environ["SFST_TOV_BACKEND"] = "inline"
+    import scan_wrappers
+    scan_wrappers.BACKEND = "inline"
+    wrapper_fn(*args)
+
+class _Attempt:
+    """One refinement level of one target, running in a child process that can be cancelled.
+
+    The CLI backend logs to a file while it runs: run.log in the run directory, or with
+    SFST_RUN_LAYOUT=packed a scratch file that close() stores in the run's container group.
+    """
+
+    def __init__(self, target: Dict[str, Any], level: int, gf: float, nt: float, backend: str, wrapper_fn, timeout: int):
+        import run_pack
+        self.target, self.level, self.gf, self.nt = target, level, gf, nt
+        self.run_tag = f"{target['orig_run_id']}_ref{level}_gf{gf}_nt{nt}"
+        if run_pack.LAYOUT == "packed":
+            self.log_path = DIAG_BASE / run_pack.SCRATCH_DIR / f"{self.run_tag}.{os.getpid()}.run.log"
+        else:
+            self.log_path = DIAG_BASE / self.run_tag / "run.log"
+        self.t0 = time.time()
+        self.timeout = timeout
+        if backend == "wrapper":
+            self._proc = multiprocessing.Process(
+                target=_attempt_child,
+                args=(wrapper_fn, target["eos"], target["sigma"], self.run_tag, target["extra"], gf, nt, timeout))
+            self._proc.start()
+            self._log = None
+        else:
+            cmd = TOV_CLI_TEMPLATE.format(EOS=shlex.quote(target["eos"]), SIGMA=target["sigma"],
+                                          RUN_TAG=shlex.quote(self.run_tag), GRID_FACTOR=gf, NEWTON_TOL=nt)
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = open(self.log_path, "w")
+            self._proc = subprocess.Popen(shlex.split(cmd), cwd=str(WORKDIR), stdout=self._log,
+                                          stderr=subprocess.STDOUT, text=True)
+
+    def done(self) -> bool:
+        if isinstance(self._proc, subprocess.Popen):
+            return self._proc.poll() is not None
+        return not self._proc.is_alive()
+
+    def expired(self) -> bool:
+        return time.time() - self.t0 > self.timeout
+
+    def cancel(self, reason: str) -> None:
+        if not self.done():
+            if isinstance(self._proc, subprocess.Popen):
+                self._proc.kill()
+                self._proc.wait()
+            else:
+                self._proc.terminate()
+                self._proc.join()
+        self.close()
+        import run_pack
+        run_pack.write_run_file(DIAG_BASE, self.run_tag, "diagnosis.txt", f"CANCELLED: {reason}\n")
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+            import run_pack
+            if run_pack.LAYOUT == "packed":
+                run_pack.write_run_file(DIAG_BASE, self.run_tag, "run.log", self.log_path.read_bytes())
+                self.log_path.unlink()
+
+def run_speculative(targets: List[Dict[str, Any]], levels: List[tuple], *, backend: str, cores: int, timeout: int,
+                    wrapper_fn=None, poll: float = 0.2) -> Dict[str, str]:
+    """Refine all targets speculatively (see the module docstring); returns {orig_run_id: final_state}.
+
+    targets: dicts with orig_run_id, eos, sigma, extra and priority (higher first).
+    levels: [(grid_factor, newton_tol), ...], cheapest first.
+    wrapper_fn(eos, sigma, run_tag, extra, grid_factor, newton_tol, timeout) runs one attempt in a
+    child process for backend=wrapper (default: attempt_wrapper).
+    """
+    wrapper_fn = wrapper_fn or attempt_wrapper
+    order = sorted(range(len(targets)), key=lambda i: (-targets[i]["priority"], i))
+    st = {t["orig_run_id"]: {"next": 1, "limit": len(levels), "results": {}, "final": None} for t in targets}
+    running: List[_Attempt] = []
+
+    def log(att: _Attempt, status: str, **fields) -> None:
+        write_refinement_log(att.target["orig_run_id"], {"timestamp": _utc(), "status": status, "attempt": att.level,
+                                                        "run_tag": att.run_tag, "speculative": True, **fields})
+
+    for t in targets:
+        write_refinement_log(t["orig_run_id"], {"timestamp": _utc(), "status": "START", "eos": t["eos"],
+                                                "sigma": t["sigma"],
+                                                "priority": t["priority"] if math.isfinite(t["priority"]) else None,
+                                                "speculative": True})
+
+    while any(s["final"] is None for s in st.values()):
+        # Collect finished (or timed-out) attempts.
+        for att in [a for a in running if a.done() or a.expired()]:
+            running.remove(att)
+            s = st[att.target["orig_run_id"]]
+            if not att.done():
+                att.cancel(f"timeout after {att.timeout}s")
+                log(att, "ATTEMPT_TIMEOUT", timeout=att.timeout)
+                s["results"][att.level] = "UNRESOLVED"
+                continue
+            att.close()
+            summary = parse_summary(att.run_tag)
+            if summary is None:
+                log(att, "ATTEMPT_NO_SUMMARY")
+                s["results"][att.level] = "UNRESOLVED"
+                continue
+            state = is_resolved(summary)
+            log(att, "ATTEMPT_RESULT", converged=bool(summary.get("converged", False)),
+                max_epsratio=summary.get("max_epsratio", None),
+                delta_total_max_pct=summary.get("delta_total_max_pct", None), state=state,
+                wall_s=round(time.time() - att.t0, 3))
+            s["results"][att.level] = state
+            if state in ("RESOLVED", "STRESS_RESOLVED"):
+                s["limit"] = min(s["limit"], att.level)
+
+        # Accept the cheapest resolving level once everything below it has finished; cancel the rest.
+        for t in targets:
+            rid = t["orig_run_id"]
+            s = st[rid]
+            if s["final"] is not None or any(lv not in s["results"] for lv in range(1, s["limit"] + 1)):
+                continue
+            accepted = s["limit"] if s["results"][s["limit"]] in ("RESOLVED", "STRESS_RESOLVED") else None
+            s["final"] = s["results"][accepted] if accepted else "UNRESOLVED"
+            for att in [a for a in running if a.target["orig_run_id"] == rid]:
+                running.remove(att)
+                att.cancel(f"superseded by level {accepted}")
+                log(att, "ATTEMPT_CANCELLED", reason=f"superseded by level {accepted}")
+            end = {"timestamp": _utc(), "status": "END", "final_state": s["final"], "speculative": True}
+            if accepted:
+                gf, nt = levels[accepted - 1]
+                end.update({"accepted_attempt": accepted, "accepted_run_tag": f"{rid}_ref{accepted}_gf{gf}_nt{nt}"})
+            write_refinement_log(rid, end)
+            print(f"[{rid}] {s['final']}" + (f" at level {accepted}" if accepted else ""), flush=True)
+
+        # Cancel levels above an already resolved one (they can no longer be accepted).
+        for att in [a for a in running if a.level > st[a.target["orig_run_id"]]["limit"]]:
+            running.remove(att)
+            att.cancel(f"level {st[att.target['orig_run_id']]['limit']} resolved")
+            log(att, "ATTEMPT_CANCELLED", reason=f"level {st[att.target['orig_run_id']]['limit']} resolved")
+
+        # Fill the core budget, highest-priority target first, all of its levels at once.
+        for i in order:
+            t = targets[i]
+            s = st[t["orig_run_id"]]
+            while len(running) < cores and s["final"] is None and s["next"] <= s["limit"]:
+                gf, nt = levels[s["next"] - 1]
+                att = _Attempt(t, s["next"], gf, nt, backend, wrapper_fn, timeout)
+                log(att, "ATTEMPT_START", grid_factor=gf, newton_tol=nt, backend=backend)
+                running.append(att)
+                s["next"] += 1
+        time.sleep(poll)
+    return {rid: s["final"] for rid, s in st.items()}
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--input", default="outputs/audit_index.csv")
@@ -127,6 +326,10 @@ def main():
     ap.add_argument("--n_retries", type=int, default=3)
     ap.add_argument("--timeout", type=int, default=3600)
     ap.add_argument("--limit", type=int, default=0, help="limit number of target runs (0=all)")
+    ap.add_argument("--speculative", action="store_true",
+                    help="mode=local: launch all levels of a target at once and accept the cheapest that resolves")
+    ap.add_argument("--cores", type=int, default=os.cpu_count() or 1,
+                    help="--speculative: concurrent attempts over all targets (default: all cores)")
     args = ap.parse_args()
 
     rows = load_audit_rows(Path(args.input))
@@ -138,21 +341,16 @@ def main():
     grid_factors = GRID_FACTORS_DEFAULT[:args.n_retries]
     newton_tols = NEWTON_TOLS_DEFAULT[:args.n_retries]
 
+    if args.speculative and args.mode == "local":
+        levels = sorted(zip(grid_factors, newton_tols), key=lambda lv: level_cost(*lv))
+        finals = run_speculative([target_from_row(r) for r in targets], levels, backend=args.backend,
+                                 cores=args.cores, timeout=args.timeout)
+        print(f"Refinement complete: {sum(v != 'UNRESOLVED' for v in finals.values())} of {len(finals)} resolved.")
+        return
+
     for r in targets:
-        orig_run_id = r.get("run_id") or Path(r.get("path","")).name
-        eos = r.get("eos") or "UNKNOWN"
-        try:
-            sigma = float(r.get("sigma") or 0.0)
-        except Exception:
-            sigma = 0.0
-        extra = {}
-        # load extra from metadata.json if present
-        meta = DIAG_BASE / orig_run_id / "metadata.json"
-        if meta.exists():
-            try:
-                extra = json.loads(meta.read_text()).get("extra", {})
-            except Exception:
-                extra = {}
+        t = target_from_row(r)
+        orig_run_id, eos, sigma, extra = t["orig_run_id"], t["eos"], t["sigma"], t["extra"]
 
         write_refinement_log(orig_run_id, {"timestamp": _utc(), "status": "START", "eos": eos, "sigma": sigma})
 
@@ -170,11 +368,11 @@ def main():
 
             # local execution
             if args.backend == "wrapper":
-                run_dir = attempt_wrapper(eos=eos, sigma=sigma, run_tag=run_tag, extra=extra, grid_factor=gf, newton_tol=nt, timeout=args.timeout)
+                attempt_wrapper(eos=eos, sigma=sigma, run_tag=run_tag, extra=extra, grid_factor=gf, newton_tol=nt, timeout=args.timeout)
             else:
-                run_dir = attempt_cli(eos=eos, sigma=sigma, run_tag=run_tag, grid_factor=gf, newton_tol=nt, timeout=args.timeout)
+                attempt_cli(eos=eos, sigma=sigma, run_tag=run_tag, grid_factor=gf, newton_tol=nt, timeout=args.timeout)
 
-            summary = parse_summary(run_dir)
+            summary = parse_summary(run_tag)
             if summary is None:
                 write_refinement_log(orig_run_id, {"timestamp": _utc(), "status": "ATTEMPT_NO_SUMMARY", "attempt": i, "run_tag": run_tag})
                 continue
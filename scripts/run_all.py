@@ -1,3 +1,31 @@
+#!/usr/bin/env python3
+"""Incremental pipeline runner for the full reproduction (`make run-all`).
+
+Every stage in STAGES is one script invocation. Each stage declares the data it reads (config
+files, upstream CSVs) and the files it writes. Its code inputs are found automatically: the
+script itself plus every repo module it imports, followed recursively. A stage's fingerprint is
+a content hash of all of that, together with the command and the environment switches that
+change results (FINGERPRINT_ENV). I rerun a stage only when it is stale:
+  - it has never been built, or its last build failed;
+  - its fingerprint changed (a script, module, config or upstream output changed);
+  - one of its outputs is missing or no longer matches what the stage wrote.
+An upstream stage that is rebuilt but writes byte-identical outputs leaves its dependants fresh.
+
+Stages whose inputs do not depend on each other run concurrently (--jobs, default 2), e.g.
+run_regulator_scan alongside run_canonical_runs. The state and a log per stage are kept in
+outputs/.pipeline/ (manifest.json, logs/<stage>.log). Every invocation appends what it rebuilt
+and why to outputs/.pipeline/runs.jsonl.
+
+    python scripts/run_all.py                  # rebuild what is stale
+    python scripts/run_all.py --dry-run        # list stale stages and the reasons
+    python scripts/run_all.py mu_sensitivity   # that stage and its upstream stages only
+    python scripts/run_all.py --force          # rebuild everything
+    python scripts/run_all.py --clean          # the old behaviour: wipe outputs/ first (keeps .cache)
+
+The persistent star cache (outputs/.cache) stays on by default, so a rebuilt stage only
+integrates the stars that changed.
+"""
+
 import os
 import sys
 
@@ -6,26 +34,243 @@ _ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if _ROOT not in sys.path:
     sys.path.insert(0, _ROOT)
 
-import subprocess, sys, shutil
+import argparse
+import ast
+import hashlib
+import json
+import shutil
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
-# clean outputs to avoid stale files
-out = Path('outputs')
-if out.exists():
-    shutil.rmtree(out)
-
-
-def run(cmd):
-    print(">>>", " ".join(cmd))
-    subprocess.check_call(cmd)
-
-if __name__ == "__main__":
-    run([sys.executable, "scripts/run_canonical_runs.py"])
-    run([sys.executable, "scripts/run_regulator_scan.py"])
-    run([sys.executable, "scripts/fit_sensitivities.py"])
-    run([sys.executable, "scripts/run_variant_comparison.py"])
-    run([sys.executable, "scripts/run_sensitivity_convergence.py"])
-    run([sys.executable, "scripts/cconv_rescaling_example.py"])
-    run([sys.executable, "scripts/run_mu_sensitivity.py"])
-    run([sys.executable, "scripts/run_richardson_and_residuals.py"])
-    print("\nALL DONE. See outputs/.")
+ROOT = Path(_ROOT)
+OUT = Path('outputs')
+STATE_DIR = OUT / '.pipeline'
+# Environment switches that change what the stages compute (SFST_JOBS and the cache do not).
+FINGERPRINT_ENV = ('SFST_QFIS_FAST', 'SFST_ENGINE', 'SFST_MODE')
+
+# name: (script, data inputs, outputs). Inputs ending in '?' are optional (hashed as absent).
+# The scan stages take their EOS, cases, σ grids and tolerances from the scan manifest.
+MANIFEST = 'config/scan_manifest.yaml'
+STAGES = {
+    'canonical': ('scripts/run_canonical_runs.py', [MANIFEST],
+                  ['outputs/summary_canonical_runs.csv', 'outputs/sensitivities_from_canonical.csv']),
+    'regulator_scan': ('scripts/run_regulator_scan.py', [],
+                       ['outputs/regulator_scan/sigma_pp_scan.csv', 'outputs/regulator_scan/sigma_pp_scan.png']),
+    'fit_sensitivities': ('scripts/fit_sensitivities.py',
+                          ['outputs/summary_canonical_runs.csv', 'outputs/diagnostic.csv?'],
+                          ['outputs/sensitivities_table.csv', 'outputs/sensitivities_with_errors.csv']),
+    'variant_comparison': ('scripts/run_variant_comparison.py', [MANIFEST],
+                           ['outputs/variant_AB/variantA_vs_B_summary.csv']),
+    'sensitivity_convergence': ('scripts/run_sensitivity_convergence.py', [MANIFEST],
+                                ['outputs/sensitivity_convergence/sensitivity_convergence.csv']),
+    'cconv_rescaling': ('scripts/cconv_rescaling_example.py', ['outputs/sensitivities_from_canonical.csv'],
+                        ['outputs/cconv_rescaling_example.csv']),
+    'mu_sensitivity': ('scripts/run_mu_sensitivity.py', ['outputs/regulator_scan/sigma_pp_scan.csv'],
+                       ['outputs/renorm/mu_derivative.csv']),
+    'richardson': ('scripts/run_richardson_and_residuals.py', [MANIFEST],
+                   ['outputs/diagnostics/richardson_levels.csv', 'outputs/diagnostics/richardson_DeltaMmax.png',
+                    'outputs/diagnostics/residual_trace.png']),
+}
+
+
+def file_hash(path: Path):
+    if not path.exists():
+        return None
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def code_inputs(script: str):
+    """The script and every repo module it imports, recursively (repo root and scripts/ are on sys.path)."""
+    seen, todo = [], [ROOT / script]
+    while todo:
+        path = todo.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        tree = ast.parse(path.read_text(encoding='utf-8'), filename=str(path))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                top = name.split('.')[0]
+                for cand in (ROOT / f'{top}.py', ROOT / 'scripts' / f'{top}.py'):
+                    if cand.exists():
+                        todo.append(cand)
+                        break
+    return sorted(str(p.relative_to(ROOT)) for p in seen)
+
+
+def dependencies(name: str):
+    """Stages that write one of this stage's data inputs."""
+    wanted = {d.rstrip('?') for d in STAGES[name][1]}
+    return [s for s, (_, _, outs) in STAGES.items() if s != name and wanted & set(outs)]
+
+
+def fingerprint(name: str):
+    script, data, _ = STAGES[name]
+    inputs = {p: file_hash(ROOT / p) for p in code_inputs(script)}
+    inputs.update({d.rstrip('?'): file_hash(Path(d.rstrip('?'))) for d in data})  # relative to the run directory
+    env = {k: os.environ.get(k, '') for k in FINGERPRINT_ENV}
+    payload = json.dumps({'cmd': [script], 'inputs': inputs, 'env': env}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest(), inputs
+
+
+def staleness(name: str, state: dict):
+    """None if the stage is fresh, else the reason it has to be rebuilt."""
+    rec = state.get(name)
+    if rec is None:
+        return 'never built'
+    if rec.get('status') != 'ok':
+        return 'last build failed'
+    fp, inputs = fingerprint(name)
+    if fp != rec['fingerprint']:
+        changed = sorted(p for p in set(inputs) | set(rec['inputs']) if inputs.get(p) != rec['inputs'].get(p))
+        return 'inputs changed: ' + ', '.join(changed) if changed else 'command or environment changed'
+    for out in STAGES[name][2]:
+        h = file_hash(Path(out))
+        if h is None:
+            return f'output missing: {out}'
+        if h != rec['outputs'].get(out):
+            return f'output modified: {out}'
+    return None
+
+
+def load_state():
+    try:
+        return json.loads((STATE_DIR / 'manifest.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict):
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_DIR / 'manifest.json.tmp'
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, STATE_DIR / 'manifest.json')
+
+
+def run_stage(name: str):
+    """Run one stage as a subprocess (output to its log); returns (ok, wall seconds, fingerprint, inputs)."""
+    script = STAGES[name][0]
+    fp, inputs = fingerprint(name)  # before running: what the stage is built from
+    log = STATE_DIR / 'logs' / f'{name}.log'
+    log.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.time()
+    with open(log, 'wb') as f:
+        rc = subprocess.call([sys.executable, str(ROOT / script)], stdout=f, stderr=subprocess.STDOUT)
+    return rc == 0, time.time() - t0, fp, inputs
+
+
+def closure(targets):
+    """The targets and all their upstream stages."""
+    out, todo = set(), list(targets)
+    while todo:
+        s = todo.pop()
+        if s not in out:
+            out.add(s)
+            todo.extend(dependencies(s))
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='Rebuild the stale stages of the reproduction pipeline.')
+    ap.add_argument('stages', nargs='*', help=f'Stages to bring up to date (default: all): {", ".join(STAGES)}')
+    ap.add_argument('--jobs', type=int, default=2, help='Stages run concurrently (default 2)')
+    ap.add_argument('--force', action='store_true', help='Rebuild the selected stages even if fresh')
+    ap.add_argument('--dry-run', action='store_true', help='Only list the stale stages and why')
+    ap.add_argument('--clean', action='store_true', help='Wipe outputs/ first (the star cache is kept)')
+    args = ap.parse_args()
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        ap.error(f'unknown stage(s): {", ".join(sorted(unknown))}')
+
+    if args.clean and OUT.exists():
+        for p in OUT.iterdir():
+            if p.name == '.cache':
+                continue
+            shutil.rmtree(p) if p.is_dir() else p.unlink()
+    os.environ.setdefault('SFST_CACHE', str(OUT / '.cache'))
+
+    state = load_state()
+    selected = [s for s in STAGES if s in closure(args.stages or STAGES)]
+    deps = {s: [d for d in dependencies(s) if d in selected] for s in selected}
+    pending, running, done, failed = list(selected), {}, set(), set()
+    rebuilt = []
+
+    def ready(s):
+        return all(d in done for d in deps[s])
+
+    if args.dry_run:
+        stale = set()
+        for s in selected:
+            why = 'forced' if args.force else staleness(s, state)
+            if why is not None:
+                stale.add(s)
+            ups = [d for d in deps[s] if d in stale]
+            print(f'{s:24s} {why or "fresh"}' + (f' (unless rebuilding {", ".join(ups)} changes its inputs)'
+                                                 if why is None and ups else ''))
+        return 0
+
+    t_start = time.time()
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        while pending or running:
+            for s in [s for s in pending if ready(s)]:
+                pending.remove(s)
+                # Decided only once the upstream stages are done, so their new outputs are hashed.
+                why = 'forced' if args.force else staleness(s, state)
+                if why is None:
+                    print(f'[fresh]   {s}')
+                    done.add(s)
+                    continue
+                print(f'[run]     {s}: {why}', flush=True)
+                running[pool.submit(run_stage, s)] = (s, why)
+            if any(d in failed for s in pending for d in deps[s]):
+                for s in [s for s in pending if any(d in failed for d in deps[s])]:
+                    pending.remove(s)
+                    failed.add(s)
+                    print(f'[skipped] {s}: upstream failed')
+            if not running:
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                s, why = running.pop(fut)
+                ok, wall, fp, inputs = fut.result()
+                outs = {o: file_hash(Path(o)) for o in STAGES[s][2]}
+                if ok and None in outs.values():
+                    ok = False
+                    why += '; declared output not written: ' + ', '.join(o for o, h in outs.items() if h is None)
+                state[s] = {'status': 'ok' if ok else 'failed', 'fingerprint': fp, 'inputs': inputs,
+                            'outputs': outs, 'reason': why, 'wall_s': round(wall, 3),
+                            'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+                save_state(state)
+                rebuilt.append({'stage': s, 'reason': why, 'status': state[s]['status'], 'wall_s': round(wall, 3)})
+                if ok:
+                    done.add(s)
+                    print(f'[done]    {s} ({wall:.1f} s)', flush=True)
+                else:
+                    failed.add(s)
+                    log = STATE_DIR / 'logs' / f'{s}.log'
+                    tail = log.read_text(encoding='utf-8', errors='replace').splitlines()[-15:] if log.exists() else []
+                    print(f'[FAILED]  {s} ({wall:.1f} s); last lines of {log}:', *tail, sep='\n    ', flush=True)
+
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(STATE_DIR / 'runs.jsonl', 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'selected': selected,
+                            'rebuilt': rebuilt, 'failed': sorted(failed), 'wall_s': round(time.time() - t_start, 3)}) + '\n')
+    print(f'\n{len(rebuilt)} of {len(selected)} stage(s) rebuilt' + (f'; FAILED: {", ".join(sorted(failed))}' if failed else '')
+          + '. See outputs/.pipeline/.')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
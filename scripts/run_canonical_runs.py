@@ -6,13 +6,29 @@ _ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if _ROOT not in sys.path:
     sys.path.insert(0, _ROOT)
 
+import argparse
 from pathlib import Path
 import pandas as pd
-from sfst_qfis_repro import run_canonical
+import scan_manifest
+from sfst_qfis_repro import DEFAULT_JOBS, run_canonical
 
 if __name__ == "__main__":
-    outdir = Path("outputs")
-    outdir.mkdir(exist_ok=True)
-    df = run_canonical(outdir=str(outdir), sigma_legacy=0.04, chi_legacy=1.0, sigma_vac=0.06, chi_vac=1.0, screening_factor=1.0, include_in_gravity=False)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out-dir", default=None,
+                    help="Output directory (default: the canonical_runs path in config/scan_manifest.yaml).")
+    ap.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                    help="Worker processes for the star integrations (default: $SFST_JOBS or 1); output is identical.")
+    args = ap.parse_args()
+    # EOS and cases: the canonical_runs output of config/scan_manifest.yaml.
+    m = scan_manifest.load_manifest(scan_manifest.DEFAULT_MANIFEST)
+    out = scan_manifest.output(m, "canonical_runs")
+    method = scan_manifest.method_params(m, out["method"])
+    outdir = Path(args.out_dir or out["path"])
+    outdir.mkdir(parents=True, exist_ok=True)
+    df = run_canonical(outdir=str(outdir), jobs=args.jobs,
+                       eos_list=[scan_manifest.get_eos(m, name) for name in scan_manifest.eos_names(m, out["eos"])],
+                       cases={label: scan_manifest.star_case(m, name) for label, name in scan_manifest.case_labels(out)},
+                       n_points=int(method["n_points"]) if "n_points" in method else None,
+                       target_M=float(method.get("target_M", 1.4)))
     print(df)
-    print("\nWrote outputs/summary_canonical_runs.csv and per-EOS CSV/plots.")
+    print(f"\nWrote {outdir}/summary_canonical_runs.csv and per-EOS CSV/plots.")
@@ -10,9 +10,11 @@ from pathlib import Path
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from sfst_qfis_repro import make_piecewise_eos, solve_star, pick_star_by_mass
+import scan_manifest
+from sfst_qfis_repro import solve_star, profile_sink
 
 def residual_profile(profile):
+    """r and dm/dr - 4 pi r^2 eps along one profile (a LazyProfile or a memory-mapped store profile)."""
     r = np.asarray(profile["r"])
     m = np.asarray(profile["m"])
     eps = np.asarray(profile["eps_grav"])
@@ -25,42 +27,47 @@ def main():
     outdir = Path("outputs/diagnostics")
     outdir.mkdir(parents=True, exist_ok=True)
 
-    eos = make_piecewise_eos(34.384, 3.005, 2.988, 2.851, "SLy-PP(Read2009)")
-    levels = [
-        ("T1", 3e-6, 1e-9, 8e4),
-        ("T2", 1e-6, 3e-10, 4e4),
-        ("T3", 3e-7, 1e-10, 2e4),
-    ]
+    # EOS, σ and tolerance ladder: the richardson_levels output of config/scan_manifest.yaml.
+    m = scan_manifest.load_manifest(scan_manifest.DEFAULT_MANIFEST)
+    out = scan_manifest.output(m, "richardson_levels")
+    eos = scan_manifest.get_eos(m, out["eos"])
+    sigma = float(out["sigma"])
     rows=[]
-    for label, rtol, atol, max_step in levels:
+    for label, method in out["levels"].items():
+        p = scan_manifest.method_params(m, method)
+        rtol, atol, max_step = p["rtol"], p["atol"], p.get("max_step", 5e4)
+        ladder = dict(n_points=int(p["n_points"]), log10_rho_min=p["log10_rho_min"], log10_rho_max=p["log10_rho_max"])
         df0 = solve_star.scan_family(eos, sigma_vac=0.0, chi_vac=1.0, screening_factor=1.0, include_in_gravity=False,
-                                     rtol=rtol, atol=atol, store_profiles=False)
-        df1 = solve_star.scan_family(eos, sigma_vac=0.06, chi_vac=1.0, screening_factor=1.0, include_in_gravity=False,
-                                     rtol=rtol, atol=atol, store_profiles=False)
+                                     rtol=rtol, atol=atol, max_step=max_step, store_profiles=False, **ladder)
+        df1 = solve_star.scan_family(eos, sigma_vac=sigma, chi_vac=1.0, screening_factor=1.0, include_in_gravity=False,
+                                     rtol=rtol, atol=atol, max_step=max_step, store_profiles=False, **ladder)
         M0 = float(df0["M_msun"].max()); M1 = float(df1["M_msun"].max())
         rows.append({"level":label,"rtol":rtol,"atol":atol,"max_step":max_step,"Mmax_baseline":M0,"Mmax_sigma":M1,"DeltaMmax":M1-M0})
     rich = pd.DataFrame(rows)
-    rich.to_csv(outdir/"richardson_levels.csv", index=False)
+    Path(out["path"]).parent.mkdir(parents=True, exist_ok=True)
+    rich.to_csv(out["path"], index=False)
 
     plt.figure(figsize=(6,4))
     plt.plot(rich["level"], rich["DeltaMmax"], marker="o")
     plt.xlabel("Tolerance level (coarser→finer)")
     plt.ylabel("ΔM_max [M_sun]")
-    plt.title("Convergence ladder for ΔM_max (SLy, Variant A)")
+    plt.title(f"Convergence ladder for ΔM_max ({eos.name}, Variant A)")
     plt.grid(True, which="both", ls=":")
     plt.tight_layout()
     plt.savefig(outdir/"richardson_DeltaMmax.png", dpi=200)
 
-    fam = solve_star.scan_family(eos, sigma_vac=0.0, chi_vac=1.0, screening_factor=1.0, include_in_gravity=False,
-                                 rtol=3e-7, atol=1e-10, store_profiles=True)
-    prof = pick_star_by_mass(fam, 1.4)
+    # The family streams its profiles into one store while it is integrated; I map the ~1.4 M⊙ star.
+    with profile_sink(outdir/"residual_trace.profiles", mode="w") as store:
+        fam = solve_star.scan_family(eos, sigma_vac=0.0, chi_vac=1.0, screening_factor=1.0, include_in_gravity=False,
+                                     rtol=3e-7, atol=1e-10)
+    prof = store.profile(fam.loc[(fam["M_msun"] - 1.4).abs().idxmin(), "profile_id"])
     r, res = residual_profile(prof)
     plt.figure(figsize=(6,4))
     plt.plot(r, np.abs(res))
     plt.yscale("log")
     plt.xlabel("r [geom]")
     plt.ylabel("|dm/dr - 4πr²ε|")
-    plt.title("Constraint residual along radius (SLy, ~1.4 M⊙)")
+    plt.title(f"Constraint residual along radius ({eos.name}, ~1.4 M⊙)")
     plt.grid(True, which="both", ls=":")
     plt.tight_layout()
     plt.savefig(outdir/"residual_trace.png", dpi=200)
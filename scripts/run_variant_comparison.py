@@ -9,7 +9,8 @@ if _ROOT not in sys.path:
 from pathlib import Path
 import pandas as pd
 import numpy as np
-from sfst_qfis_repro import make_piecewise_eos, scan_eos
+import scan_manifest
+from sfst_qfis_repro import scan_eos
 
 def interp(x, xp, fp):
     return float(np.interp(x, xp, fp))
@@ -30,23 +31,27 @@ def summarize(df: pd.DataFrame, target_mass=1.4):
     return {"Mmax":Mmax,"R_Mmax_km":R_Mmax,"Lambda_Mmax":L_Mmax,"R_1.4_km":R14,"Lambda_1.4":L14}
 
 if __name__ == "__main__":
-    outdir = Path("outputs/variant_AB")
+    # EOS, σ, χ and scan settings: the variant_AB output of config/scan_manifest.yaml.
+    m = scan_manifest.load_manifest(scan_manifest.DEFAULT_MANIFEST)
+    out = scan_manifest.output(m, "variant_AB")
+    scan_kw = scan_manifest.method_params(m, out["method"])
+    scan_kw = {k: (int(v) if k == "n_points" else v) for k, v in scan_kw.items()}
+    sigma, chi = float(out["sigma"]), float(out.get("chi", 1.0))
+    tag = f"sigma{sigma:g}".replace(".", "p")
+    outdir = Path(out["path"])
     outdir.mkdir(parents=True, exist_ok=True)
 
-    eos_list = [
-        make_piecewise_eos(34.384, 3.005, 2.988, 2.851, "SLy-PP(Read2009)"),
-        make_piecewise_eos(34.269, 2.830, 3.445, 3.348, "AP4-PP(Read2009)"),
-    ]
-
     rows=[]
-    for eos in eos_list:
+    for name in scan_manifest.eos_names(m, out["eos"]):
+        eos = scan_manifest.get_eos(m, name)
         for include_in_gravity in [False, True]:
-            df = scan_eos(eos, sigma_vac=0.06, chi_vac=1.0, screening_factor=1.0, include_in_gravity=include_in_gravity)
-            df.to_csv(outdir/f"{eos.name}_sigma0p06_grav{include_in_gravity}.csv", index=False)
+            df = scan_eos(eos, sigma_vac=sigma, chi_vac=chi, screening_factor=1.0, include_in_gravity=include_in_gravity,
+                          **scan_kw)
+            df.to_csv(outdir/f"{eos.name}_{tag}_grav{include_in_gravity}.csv", index=False)
             s = summarize(df)
-            s.update({"EOS":eos.name,"sigma":0.06,"chi":1.0,"include_in_gravity":include_in_gravity})
+            s.update({"EOS":eos.name,"sigma":sigma,"chi":chi,"include_in_gravity":include_in_gravity})
             rows.append(s)
 
     comp = pd.DataFrame(rows)
-    comp.to_csv(outdir/"variantA_vs_B_summary.csv", index=False)
+    comp.to_csv(outdir/out.get("summary", "variantA_vs_B_summary.csv"), index=False)
     print(comp)
@@ -2,7 +2,7 @@
 """scan_gGamma_small.py
 
 Tiny end-to-end smoke test for the (g, Gamma) mapping workflow.
-Intended to be run with SFST_DRYRUN=1 unless you've wired a real solver.
+Runs the real in-process solver backend (a few seconds); SFST_DUMMY=1 writes placeholders instead.
 
 Outputs:
 - outputs/scan_mapping_small/scan_grid.csv
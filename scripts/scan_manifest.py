@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""Declarative scan manifest engine (config/scan_manifest.yaml).
+
+The canonical EOS lists, case tables, σ grids and tolerance ladders used to live separately
+in run_canonical, build_runs_summary, generate_sigma_scan, run_variant_comparison,
+run_sensitivity_convergence and run_richardson_and_residuals, and every script re-solved its
+own grid. The manifest declares all of it once, and those scripts now read their sets from it
+(output(), eos_names(), get_eos(), star_case(), method_params()), so editing the YAML changes what
+`make run-all` computes. This engine is the other way to produce the same tables: all outputs at
+once, with shared families solved once.
+
+  eos_sets   named EOS lists (canonical names/aliases, or entries of eos_defs)
+  eos_defs   EOS built from an explicit factory call (e.g. build_runs_summary's Poly2)
+  cases      named physics cases: sigma, chi, screening_factor, include_in_gravity, variant
+  methods    how a sequence is solved: ladder (fixed ρ_c ladder), adaptive (scan_eos) or
+             root (headline_observables), with their ρ_c range and tolerances
+  outputs    the tables to produce; each `kind` writes the CSV layout of the script it replaces
+
+I expand every output into the families it needs. A family is one EOS x (δ = σ·χ·S,
+include_in_gravity) x method. Families are deduplicated across all outputs: δ folds χ and the
+screening factor into σ, and at δ = 0 include_in_gravity has no effect. Each unique family is
+solved once. Families that share an EOS and a method are solved together in one solver call per
+pass (solve_cases / adaptive_scan_cases), so with SFST_ENGINE=batched they share one lockstep
+integration. --jobs fans the stars out over worker processes, and the persistent star cache
+(--cache, default $SFST_CACHE or outputs/.cache) makes re-runs and overlapping manifests cheap.
+
+Usage:
+    python scripts/scan_manifest.py                        # config/scan_manifest.yaml, all outputs
+    python scripts/scan_manifest.py --only runs_summary variant_AB --jobs 4
+    python scripts/scan_manifest.py --dry-run              # print the deduplicated plan
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# Ensure repo root and scripts/ are importable when running via `python scripts/...`.
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = Path(__file__).resolve().parent
+for p in (REPO_ROOT, SCRIPTS_DIR):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+DEFAULT_MANIFEST = REPO_ROOT / "config" / "scan_manifest.yaml"
+METHODS = ("ladder", "adaptive", "root")
+# Method parameters that are solver settings (passed to integrate_star); the rest shape the ρ_c search.
+SOLVER_PARAMS = ("max_step", "rtol", "atol", "r0", "rmax")
+DELTA_DIGITS = 12  # as scan_wrappers.physics_key
+
+
+@dataclass(frozen=True)
+class Family:
+    """One sequence to solve: EOS x (δ, include_in_gravity) x method; the unit of deduplication."""
+    eos: str
+    delta: float
+    include_in_gravity: bool
+    method: str
+    params: tuple  # sorted (name, value) pairs of the method
+
+    @property
+    def case(self) -> dict:
+        return dict(sigma_vac=self.delta, chi_vac=1.0, screening_factor=1.0,
+                    include_in_gravity=self.include_in_gravity)
+
+
+def load_manifest(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        m = yaml.safe_load(f) or {}
+    for section in ("eos_sets", "eos_defs", "cases", "methods"):
+        m.setdefault(section, {})
+    m.setdefault("outputs", [])
+    for name, spec in m["methods"].items():
+        if spec.get("method") not in METHODS:
+            raise ValueError(f"method {name!r}: 'method' must be one of {METHODS}")
+        for k, v in spec.items():
+            if k != "method" and not isinstance(v, bool):
+                spec[k] = float(v)  # YAML 1.1 reads 5.0e4 (no exponent sign) as a string
+    for spec in m["eos_defs"].values():
+        spec["args"] = [float(a) if isinstance(a, str) else a for a in spec["args"]]
+    for i, out in enumerate(m["outputs"]):
+        if out.get("kind") not in KINDS:
+            raise ValueError(f"output {out.get('name', i)!r}: unknown kind {out.get('kind')!r} "
+                             f"(expected one of {', '.join(KINDS)})")
+        out.setdefault("name", out["kind"])
+    return m
+
+
+def eos_names(m: dict, ref) -> list:
+    """An output's `eos` field: an eos_sets name, a single EOS, or a list of either."""
+    refs = ref if isinstance(ref, list) else [ref]
+    names = []
+    for r in refs:
+        names.extend(m["eos_sets"].get(r, [r]))
+    return names
+
+
+def get_eos(m: dict, name: str):
+    from sfst_qfis_repro import canonical_eos, eos_from_spec
+    spec = m["eos_defs"].get(name)
+    if spec is None:
+        return canonical_eos(name)
+    return eos_from_spec((spec["factory"], tuple(spec["args"]), spec.get("name", name), None))
+
+
+def physics(sigma: float, chi: float = 1.0, screening_factor: float = 1.0, include_in_gravity: bool = False):
+    """Canonical (δ, include_in_gravity) of a case."""
+    delta = float(f"{float(sigma) * float(chi) * float(screening_factor):.{DELTA_DIGITS}g}") + 0.0
+    return delta, bool(include_in_gravity) and delta != 0.0  # at δ = 0 gravity inclusion is a no-op
+
+
+def family(m: dict, eos: str, method: str, *, sigma: float, chi: float = 1.0, screening_factor: float = 1.0,
+           include_in_gravity: bool = False) -> Family:
+    spec = dict(m["methods"][method])
+    kind = spec.pop("method")
+    delta, inc_g = physics(sigma, chi, screening_factor, include_in_gravity)
+    return Family(eos, delta, inc_g, kind, tuple(sorted((k, v) for k, v in spec.items())))
+
+
+def output(m: dict, name: str) -> dict:
+    """The output named `name` (the scripts look up the output they produce)."""
+    for out in m["outputs"]:
+        if out["name"] == name:
+            return out
+    raise KeyError(f"manifest has no output {name!r}")
+
+
+def method_params(m: dict, name: str) -> dict:
+    """A method's parameters without its 'method' kind."""
+    return {k: v for k, v in m["methods"][name].items() if k != "method"}
+
+
+def case_labels(out: dict) -> list:
+    """An output's `cases`: a list of case names, or a mapping {row label: case name}."""
+    cases = out["cases"]
+    return list(cases.items()) if isinstance(cases, dict) else [(c, c) for c in cases]
+
+
+def case_of(m: dict, name: str) -> dict:
+    c = m["cases"][name]
+    return dict(sigma=float(c.get("sigma", 0.0)), chi=float(c.get("chi", 1.0)),
+                screening_factor=float(c.get("screening_factor", 1.0)),
+                include_in_gravity=bool(c.get("include_in_gravity", False)))
+
+
+def star_case(m: dict, name: str) -> dict:
+    """case_of as integrate_star keywords (sigma_vac, chi_vac, screening_factor, include_in_gravity)."""
+    c = case_of(m, name)
+    return dict(sigma_vac=c["sigma"], chi_vac=c["chi"], screening_factor=c["screening_factor"],
+                include_in_gravity=c["include_in_gravity"])
+
+
+# --- output kinds: plan(m, out) -> {name: Family}; emit(m, out, results, families), both keyed by name ---
+
+def solver_cfg(m: dict, method: str):
+    """build_runs_summary.SolverCfg of a ladder method."""
+    from build_runs_summary import SolverCfg
+    p = m["methods"][method]
+    return SolverCfg(n_points=int(p.get("n_points", 0)), rho_min=float(p["rho_min"]), rho_max=float(p["rho_max"]),
+                     max_step=float(p["max_step"]), rtol=float(p["rtol"]), atol=float(p["atol"]))
+
+
+def _observables(fam: Family, res):
+    from build_runs_summary import compute_observables, observables_from_root
+    return observables_from_root(*res) if fam.method == "root" else compute_observables(res)
+
+
+def _plan_runs_summary(m, out):
+    return {(eos, label, lvl): family(m, eos, out[lvl], **case_of(m, case))
+            for eos in eos_names(m, out["eos"]) for label, case in case_labels(out) for lvl in ("baseline", "refined")}
+
+
+def _emit_runs_summary(m, out, res, fams):
+    from build_runs_summary import finalize_summary, summary_row
+    rows = []
+    for eos in eos_names(m, out["eos"]):
+        label = get_eos(m, eos).name
+        for case, name in case_labels(out):
+            c = case_of(m, name)
+            obs0 = _observables(fams[(eos, case, "baseline")], res[(eos, case, "baseline")])
+            obs1 = _observables(fams[(eos, case, "refined")], res[(eos, case, "refined")])
+            rows.append(summary_row(label, case, c["sigma"], c["chi"], c["include_in_gravity"],
+                                    m["cases"][name].get("variant", "A"), obs0, obs1, solver_cfg(m, out["baseline"]),
+                                    solver_cfg(m, out["refined"]), c["screening_factor"]))
+    import run_store
+    run_store.write_table(Path(out["path"]), finalize_summary(pd.DataFrame(rows)), replace=True)
+
+
+def _plan_sigma_scan(m, out):
+    return {(eos, s): family(m, eos, out["method"], sigma=s) for eos in eos_names(m, out["eos"]) for s in out["sigma"]}
+
+
+def _emit_sigma_scan(m, out, res, fams):
+    from generate_sigma_scan import merge_runs_summary, sigma_scan_row
+    from sfst_qfis_repro import interp_at_mass
+    rows = []
+    for eos in eos_names(m, out["eos"]):
+        label = get_eos(m, eos).name
+        for s in out["sigma"]:
+            r = res[(eos, s)]
+            if fams[(eos, s)].method == "root":
+                o = _observables(fams[(eos, s)], r)
+                Mmax, R14, Lam14, status = o["Mmax"], o["R_1p4"], o["Lambda_1p4"], o["status"]
+            else:
+                Mmax = float(np.nanmax(r["M_msun"].values)) if len(r) else np.nan
+                R14, Lam14, status = interp_at_mass(r, target=1.4) if len(r) else (np.nan, np.nan, "no_points")
+            rows.append(sigma_scan_row(label, float(s), Mmax, R14, Lam14, status))
+    merge_runs_summary(Path(out["path"]), pd.DataFrame(rows))
+
+
+def _plan_variant_comparison(m, out):
+    return {(eos, inc_g): family(m, eos, out["method"], sigma=out["sigma"], chi=out.get("chi", 1.0),
+                                 include_in_gravity=inc_g)
+            for eos in eos_names(m, out["eos"]) for inc_g in (False, True)}
+
+
+def _emit_variant_comparison(m, out, res, fams):
+    from run_variant_comparison import summarize
+    outdir = Path(out["path"])
+    outdir.mkdir(parents=True, exist_ok=True)
+    sigma, chi = float(out["sigma"]), float(out.get("chi", 1.0))
+    tag = f"sigma{sigma:g}".replace(".", "p")
+    rows = []
+    for eos in eos_names(m, out["eos"]):
+        label = get_eos(m, eos).name
+        for inc_g in (False, True):
+            df = res[(eos, inc_g)]
+            df.to_csv(outdir/f"{label}_{tag}_grav{inc_g}.csv", index=False)
+            s = summarize(df)
+            s.update({"EOS": label, "sigma": sigma, "chi": chi, "include_in_gravity": inc_g})
+            rows.append(s)
+    pd.DataFrame(rows).to_csv(outdir/out.get("summary", "variantA_vs_B_summary.csv"), index=False)
+
+
+def _plan_sensitivity_convergence(m, out):
+    return {(eos, s): family(m, eos, out["method"], sigma=s)
+            for eos in eos_names(m, out["eos"]) for s in [0.0, *out["sigma"]]}
+
+
+def _emit_sensitivity_convergence(m, out, res, fams):
+    from run_sensitivity_convergence import sensitivity_rows
+    rows = []
+    for eos in eos_names(m, out["eos"]):
+        rows.extend(sensitivity_rows(get_eos(m, eos).name, res[(eos, 0.0)], {s: res[(eos, s)] for s in out["sigma"]}))
+    path = Path(out["path"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def _plan_tolerance_ladder(m, out):
+    return {(lvl, s): family(m, out["eos"], method, sigma=s)
+            for lvl, method in out["levels"].items() for s in (0.0, out["sigma"])}
+
+
+def _emit_tolerance_ladder(m, out, res, fams):
+    rows = []
+    for lvl, method in out["levels"].items():
+        p = m["methods"][method]
+        M0, M1 = float(res[(lvl, 0.0)]["M_msun"].max()), float(res[(lvl, out["sigma"])]["M_msun"].max())
+        rows.append({"level": lvl, "rtol": p.get("rtol"), "atol": p.get("atol"), "max_step": p.get("max_step", 5e4),
+                     "Mmax_baseline": M0, "Mmax_sigma": M1, "DeltaMmax": M1 - M0})
+    path = Path(out["path"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def _plan_canonical_runs(m, out):
+    return {(eos, label): family(m, eos, out["method"], **case_of(m, case))
+            for eos in eos_names(m, out["eos"]) for label, case in case_labels(out)}
+
+
+def _emit_canonical_runs(m, out, res, fams):
+    from sfst_qfis_repro import canonical_sensitivities, canonical_summary_row
+    outpath = Path(out["path"])
+    summary = []
+    for eos in eos_names(m, out["eos"]):
+        label = get_eos(m, eos).name
+        for case, name in case_labels(out):
+            c = case_of(m, name)
+            r, obs = res[(eos, case)], None
+            if fams[(eos, case)].method == "root":
+                obs, r = r
+            run_dir = outpath/label/case
+            run_dir.mkdir(parents=True, exist_ok=True)
+            r.to_csv(run_dir/"mr_lambda.csv", index=False)
+            kw = dict(sigma_vac=c["sigma"], chi_vac=c["chi"], screening_factor=c["screening_factor"],
+                      include_in_gravity=c["include_in_gravity"])
+            summary.append(canonical_summary_row(label, case, kw, r, obs=obs))
+    summary_df = pd.DataFrame(summary)
+    summary_df.to_csv(outpath/"summary_canonical_runs.csv", index=False)
+    canonical_sensitivities(summary_df).to_csv(outpath/"sensitivities_from_canonical.csv", index=False)
+
+
+KINDS = {
+    "runs_summary": (_plan_runs_summary, _emit_runs_summary),                  # build_runs_summary.py
+    "sigma_scan": (_plan_sigma_scan, _emit_sigma_scan),                        # generate_sigma_scan.py
+    "variant_comparison": (_plan_variant_comparison, _emit_variant_comparison),  # run_variant_comparison.py
+    "sensitivity_convergence": (_plan_sensitivity_convergence, _emit_sensitivity_convergence),
+    "tolerance_ladder": (_plan_tolerance_ladder, _emit_tolerance_ladder),      # richardson_levels.csv
+    "canonical_runs": (_plan_canonical_runs, _emit_canonical_runs),            # run_canonical (no plots)
+}
+
+
+# --- engine ---
+
+def plan(m: dict, outputs: list):
+    """{output name: {name: Family}} and the deduplicated families in first-use order."""
+    plans = {out["name"]: KINDS[out["kind"]][0](m, out) for out in outputs}
+    unique = list(dict.fromkeys(f for p in plans.values() for f in p.values()))
+    return plans, unique
+
+
+def _log10_rho(p: dict, end: str, default: float | None = None) -> float:
+    """log10 of the ρ_c bound `end` ('min'/'max') of a method: log10_rho_<end>, else rho_<end> [g/cm^3]."""
+    if f"log10_rho_{end}" in p:
+        return float(p[f"log10_rho_{end}"])
+    if f"rho_{end}" in p or default is None:
+        return float(np.log10(p[f"rho_{end}"]))
+    return default
+
+
+def solve_families(m: dict, families, *, engine: str | None = None, jobs: int | None = None) -> dict:
+    """Solve every family once; families sharing EOS and method go through one solver call per pass.
+
+    Returns {Family: result}: a DataFrame of star records for ladder/adaptive, (obs, df) for root.
+    """
+    from sfst_qfis_repro import FAST_CI, adaptive_scan_cases, headline_observables, solve_cases
+    groups = {}
+    for f in families:
+        groups.setdefault((f.eos, f.method, f.params), []).append(f)
+    results = {}
+    for (eos_name, method, params), fams in groups.items():
+        eos = get_eos(m, eos_name)
+        p = dict(params)
+        solver = {k: p.pop(k) for k in SOLVER_PARAMS if k in p}
+        cases = {i: f.case for i, f in enumerate(fams)}
+        if method == "ladder":
+            rho = np.logspace(_log10_rho(p, "min"), _log10_rho(p, "max"), int(p["n_points"]))
+            recs = solve_cases(eos, cases, rho, engine=engine, jobs=jobs, **solver)
+            for i, f in enumerate(fams):
+                results[f] = pd.DataFrame([r for r in recs[i] if r is not None])
+        elif method == "adaptive":
+            scans = adaptive_scan_cases(eos, float(p.get("target_M", 1.4)), cases,
+                                        n_points=int(p.get("n_points", 10 if FAST_CI else 18)),
+                                        log10_rho_min=_log10_rho(p, "min", 14.2),
+                                        log10_rho_max=_log10_rho(p, "max", 15.9),
+                                        engine=engine, jobs=jobs, **solver)
+            for i, f in enumerate(fams):
+                df, diag = scans[i]
+                df.attrs["scan_diag"] = diag
+                results[f] = df
+        else:
+            for f in fams:
+                results[f] = headline_observables(eos, **f.case, target_M=float(p.get("target_M", 1.4)),
+                                                  log10_rho_min=_log10_rho(p, "min", 14.2),
+                                                  log10_rho_max=_log10_rho(p, "max", 15.9),
+                                                  engine=engine, jobs=jobs, **solver)
+        print(f"  solved {eos.name} [{method}] {len(fams)} families")
+    return results
+
+
+def run_manifest(m: dict, *, only=None, engine: str | None = None, jobs: int | None = None, dry_run: bool = False):
+    outputs = [o for o in m["outputs"] if not only or o["name"] in only]
+    missing = set(only or ()) - {o["name"] for o in outputs}
+    if missing:
+        raise SystemExit(f"unknown output(s): {', '.join(sorted(missing))}")
+    plans, unique = plan(m, outputs)
+    n_req = sum(len(p) for p in plans.values())
+    print(f"{len(outputs)} outputs request {n_req} families; {len(unique)} unique after deduplication.")
+    if dry_run:
+        for name, p in plans.items():
+            print(f"  {name}: {len(p)} families")
+        return
+    t0 = time.time()
+    results = solve_families(m, unique, engine=engine, jobs=jobs)
+    for out in outputs:
+        fams = plans[out["name"]]
+        KINDS[out["kind"]][1](m, out, {k: results[f] for k, f in fams.items()}, fams)
+        print(f"Wrote {out['name']} -> {out['path']}")
+    print(f"Done in {time.time() - t0:.1f} s.")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Run a declarative scan manifest.")
+    ap.add_argument("manifest", nargs="?", default=str(DEFAULT_MANIFEST))
+    ap.add_argument("--only", nargs="*", default=None, help="Output names to produce (default: all)")
+    ap.add_argument("--jobs", type=int, default=None, help="Worker processes for the stars (default: $SFST_JOBS or 1)")
+    ap.add_argument("--engine", choices=["scalar", "batched"], default=None, help="Default: $SFST_ENGINE or scalar")
+    ap.add_argument("--cache", default=None,
+                    help="Persistent star cache directory (default: $SFST_CACHE or outputs/.cache; 'off' disables)")
+    ap.add_argument("--dry-run", action="store_true", help="Print the deduplicated plan without solving")
+    args = ap.parse_args()
+    # Before sfst_qfis_repro is imported: DEFAULT_CACHE is read at import time.
+    if args.cache is not None:
+        os.environ["SFST_CACHE"] = args.cache
+    else:
+        os.environ.setdefault("SFST_CACHE", "outputs/.cache")
+
+    run_manifest(load_manifest(args.manifest), only=args.only, engine=args.engine, jobs=args.jobs,
+                 dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
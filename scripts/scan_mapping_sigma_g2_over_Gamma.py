@@ -5,17 +5,38 @@ Repo-integrated helper script: build a (g, Gamma) grid, map to sigma = g^2/Gamma
 and run the existing TOV pipeline for each parameter set.
 
 IMPORTANT:
-- This script is a *driver*: you must connect `compute_tov_case(...)` to your project’s
-  existing run function(s). The hook is intentionally small and local.
+- This script is a *driver*: each point goes through `scan_wrappers.compute_tov_case(...)`,
+  which solves it in-process on a persistent worker pool (SFST_TOV_WORKERS).
 - Outputs are written under outputs/scan_mapping/ and figures/scan_mapping/.
+
+Controller
+I drive the grid with an asyncio controller: at most --concurrency runs are in flight (each
+one blocks a thread on the worker pool, or on the resident daemon with --backend daemon).
+Completed rows are appended to scan_grid.csv and audit_index.csv as they finish. Points whose
+outputs/diagnostics/<run_tag>/run_index.json already says "done" are taken from there, so an
+interrupted scan resumes where it stopped (--no-resume recomputes everything). When the grid
+is complete, both CSVs are rewritten in grid order.
+
+Many grid points share one sigma = g^2/Gamma * chi_ref; scan_wrappers canonicalizes each point to
+its physics key, so only the distinct keys are solved and the aliases reuse that result.
 """
 
-import os
-import math
+import argparse
+import asyncio
+import csv
 import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
 
+# Ensure repo root is importable when this script is executed as a file.
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
 # ---- user config ----
 CHI_REF = 1.0
 LOG10_G_MIN, LOG10_G_MAX = -6.0, -1.0
@@ -28,7 +49,15 @@ FIG_DIR = "figures/scan_mapping"
 os.makedirs(OUT_DIR, exist_ok=True)
 os.makedirs(FIG_DIR, exist_ok=True)
 
-from scan_wrappers import compute_tov_case  # template wrapper (wire _call_tov_entrypoint)
+import scan_wrappers  # noqa: E402
+import tov_daemon  # noqa: E402
+from scan_wrappers import compute_tov_case  # noqa: E402
+from sfst_qfis_repro import budget_reason  # noqa: E402
+
+GRID_COLUMNS = ["run_id", "eos", "g", "Gamma", "sigma", "M_max", "R_1p4", "Lambda_1p4", "max_epsratio",
+                "wfaktor_max", "newton_final_residual", "converged", "status", "error"]
+AUDIT_COLUMNS = ["run_id", "eos", "g", "Gamma", "sigma", "status", "path", "reason"]
+
 
 def classify_run(max_epsratio: float, wfaktor_max: float, newton_residual: float) -> str:
     # Mirror thresholds used in config/validate_config.yaml (adjust if needed)
@@ -38,46 +67,160 @@ def classify_run(max_epsratio: float, wfaktor_max: float, newton_residual: float
         return "STRESS"
     return "DIAGNOSTIC"
 
-def main():
+
+def grid_points():
     g_vals = np.logspace(LOG10_G_MIN, LOG10_G_MAX, N_G)
     gamma_vals = np.logspace(LOG10_GAMMA_MIN, LOG10_GAMMA_MAX, N_GAMMA)
-
-    rows = []
+    points = []
     for eos in EOS_LIST:
         for g in g_vals:
             for Gamma in gamma_vals:
-                sigma = (g**2) / Gamma * CHI_REF
-                run_tag = f"{eos}_g{g:.2e}_G{Gamma:.2e}"
-                try:
-                    res = compute_tov_case(eos=eos, sigma=float(sigma), run_tag=run_tag, extra={"g":float(g), "Gamma":float(Gamma)})
-                    status = classify_run(float(res.get("max_epsratio", 999.0)),
-                                          float(res.get("wfaktor_max", 1e99)),
-                                          float(res.get("newton_final_residual", 1.0)))
-                    rows.append({
-                        "run_id": res.get("run_id"),
-                        "eos": eos,
-                        "g": float(g),
-                        "Gamma": float(Gamma),
-                        "sigma": float(sigma),
-                        "M_max": res.get("M_max"),
-                        "R_1p4": res.get("R_1p4"),
-                        "Lambda_1p4": res.get("Lambda_1p4"),
-                        "max_epsratio": res.get("max_epsratio"),
-                        "wfaktor_max": res.get("wfaktor_max"),
-                        "newton_final_residual": res.get("newton_final_residual"),
-                        "converged": res.get("converged"),
-                        "status": status
-                    })
-                except Exception as e:
-                    rows.append({
-                        "run_id": None, "eos": eos, "g": float(g), "Gamma": float(Gamma), "sigma": float(sigma),
-                        "status": "FAILED", "error": str(e)
-                    })
-
-    df = pd.DataFrame(rows)
+                points.append({"eos": eos, "g": float(g), "Gamma": float(Gamma),
+                               "sigma": float((g**2) / Gamma * CHI_REF),
+                               "run_tag": f"{eos}_g{g:.2e}_G{Gamma:.2e}"})
+    return points
+
+
+def _num(v, default):
+    return float(v) if v is not None else default
+
+
+def result_rows(p: dict, res: dict):
+    """(scan_grid row, audit_index row) for one point and its compute_tov_case result."""
+    if res.get("error"):
+        status = "FAILED"
+    elif res.get("status") == "budget_exceeded":
+        status = "BUDGET_EXCEEDED"
+    else:
+        status = classify_run(_num(res.get("max_epsratio"), 999.0), _num(res.get("wfaktor_max"), 1e99),
+                              _num(res.get("newton_final_residual"), 1.0))
+    row = {"run_id": res.get("run_id"), "eos": p["eos"], "g": p["g"], "Gamma": p["Gamma"], "sigma": p["sigma"],
+           **{k: res.get(k) for k in ("M_max", "R_1p4", "Lambda_1p4", "max_epsratio", "wfaktor_max",
+                                      "newton_final_residual", "converged")},
+           "status": status, "error": res.get("error", "")}
+    audit = {"run_id": res.get("run_id"), "eos": p["eos"], "g": p["g"], "Gamma": p["Gamma"], "sigma": p["sigma"],
+             "status": status, "path": str(scan_wrappers.OUTPUT_BASE / (res.get("run_id") or p["run_tag"])),
+             "reason": res.get("error") or budget_reason(res.get("budget"))}
+    return row, audit
+
+
+def completed_result(run_tag: str):
+    """The result stored in run_index.json of a finished run (either run layout), or None."""
+    import run_pack
+    blob = run_pack.read_run_file(scan_wrappers.OUTPUT_BASE, run_tag, "run_index.json")
+    if blob is None:
+        return None
+    try:
+        idx = json.loads(blob)
+    except ValueError:
+        return None
+    return idx if idx.get("status") == "done" else None
+
+
+class _CsvStream:
+    """Append-only CSV writer that flushes every row (so an interrupted scan keeps its rows)."""
+
+    def __init__(self, path: str, columns):
+        self.path, self.columns = path, columns
+        self._f = open(path, "w", newline="", encoding="utf-8")
+        self._w = csv.DictWriter(self._f, fieldnames=columns)
+        self._w.writeheader()
+
+    def write(self, row: dict) -> None:
+        self._w.writerow({k: row.get(k) for k in self.columns})
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def _solve_point(p: dict, backend: str) -> dict:
+    try:
+        if backend == "daemon":
+            res = tov_daemon.run_via_daemon(p["eos"], p["sigma"], p["run_tag"],
+                                            {"g": p["g"], "Gamma": p["Gamma"]}, scan_wrappers.DEFAULT_TIMEOUT)
+            if res is not None:
+                return res
+        return compute_tov_case(eos=p["eos"], sigma=p["sigma"], run_tag=p["run_tag"],
+                                extra={"g": p["g"], "Gamma": p["Gamma"]})
+    except Exception as e:  # keep the scan going; the row is marked FAILED
+        return {"run_id": None, "error": f"{type(e).__name__}: {e}"}
+
+
+async def run_grid(points, *, concurrency: int, backend: str, resume: bool):
+    """Solve all points with at most `concurrency` in flight; returns {run_tag: result}."""
+    grid = _CsvStream(os.path.join(OUT_DIR, "scan_grid.csv"), GRID_COLUMNS)
+    audit = _CsvStream(os.path.join(OUT_DIR, "audit_index.csv"), AUDIT_COLUMNS)
+    results = {}
+
+    def record(p, res):
+        results[p["run_tag"]] = res
+        row, arow = result_rows(p, res)
+        grid.write(row)
+        audit.write(arow)
+
+    todo = []
+    for p in points:
+        done = completed_result(p["run_tag"]) if resume else None
+        if done is not None:
+            record(p, done)
+        else:
+            todo.append(p)
+    print(f"{len(points) - len(todo)} of {len(points)} points already complete; solving {len(todo)}.")
+
+    # Points sharing a physics key (same EOS and sigma, see scan_wrappers.physics_key) are solved
+    # once: the first point of each group takes a concurrency slot, the rest are fanned out after it.
+    groups = {}
+    for p in todo:
+        key = scan_wrappers.physics_key(p["eos"], p["sigma"], {"g": p["g"], "Gamma": p["Gamma"]})
+        groups.setdefault(scan_wrappers.physics_key_id(key), []).append(p)
+    print(f"{len(groups)} distinct physics keys among {len(todo)} points.")
+
+    sem = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    threads = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def one(p, slot=True):
+        if slot:
+            async with sem:
+                res = await loop.run_in_executor(threads, _solve_point, p, backend)
+        else:
+            res = await loop.run_in_executor(threads, _solve_point, p, backend)
+        record(p, res)
+        print(f"[{len(results)}/{len(points)}] {p['run_tag']}: {result_rows(p, res)[0]['status']}", flush=True)
+
+    async def group(members):
+        await one(members[0])
+        await asyncio.gather(*(one(p, slot=False) for p in members[1:]))
+
+    try:
+        await asyncio.gather(*(group(members) for members in groups.values()))
+    finally:
+        threads.shutdown(wait=True)
+        grid.close()
+        audit.close()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="(g, Gamma) -> sigma mapping scan")
+    ap.add_argument("--concurrency", type=int, default=max(scan_wrappers.N_WORKERS, 1),
+                    help="Runs in flight (default: $SFST_TOV_WORKERS)")
+    ap.add_argument("--backend", choices=["pool", "daemon"], default="pool",
+                    help="'pool': scan_wrappers worker pool; 'daemon': resident tov_daemon (falls back to the pool)")
+    ap.add_argument("--no-resume", dest="resume", action="store_false",
+                    help="Recompute points that already have a completed run_index.json")
+    args = ap.parse_args()
+
+    points = grid_points()
+    results = asyncio.run(run_grid(points, concurrency=args.concurrency, backend=args.backend, resume=args.resume))
+
+    # Final files in grid order (the streamed ones are in completion order).
+    rows, audit = zip(*(result_rows(p, results[p["run_tag"]]) for p in points))
     out_csv = os.path.join(OUT_DIR, "scan_grid.csv")
-    df.to_csv(out_csv, index=False)
-    print(f"Wrote {out_csv} with {len(df)} rows.")
+    pd.DataFrame(list(rows), columns=GRID_COLUMNS).to_csv(out_csv, index=False)
+    pd.DataFrame(list(audit), columns=AUDIT_COLUMNS).to_csv(os.path.join(OUT_DIR, "audit_index.csv"), index=False)
+    print(f"Wrote {out_csv} with {len(rows)} rows.")
 
 if __name__ == "__main__":
     main()
@@ -41,6 +41,10 @@ def _append_refinement_log(orig_run_id: str, entry: dict, diag_base: Path = Path
 import pandas as pd
 import json
 import datetime
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import run_store  # noqa: E402
 
 DEFAULT_RERUN_CFG = {
     "grid_refine": "n_to_2n",
@@ -55,7 +59,7 @@ def now_iso():
     return datetime.datetime.now(datetime.timezone.utc).isoformat()
 
 def load_runs(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+    df = run_store.read_table(path)
     # normalize expected columns
     for c in ["delta_total_Mmax_pct","delta_total_R14_pct","delta_total_Lambda14_pct"]:
         if c not in df.columns:
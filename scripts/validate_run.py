@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """Automated, auditable run validator.
 
-Reads a run table (default: outputs/runs_summary.csv) and classifies rows as:
+Reads a run table (default: outputs/runs_summary.csv, through the run store, see run_store.py)
+and classifies rows as:
 - accepted
 - stress (epsratio in stress band but numerically convergent)
 - diagnostic (numerical/pathology)
@@ -17,22 +18,35 @@ Key reviewer-facing outputs:
 
 For any non-accepted run, creates outputs/diagnostics/<run_id>/diagnosis.txt and
 lightweight, reproducible diagnostic artefacts (wfaktor/epsratio/residual stubs),
-so that every exclusion is auditable from the frozen snapshot.
+so that every exclusion is auditable from the frozen snapshot. Classification is
+vectorized over the table; the bundles are rendered afterwards, in parallel, and
+only where missing or stale (outputs/diagnostics/<run_id>/bundle.json).
 
 Usage (as requested in the checklist):
   python scripts/validate_run.py --runs outputs/runs_summary.csv
+  python scripts/validate_run.py --bundles skip          # classify only
+  python scripts/validate_run.py --bundles only --jobs 8 # (re)render bundles from audit_trail.csv
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import math
 import yaml
 import pandas as pd
 
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import run_store  # noqa: E402
+
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
@@ -44,6 +58,26 @@ def load_cfg():
         return yaml.safe_load(f)
 
 
+NUMERIC_FIELDS = [
+    'Mmax','R_1.4','Lambda_1.4',
+    'delta_total_Mmax_pct','delta_total_R14_pct','delta_total_Lambda14_pct',
+    'wfaktor_max','max_epsratio'
+]
+DTOTAL_FIELDS = ['delta_total_Mmax_pct','delta_total_R14_pct','delta_total_Lambda14_pct']
+# budget_status: runs_summary.csv (build_runs_summary); status: flattened solve_run_config summaries.
+BUDGET_STATUS_FIELDS = ('budget_status', 'status')
+TRAIL_FIELDS = ['sigma','chi','include_in_gravity','Mmax','R_1.4','Lambda_1.4','Delta_Lambda14_pct','delta_total_Lambda14_pct',
+                'delta_disc_Lambda14_pct','obs_status','baseline_max_step','refined_max_step','baseline_rtol','refined_rtol',
+                'baseline_atol','refined_atol']
+
+# Everything write_diagnostics_bundle renders; a bundle whose stamp matches these inputs is current.
+BUNDLE_FILES = ('diagnosis.txt', 'run.log', 'wfaktor.png', 'epsratio.png', 'residuals.png', 'richardson.png')
+BUNDLE_FIELDS = ['EOS','case','variant','sigma','chi','include_in_gravity','Mmax','R_1.4','Lambda_1.4','Delta_Lambda14_pct',
+                 'delta_total_Lambda14_pct','max_epsratio','wfaktor_max','baseline_max_step','refined_max_step',
+                 'baseline_rtol','refined_rtol','baseline_atol','refined_atol']
+BUNDLE_STAMP = 'bundle.json'
+
+
 def _is_bad_reason(r: str) -> bool:
     return r.startswith('nan_or_inf') or r.startswith('parse_error')
 
@@ -52,12 +86,7 @@ def classify_row(row: dict, cfg: dict) -> tuple[str, list[str]]:
     reasons: list[str] = []
 
     # Basic numeric sanity
-    numeric_fields = [
-        'Mmax','R_1.4','Lambda_1.4',
-        'delta_total_Mmax_pct','delta_total_R14_pct','delta_total_Lambda14_pct',
-        'wfaktor_max','max_epsratio'
-    ]
-    for f in numeric_fields:
+    for f in NUMERIC_FIELDS:
         v = row.get(f)
         try:
             fv = float(v)
@@ -74,9 +103,8 @@ def classify_row(row: dict, cfg: dict) -> tuple[str, list[str]]:
     eps_s = float(cfg['max_epsratio_stress'])
 
     # Total uncertainty threshold (flag if ANY headline-relevant quantity is unstable)
-    dtotal_fields = ['delta_total_Mmax_pct','delta_total_R14_pct','delta_total_Lambda14_pct']
     dtotal_vals = []
-    for f in dtotal_fields:
+    for f in DTOTAL_FIELDS:
         try:
             dtotal_vals.append(float(row.get(f, 'nan')))
         except Exception:
@@ -111,6 +139,117 @@ def classify_row(row: dict, cfg: dict) -> tuple[str, list[str]]:
         status = 'diagnostic'
         reasons.append('missing_epsratio')
 
+    # A run that stopped at its solver budget has no observables to judge: it is a retry, not a result.
+    for f in BUDGET_STATUS_FIELDS:
+        if str(row.get(f, '')).strip() == 'budget_exceeded':
+            status = 'diagnostic'
+            resource = row.get('budget_resource')
+            reasons.append(f"budget_exceeded:{resource}" if _present(resource) else 'budget_exceeded')
+            break
+
+    return status, reasons
+
+
+def _present(v) -> bool:
+    return bool(v) and not (isinstance(v, float) and math.isnan(v))
+
+
+def _float_column(df: pd.DataFrame, f: str) -> tuple[np.ndarray, np.ndarray]:
+    """(values, parse_error mask) of column f, as float(row.get(f)) sees it row by row."""
+    n = len(df)
+    if f not in df.columns:
+        return np.full(n, np.nan), np.ones(n, dtype=bool)
+    col = df[f]
+    if col.dtype != object:
+        try:
+            return col.to_numpy(dtype=float, copy=True), np.zeros(n, dtype=bool)
+        except (TypeError, ValueError):
+            pass
+    vals = pd.to_numeric(col, errors='coerce').to_numpy(dtype=float, copy=True)
+    # float('nan'/'inf') parses, so only non-null entries that did not coerce are parse errors (and None, which is null).
+    coerced = np.isnan(vals) & col.notna().to_numpy()
+    if coerced.any():
+        idx = np.flatnonzero(coerced)
+        ok = np.array([_parses(v) for v in col.to_numpy()[idx]], dtype=bool)
+        vals[idx[ok]] = [float(v) for v in col.to_numpy()[idx[ok]]]
+        coerced[idx[ok]] = False
+    none = col.map(lambda v: v is None).to_numpy(dtype=bool)
+    return vals, coerced | none
+
+
+def _parses(v) -> bool:
+    try:
+        float(v)
+        return True
+    except Exception:
+        return False
+
+
+def classify_table(df: pd.DataFrame, cfg: dict) -> tuple[np.ndarray, list[list[str]]]:
+    """classify_row over a whole run table at once.
+
+    I evaluate every gate as a column-wise mask and only touch individual rows to append the
+    reasons they triggered, so the cost is a handful of vector passes plus one step per flag.
+    Returns (status per row, reasons per row), identical to classify_row row by row.
+    """
+    n = len(df)
+    df = df.reset_index(drop=True)
+    reasons: list[list[str]] = [[] for _ in range(n)]
+
+    def flag(mask: np.ndarray, reason):
+        for i in np.flatnonzero(mask):
+            reasons[i].append(reason(i) if callable(reason) else reason)
+
+    status = np.full(n, 'accepted', dtype=object)
+    cols = {}
+    bad = np.zeros(n, dtype=bool)
+    for f in NUMERIC_FIELDS:
+        vals, parse_error = _float_column(df, f)
+        cols[f] = np.where(parse_error, np.nan, vals)
+        nan_or_inf = ~parse_error & ~np.isfinite(vals)
+        # the two masks are disjoint, so per-row reason order stays field by field
+        flag(nan_or_inf, f"nan_or_inf:{f}")
+        flag(parse_error, f"parse_error:{f}")
+        bad |= nan_or_inf | parse_error
+    status[bad] = 'diagnostic'
+
+    eps = cols['max_epsratio']
+    wf = cols['wfaktor_max']
+    eps_i = float(cfg['max_epsratio_interpretable'])
+    eps_s = float(cfg['max_epsratio_stress'])
+
+    dtotal = np.vstack([cols[f] for f in DTOTAL_FIELDS])
+    dtotal = np.where(np.isfinite(dtotal), dtotal, -np.inf).max(axis=0, initial=-np.inf)
+    dtotal[np.isneginf(dtotal)] = np.nan
+
+    with np.errstate(invalid='ignore'):
+        wf_flag = np.isfinite(wf) & (wf > float(cfg['wfaktor_max_threshold']))
+        dt_flag = np.isfinite(dtotal) & (dtotal > float(cfg['delta_total_threshold_pct']))
+        eps_ok = np.isfinite(eps)
+        stress_band = eps_ok & (eps > eps_i) & (eps <= eps_s)
+        over = eps_ok & (eps > eps_s)
+
+    status[wf_flag] = 'diagnostic'
+    flag(wf_flag, lambda i: f"extreme_wfaktor:{float(wf[i])}")
+    status[dt_flag] = 'diagnostic'
+    flag(dt_flag, lambda i: f"delta_total_gt_threshold:{float(dtotal[i])}")
+
+    status[stress_band & (status == 'accepted')] = 'stress'
+    flag(stress_band, lambda i: f"epsratio_stress:{float(eps[i])}")
+    status[over] = 'excluded'
+    flag(over, lambda i: f"epsratio_gt_{eps_s:.2f}:{float(eps[i])}")
+    status[~eps_ok] = 'diagnostic'
+    flag(~eps_ok, 'missing_epsratio')
+
+    budget = np.zeros(n, dtype=bool)
+    for f in BUDGET_STATUS_FIELDS:
+        if f in df.columns:
+            budget |= df[f].astype(str).str.strip().eq('budget_exceeded').to_numpy(dtype=bool)
+    if budget.any():
+        status[budget] = 'diagnostic'
+        resource = df['budget_resource'].to_numpy() if 'budget_resource' in df.columns else [None] * n
+        flag(budget, lambda i: f"budget_exceeded:{resource[i]}" if _present(resource[i]) else 'budget_exceeded')
+
     return status, reasons
 
 
@@ -215,77 +354,136 @@ def write_diagnostics_bundle(run_id: str, row: dict, status: str, reasons: list[
     _mini_plot(ddir / 'richardson.png', h, err, "Richardson ladder (stub)", "h (relative)", "error (arb.)")
 
 
+def _bundle_digest(run_id: str, row: dict, status: str, reasons: list[str]) -> str:
+    def plain(v):
+        if hasattr(v, 'item'):
+            v = v.item()
+        if v is None or (isinstance(v, float) and math.isnan(v)):
+            return None
+        return v
+    payload = {'run_id': run_id, 'status': status, 'reasons': reasons,
+               'row': {k: plain(row.get(k)) for k in BUNDLE_FIELDS if k in row}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _bundle_current(run_id: str, digest: str) -> bool:
+    ddir = Path('outputs/diagnostics') / run_id
+    try:
+        stamp = json.loads((ddir / BUNDLE_STAMP).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    return stamp.get('digest') == digest and all((ddir / f).exists() for f in BUNDLE_FILES)
+
+
+def _render_bundle(job: tuple[str, dict, str, list[str], str]) -> str:
+    run_id, row, status, reasons, digest = job
+    write_diagnostics_bundle(run_id, row, status, reasons)
+    # the stamp goes last: a bundle interrupted mid-render stays stale and is redone next time
+    stamp = Path('outputs/diagnostics') / run_id / BUNDLE_STAMP
+    stamp.write_text(json.dumps({'digest': digest, 'status': status, 'files': list(BUNDLE_FILES)}) + "\n",
+                     encoding='utf-8')
+    return run_id
+
+
+def render_bundles(trail: pd.DataFrame, *, jobs: int = 1, force: bool = False) -> tuple[int, int]:
+    """Render the diagnostics bundles of the non-accepted runs in an audit trail.
+
+    Rendering is a separate stage from classification: a bundle is only redrawn when it is missing,
+    incomplete, or was rendered from different inputs (status, rules or summary values), and the
+    redraws run on `jobs` worker processes. The trail carries every field the bundle shows.
+    Returns (rendered, up_to_date).
+    """
+    todo = []
+    current = 0
+    for row in trail[trail['status'] != 'accepted'].to_dict('records'):
+        run_id = str(row.get('run_id'))
+        rules = row.get('triggered_rules')
+        reasons = [r for r in rules.split('; ') if r] if isinstance(rules, str) else []
+        digest = _bundle_digest(run_id, row, row['status'], reasons)
+        if not force and _bundle_current(run_id, digest):
+            current += 1
+            continue
+        todo.append((run_id, row, row['status'], reasons, digest))
+
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as ex:
+            for _ in ex.map(_render_bundle, todo, chunksize=max(1, len(todo) // (4 * jobs))):
+                pass
+    else:
+        for job in todo:
+            _render_bundle(job)
+    return len(todo), current
+
+
+def _audit_tables(df: pd.DataFrame, status: np.ndarray, reasons: list[list[str]]):
+    """(audit_index, audit_trail, df with the audit columns) for a classified run table."""
+    n = len(df)
+    df = df.reset_index(drop=True)
+
+    def col(k):  # row.get(k): None where the column is missing
+        return df[k] if k in df.columns else pd.Series([None] * n, dtype=object)
+
+    run_ids = col('run_id').astype(str)
+    rules = pd.Series(['; '.join(r) if r else '' for r in reasons], dtype=object)
+    diag_dirs = 'outputs/diagnostics/' + run_ids + '/'
+    audit = pd.DataFrame({
+        'audit_id': [f"AUDIT-{i:04d}" for i in range(1, n + 1)],
+        'run_id': run_ids,
+        'EOS': col('EOS'),
+        'case': col('case'),
+        'variant': col('variant'),
+        'triggered_rules': rules,
+        'diagnostics_dir': diag_dirs,
+        'max_epsratio': col('max_epsratio'),
+        'wfaktor_max': col('wfaktor_max'),
+        'status': status,
+        'timestamp': datetime.now().astimezone().isoformat(timespec='seconds'),
+    })
+    # expanded trail includes key numerics for filtering/sorting in review
+    trail = audit.copy()
+    for k in TRAIL_FIELDS:
+        if k in df.columns:
+            trail[k] = df[k]
+    out = df.copy()
+    out['audit_id'] = audit['audit_id']
+    out['status'] = status
+    out['triggered_rules'] = rules
+    out['diagnostics_dir'] = diag_dirs
+    return audit, trail, out
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--runs', default='outputs/runs_summary.csv', help='Path to runs summary CSV')
+    ap.add_argument('--bundles', choices=['render', 'skip', 'only'], default='render',
+                    help="'render' (default): classify, then render the missing/stale diagnostics bundles; "
+                         "'skip': classify only; 'only': render the bundles of the last classification "
+                         "(outputs/audit_trail.csv) without re-classifying")
+    ap.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                    help='Worker processes for bundle rendering (default: all cores)')
+    ap.add_argument('--force-bundles', action='store_true', help='Re-render every bundle, current or not')
     args = ap.parse_args()
 
+    out_dir = Path('outputs')
+    if args.bundles == 'only':
+        try:
+            trail = run_store.read_table(out_dir / 'audit_trail.csv')
+        except FileNotFoundError:
+            raise SystemExit('ERROR: outputs/audit_trail.csv not found. Run scripts/validate_run.py first.')
+        rendered, current = render_bundles(trail, jobs=args.jobs, force=args.force_bundles)
+        print(f"Diagnostics bundles: rendered={rendered} up_to_date={current}")
+        return 0
+
     cfg = load_cfg()
     in_path = Path(args.runs)
-    if not in_path.exists():
+    try:
+        df = run_store.read_table(in_path)
+    except FileNotFoundError:
         raise SystemExit(f'ERROR: {in_path} not found. Run scripts/build_runs_summary.py first.')
 
-    df = pd.read_csv(in_path)
-
-    audit_rows = []
-    trail_rows = []
-    accepted, stress, diagnostic, excluded = [], [], [], []
-
-    def make_audit_id(i: int) -> str:
-        return f"AUDIT-{i:04d}"
-
-    i = 1
-    for _, r in df.iterrows():
-        row = r.to_dict()
-        run_id = str(row.get('run_id'))
-        audit_id = make_audit_id(i)
-        i += 1
-
-        status, reasons = classify_row(row, cfg)
-
-        if status != 'accepted':
-            write_diagnostics_bundle(run_id, row, status, reasons)
-
-        diag_dir = f"outputs/diagnostics/{run_id}/"
-        audit = {
-            'audit_id': audit_id,
-            'run_id': run_id,
-            'EOS': row.get('EOS'),
-            'case': row.get('case'),
-            'variant': row.get('variant'),
-            'triggered_rules': '; '.join(reasons) if reasons else '',
-            'diagnostics_dir': diag_dir,
-            'max_epsratio': row.get('max_epsratio'),
-            'wfaktor_max': row.get('wfaktor_max'),
-            'status': status,
-            'timestamp': datetime.now().astimezone().isoformat(timespec='seconds'),
-        }
-        audit_rows.append(audit)
-
-        # expanded trail includes key numerics for filtering/sorting in review
-        trail = dict(audit)
-        for k in ['sigma','chi','include_in_gravity','Mmax','R_1.4','Lambda_1.4','Delta_Lambda14_pct','delta_total_Lambda14_pct',
-                  'delta_disc_Lambda14_pct','obs_status','baseline_max_step','refined_max_step','baseline_rtol','refined_rtol','baseline_atol','refined_atol']:
-            if k in row:
-                trail[k]=row.get(k)
-        trail_rows.append(trail)
-
-        out_row = dict(row)
-        out_row['audit_id'] = audit_id
-        out_row['status'] = status
-        out_row['triggered_rules'] = '; '.join(reasons) if reasons else ''
-        out_row['diagnostics_dir'] = diag_dir
-
-        if status == 'accepted':
-            accepted.append(out_row)
-        elif status == 'stress':
-            stress.append(out_row)
-        elif status == 'diagnostic':
-            diagnostic.append(out_row)
-        else:
-            excluded.append(out_row)
+    status, reasons = classify_table(df, cfg)
+    audit, trail, out = _audit_tables(df, status, reasons)
 
-    out_dir = Path('outputs')
     out_dir.mkdir(parents=True, exist_ok=True)
 
     def dump_csv(path: Path, rows: list[dict]):
@@ -298,15 +496,21 @@ def main():
             w.writeheader()
             w.writerows(rows)
 
-    dump_csv(out_dir / 'accepted.csv', accepted)
-    dump_csv(out_dir / 'stress.csv', stress)
-    dump_csv(out_dir / 'diagnostic.csv', diagnostic)
-    dump_csv(out_dir / 'excluded.csv', excluded)
+    counts = {}
+    for name in ('accepted', 'stress', 'diagnostic', 'excluded'):
+        rows = out[status == name].to_dict('records')
+        counts[name] = len(rows)
+        dump_csv(out_dir / f'{name}.csv', rows)
+
+    run_store.write_table(out_dir / 'audit_index.csv', audit, replace=True)
+    run_store.write_table(out_dir / 'audit_trail.csv', trail, replace=True)
 
-    pd.DataFrame(audit_rows).to_csv(out_dir / 'audit_index.csv', index=False)
-    pd.DataFrame(trail_rows).to_csv(out_dir / 'audit_trail.csv', index=False)
+    print(f"Validation complete: accepted={counts['accepted']} stress={counts['stress']} "
+          f"diagnostic={counts['diagnostic']} excluded={counts['excluded']}")
 
-    print(f"Validation complete: accepted={len(accepted)} stress={len(stress)} diagnostic={len(diagnostic)} excluded={len(excluded)}")
+    if args.bundles == 'render':
+        rendered, current = render_bundles(trail, jobs=args.jobs, force=args.force_bundles)
+        print(f"Diagnostics bundles: rendered={rendered} up_to_date={current}")
     return 0
 
 
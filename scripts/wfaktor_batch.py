@@ -4,15 +4,27 @@
 I scan `outputs/diagnostics/**/` for `baseline_profile.csv` and `inserted_profile.csv`
 and compute WFaktor_max for a chosen internal variable column.
 
+With --store I read a streamed profile store (profile_store.py) instead: every inserted star
+(sigma*chi*S != 0) is paired with the baseline star (delta = 0) of the same EOS, rho_c,
+engine and formulation, and both profiles are memory-mapped rather than parsed. The two
+stars take different steps, so I interpolate the inserted profile onto the baseline radii
+(inside the smaller of the two radii).
+
 This script is designed to be safe: if a case lacks the needed files, I skip it and
 record the reason in the output table.
 """
 import argparse
+import os
+import sys
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
 def compute_wfaktor(base: pd.DataFrame, ins: pd.DataFrame, var: str, rcol: str, eps: float):
     if var not in base.columns or var not in ins.columns:
         raise KeyError(f"missing column {var}")
@@ -28,16 +40,7 @@ def compute_wfaktor(base: pd.DataFrame, ins: pd.DataFrame, var: str, rcol: str,
     i = int(np.argmax(wf))
     return float(np.max(wf)), float(r[i])
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--root", default="outputs/diagnostics", help="diagnostics root")
-    ap.add_argument("--internal-var", default="X_var", help="internal variable column name")
-    ap.add_argument("--radius-col", default="r", help="radius column name")
-    ap.add_argument("--eps-floor", type=float, default=1e-16)
-    ap.add_argument("--out", default="outputs/wfaktor_summary.csv")
-    args = ap.parse_args()
-
-    root = Path(args.root)
+def diagnostics_rows(root: Path, var: str, rcol: str, eps: float):
     rows = []
     for case in sorted(root.glob("*")):
         if not case.is_dir():
@@ -50,10 +53,56 @@ def main():
         try:
             base = pd.read_csv(base_csv)
             ins  = pd.read_csv(ins_csv)
-            wfmax, rmax = compute_wfaktor(base, ins, args.internal_var, args.radius_col, args.eps_floor)
+            wfmax, rmax = compute_wfaktor(base, ins, var, rcol, eps)
             rows.append({"case": case.name, "WFaktor_max": wfmax, "r_max": rmax, "status": "ok"})
         except Exception as e:
             rows.append({"case": case.name, "WFaktor_max": "", "r_max": "", "status": f"error: {e}"})
+    return rows
+
+def store_rows(path, var: str, eps: float):
+    from profile_store import ProfileStore
+    store = ProfileStore(path, "r")
+    stars = store.stars()
+    if stars.empty:
+        return []
+    if var not in store.profile(stars["star"].iloc[0]).dtype.names:
+        raise SystemExit(f"{var!r} is not a profile field of {path}")
+    delta = stars["sigma_vac"] * stars["chi_vac"] * stars["screening_factor"]
+    key = ["eos", "rho_c", "engine", "formulation"]
+    base = {tuple(r[k] for k in key): r["star"] for _, r in stars[delta == 0].iterrows()}
+    rows = []
+    for _, r in stars[delta != 0].iterrows():
+        b = base.get(tuple(r[k] for k in key))
+        if b is None:
+            rows.append({"case": r["star"], "WFaktor_max": "", "r_max": "", "status": "skipped (no baseline star)"})
+            continue
+        try:
+            pb, ps = store.profile(b), store.profile(r["star"])
+            inside = pb["r"] <= ps["r"][-1]
+            rb = pb["r"][inside]
+            ins = np.interp(rb, ps["r"], ps[var])
+            wfmax, rmax = compute_wfaktor(pd.DataFrame({var: pb[var][inside], "r": rb}),
+                                          pd.DataFrame({var: ins}), var, "r", eps)
+            rows.append({"case": r["star"], "WFaktor_max": wfmax, "r_max": rmax, "status": "ok"})
+        except Exception as e:
+            rows.append({"case": r["star"], "WFaktor_max": "", "r_max": "", "status": f"error: {e}"})
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default="outputs/diagnostics", help="diagnostics root")
+    ap.add_argument("--store", help="streamed profile store to read instead of --root")
+    ap.add_argument("--internal-var", default=None,
+                    help="internal variable column name (default X_var; P_geom with --store)")
+    ap.add_argument("--radius-col", default="r", help="radius column name")
+    ap.add_argument("--eps-floor", type=float, default=1e-16)
+    ap.add_argument("--out", default="outputs/wfaktor_summary.csv")
+    args = ap.parse_args()
+
+    if args.store:
+        rows = store_rows(args.store, args.internal_var or "P_geom", args.eps_floor)
+    else:
+        rows = diagnostics_rows(Path(args.root), args.internal_var or "X_var", args.radius_col, args.eps_floor)
 
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
@@ -6,13 +6,27 @@ Units:
 - TOV equations integrated in geometrized G=c=1 with length in cm.
 """
 from __future__ import annotations
+import bisect
+import contextvars
+import hashlib
+import json
+import math
 import numpy as np
 import os
+import sqlite3
+import time
 FAST_CI = os.getenv('SFST_QFIS_FAST', '0') == '1'
+DEFAULT_ENGINE = os.getenv('SFST_ENGINE', 'scalar')  # 'scalar' | 'batched' (see solve_ladder)
+DEFAULT_MODE = os.getenv('SFST_MODE', 'scan')  # 'scan' | 'root' (see headline_observables)
+DEFAULT_CACHE = os.getenv('SFST_CACHE', '')  # directory of the persistent star cache; '' disables (see StarCache)
+DEFAULT_JOBS = int(os.getenv('SFST_JOBS', '1'))  # worker processes for star ladders (see _solve_case_points)
+DEFAULT_PROFILE_STORE = os.getenv('SFST_PROFILE_STORE', '')  # directory of the streamed profile store; '' disables (see profile_sink)
 
 import pandas as pd
-from dataclasses import dataclass
-from scipy.integrate import solve_ivp
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from scipy.integrate import solve_ivp, RK45
+from scipy.interpolate import PchipInterpolator
 
 # Constants
 G_cgs = 6.67430e-8
@@ -24,17 +38,146 @@ P_to_geom = G_cgs / c_cgs**4  # dyne/cm^2 -> geom
 rho1 = 10**14.7
 rho2 = 10**15.0
 
+@dataclass(frozen=True)
+class EOSTable:
+    """Monotone log-log cubic Hermite (PCHIP) tables of rho, eps, deps/dP versus P.
+
+    Stored in geometrized units (P, eps, rho*c^2 in cm^-2; deps/dP is dimensionless).
+    Each interval keeps its own one-sided end values so that EOS segment boundaries
+    (kinks in deps/dP) are represented exactly. Lookup is a single np.searchsorted and a cubic
+    in precomputed per-interval coefficients: 40 SLy pressures take ~37 us, against ~93 us through
+    the analytic closure, which makes a 40-star batched ladder ~18% faster. The scalar TOV RHS keeps
+    the closure (see tov_rhs).
+    """
+    x_lo: np.ndarray   # ln P at the left end of each interval, shape (K,)
+    x_hi: np.ndarray   # ln P at the right end, shape (K,)
+    q_lo: np.ndarray   # ln(rho, eps, deps/dP) at the left ends, shape (3, K)
+    q_hi: np.ndarray
+    d_lo: np.ndarray   # d ln q / d ln P at the left ends, shape (3, K)
+    d_hi: np.ndarray
+
+    def eval_geom(self, P_geom):
+        """Vectorized (rho*c^2, eps, deps/dP) in geometrized units; P<=0 maps to rho=eps=0."""
+        if np.ndim(P_geom) == 0:
+            return self._eval_scalar(float(P_geom))
+        P = np.asarray(P_geom, dtype=float)
+        pos = P > 0
+        x = np.log(P if pos.all() else np.where(pos, P, 1.0))
+        k = np.searchsorted(self._x_start, x, side="right") - 1
+        u = x - self._x_origin[k]
+        c = self._poly[:, :, k]  # (4, 3, N): cubic in u per quantity, Horner below
+        vals = np.exp(((c[3] * u + c[2]) * u + c[1]) * u + c[0])
+        rho, eps, deps = vals[0], vals[1], vals[2]
+        if not pos.all():
+            rho = np.where(pos, rho, 0.0)
+            eps = np.where(pos, eps, 0.0)
+            deps = np.where(pos, deps, np.nan)
+        return rho, eps, deps
+
+    def _eval_scalar(self, P: float):
+        # Pure-Python path for scalar callers (avoids NumPy dispatch overhead). The scalar TOV RHS
+        # does not come here: the analytic closure is cheaper than any lookup (see tov_rhs).
+        if P <= 0:
+            return 0.0, 0.0, math.nan
+        x = math.log(P)
+        k = bisect.bisect_right(self._x_start_list, x) - 1
+        u = x - self._x_origin_list[k]
+        c0, c1, c2, c3 = self._poly_list[k]
+        return (math.exp(((c3[0] * u + c2[0]) * u + c1[0]) * u + c0[0]),
+                math.exp(((c3[1] * u + c2[1]) * u + c1[1]) * u + c0[1]),
+                math.exp(((c3[2] * u + c2[2]) * u + c1[2]) * u + c0[2]))
+
+    def __post_init__(self):
+        # Each Hermite interval as a cubic in u = x - x_lo, plus one linear (power-law) extrapolation
+        # interval on either side: x_start[0] = -inf and the last interval starts at x_hi[-1].
+        h = self.x_hi - self.x_lo
+        dq = self.q_hi - self.q_lo
+        c2 = 3.0 * dq / h**2 - (2.0 * self.d_lo + self.d_hi) / h
+        c3 = -2.0 * dq / h**3 + (self.d_lo + self.d_hi) / h**2
+        zero = np.zeros((3, 1))
+        poly = np.stack([
+            np.hstack([self.q_lo[:, :1], self.q_lo, self.q_hi[:, -1:]]),
+            np.hstack([self.d_lo[:, :1], self.d_lo, self.d_hi[:, -1:]]),
+            np.hstack([zero, c2, zero]),
+            np.hstack([zero, c3, zero]),
+        ])  # (4, 3, K + 2)
+        x_start = np.concatenate([[-np.inf], self.x_lo, self.x_hi[-1:]])
+        x_origin = np.concatenate([self.x_lo[:1], self.x_lo, self.x_hi[-1:]])
+        object.__setattr__(self, "_poly", poly)
+        object.__setattr__(self, "_x_start", x_start)
+        object.__setattr__(self, "_x_origin", x_origin)
+        object.__setattr__(self, "_x_start_list", x_start.tolist())
+        object.__setattr__(self, "_x_origin_list", x_origin.tolist())
+        object.__setattr__(self, "_poly_list", [tuple(poly[j, :, i].tolist() for j in range(4))
+                                                for i in range(poly.shape[2])])
+
+
 @dataclass(frozen=True)
 class EOS:
     name: str
     params: dict
     P_of_rho: callable
     rho_eps_depsdP_of_P: callable
+    P_breaks_cgs: tuple = ()  # segment boundaries in P (piecewise EOS); used by tabulate_eos
+    table: EOSTable | None = field(default=None, compare=False, repr=False)
+    spec: tuple | None = field(default=None, compare=False, repr=False)  # (factory, args, name, tabulate args)
 
+    def __reduce__(self):
+        # The closures do not pickle. An EOS built by one of the factories below travels to worker
+        # processes as its factory call and is rebuilt there (eos_from_spec).
+        if self.spec is None:
+            raise TypeError(f"EOS {self.name!r} was not built by a factory and cannot be pickled")
+        return (eos_from_spec, (self.spec,))
 
-def make_polytrope_eos(K: float, Gamma: float, name: str) -> EOS:
+    def eval_geom(self, P_geom):
+        """(rho*c^2, eps, deps/dP) in geometrized units for scalar or array P_geom.
+
+        Uses the precomputed table when present, otherwise the analytic closure per element.
+        """
+        if self.table is not None:
+            return self.table.eval_geom(P_geom)
+        P = np.asarray(P_geom, dtype=float)
+        out = np.array([self.rho_eps_depsdP_of_P(float(p)) if p > 0 else (0.0, 0.0, np.nan)
+                        for p in (P / P_to_geom).ravel()], dtype=float).reshape(P.shape + (3,))
+        return out[..., 0] * c_cgs**2 * P_to_geom, out[..., 1] * P_to_geom, out[..., 2]
+
+
+def tabulate_eos(eos: EOS, *, log10P_min: float = 20.0, log10P_max: float = 38.0, n_per_decade: int = 96) -> EOS:
+    """Return a copy of `eos` carrying a precomputed EOSTable (built once, geometrized units).
+
+    Knots are log-spaced in P (cgs range [10^log10P_min, 10^log10P_max]) with the EOS segment
+    boundaries inserted as knots; a separate PCHIP is built on every segment.
+    """
+    edges = ([10**log10P_min] + sorted(p for p in eos.P_breaks_cgs if 10**log10P_min < p < 10**log10P_max)
+             + [10**log10P_max])
+    x_lo, x_hi, q_lo, q_hi, d_lo, d_hi = [], [], [], [], [], []
+    for a, b in zip(edges[:-1], edges[1:]):
+        n = max(int(np.ceil(np.log10(b / a) * n_per_decade)), 4) + 1
+        P_cgs = np.logspace(np.log10(a), np.log10(b), n)
+        P_cgs[0], P_cgs[-1] = a, b
+        # One-sided evaluation at the segment ends so breakpoints take this segment's branch.
+        P_eval = P_cgs.copy()
+        P_eval[-1] = np.nextafter(b, 0.0)
+        vals = np.array([eos.rho_eps_depsdP_of_P(float(P)) for P in P_eval], dtype=float)
+        x = np.log(P_cgs * P_to_geom)
+        q = np.log(np.vstack([vals[:, 0] * c_cgs**2 * P_to_geom, vals[:, 1] * P_to_geom, vals[:, 2]]))
+        d = np.vstack([PchipInterpolator(x, qi).derivative()(x) for qi in q])
+        x_lo.append(x[:-1]); x_hi.append(x[1:])
+        q_lo.append(q[:, :-1]); q_hi.append(q[:, 1:])
+        d_lo.append(d[:, :-1]); d_hi.append(d[:, 1:])
+    table = EOSTable(
+        x_lo=np.concatenate(x_lo), x_hi=np.concatenate(x_hi),
+        q_lo=np.hstack(q_lo), q_hi=np.hstack(q_hi),
+        d_lo=np.hstack(d_lo), d_hi=np.hstack(d_hi),
+    )
+    spec = eos.spec[:3] + ((log10P_min, log10P_max, n_per_decade),) if eos.spec is not None else None
+    return replace(eos, table=table, spec=spec)
+
+
+def make_polytrope_eos(K: float, Gamma: float, name: str, *, tabulate: bool = False) -> EOS:
     """Simple single-polytrope EOS (toy / diagnostic).
     P = K * rho^Gamma (cgs). Energy density eps ≈ rho*c^2 + P/(Gamma-1).
+    tabulate=True attaches a vectorized EOSTable (see tabulate_eos).
     """
     c2 = c_cgs**2
     def P_of_rho(rho_cgs: float):
@@ -55,9 +198,11 @@ def make_polytrope_eos(K: float, Gamma: float, name: str) -> EOS:
             depsdP = drhodP*c2 + 1.0/(Gamma-1.0)
         return float(rho), float(eps), float(depsdP)
 
-    return EOS(name=name, params={"K":K,"Gamma":Gamma}, P_of_rho=P_of_rho, rho_eps_depsdP_of_P=rho_eps_depsdP_of_P)
+    eos = EOS(name=name, params={"K":K,"Gamma":Gamma}, P_of_rho=P_of_rho, rho_eps_depsdP_of_P=rho_eps_depsdP_of_P,
+              spec=("make_polytrope_eos", (K, Gamma), name, None))
+    return tabulate_eos(eos) if tabulate else eos
 
-def make_piecewise_eos(log10p1: float, g1: float, g2: float, g3: float, name: str) -> EOS:
+def make_piecewise_eos(log10p1: float, g1: float, g2: float, g3: float, name: str, *, tabulate: bool = False) -> EOS:
     p1 = 10**log10p1
     K1 = p1 / (rho1**g1)
     K2 = K1 * rho1**(g1-g2)
@@ -101,10 +246,12 @@ def make_piecewise_eos(log10p1: float, g1: float, g2: float, g3: float, name: st
         deps_dP = (1+a)*c_cgs**2*drho_dP + 1/(Gm-1)
         return rho, eps, deps_dP
 
-    return EOS(name=name, params={"log10p1": log10p1, "Gamma1": g1, "Gamma2": g2, "Gamma3": g3},
-               P_of_rho=P_of_rho, rho_eps_depsdP_of_P=rho_eps_depsdP_of_P)
+    eos = EOS(name=name, params={"log10p1": log10p1, "Gamma1": g1, "Gamma2": g2, "Gamma3": g3},
+              P_of_rho=P_of_rho, rho_eps_depsdP_of_P=rho_eps_depsdP_of_P, P_breaks_cgs=(P1, P2),
+              spec=("make_piecewise_eos", (log10p1, g1, g2, g3), name, None))
+    return tabulate_eos(eos) if tabulate else eos
 
-def make_simple_polytrope(Gamma=2.0, rho_ref=1e14, P_ref=1e34, name="Poly2") -> EOS:
+def make_simple_polytrope(Gamma=2.0, rho_ref=1e14, P_ref=1e34, name="Poly2", *, tabulate: bool = False) -> EOS:
     K = P_ref/(rho_ref**Gamma)
     alpha=0.0
     def P_of_rho(rho):
@@ -117,12 +264,56 @@ def make_simple_polytrope(Gamma=2.0, rho_ref=1e14, P_ref=1e34, name="Poly2") ->
         drho_dP = rho/(Gamma*P)
         deps_dP = (1+alpha)*c_cgs**2*drho_dP + 1/(Gamma-1)
         return rho, eps, deps_dP
-    return EOS(name=name, params={"Gamma": Gamma, "K": K}, P_of_rho=P_of_rho, rho_eps_depsdP_of_P=rho_eps_depsdP_of_P)
+    eos = EOS(name=name, params={"Gamma": Gamma, "K": K}, P_of_rho=P_of_rho, rho_eps_depsdP_of_P=rho_eps_depsdP_of_P,
+              spec=("make_simple_polytrope", (Gamma, rho_ref, P_ref), name, None))
+    return tabulate_eos(eos) if tabulate else eos
+
+_EOS_FACTORIES = {"make_polytrope_eos": make_polytrope_eos, "make_piecewise_eos": make_piecewise_eos,
+                  "make_simple_polytrope": make_simple_polytrope}
+_EOS_BY_SPEC: dict = {}
+
+# Canonical EOS set: realistic piecewise-polytrope parameterizations (Read et al. 2009; see ppeos_tables
+# reference in Appendix A) plus a toy EOS for diagnostics / coverage.
+CANONICAL_EOS = {
+    "SLy-PP(Read2009)": ("make_piecewise_eos", (34.384, 3.005, 2.988, 2.851)),
+    "AP4-PP(Read2009)": ("make_piecewise_eos", (34.269, 2.830, 3.445, 3.348)),
+    "H4-PP(Read2009)": ("make_piecewise_eos", (34.669, 2.909, 2.246, 2.144)),
+    "MPA1-PP(Read2009)": ("make_piecewise_eos", (34.495, 2.921, 3.132, 2.995)),
+    "WFF1-PP(Read2009)": ("make_piecewise_eos", (34.031, 2.628, 2.885, 2.951)),
+    "Poly2(toy)": ("make_polytrope_eos", (3.0e5, 2.0)),
+}
+
+def canonical_eos_name(name: str) -> str:
+    """Resolve a short alias ("SLy", "AP4", "Poly2", ...) to its CANONICAL_EOS key."""
+    key = name if name in CANONICAL_EOS else next(
+        (k for k in CANONICAL_EOS if name in (k.split("-PP")[0], k.split("(")[0])), None)
+    if key is None:
+        raise KeyError(f"unknown EOS {name!r} (canonical: {', '.join(CANONICAL_EOS)})")
+    return key
+
+def canonical_eos(name: str, *, tabulate: bool = False) -> EOS:
+    """The canonical EOS `name`; short aliases ("SLy", "AP4", "Poly2", ...) are accepted."""
+    key = canonical_eos_name(name)
+    factory, args = CANONICAL_EOS[key]
+    return eos_from_spec((factory, args, key, (20.0, 38.0, 96) if tabulate else None))
+
+def eos_from_spec(spec: tuple) -> EOS:
+    """Rebuild (once per process) the EOS described by `EOS.spec`; used to unpickle EOS objects."""
+    eos = _EOS_BY_SPEC.get(spec)
+    if eos is None:
+        factory, args, name, tab = spec
+        eos = _EOS_FACTORIES[factory](*args, name=name)
+        if tab is not None:
+            eos = tabulate_eos(eos, log10P_min=tab[0], log10P_max=tab[1], n_per_decade=tab[2])
+        _EOS_BY_SPEC[spec] = eos
+    return eos
 
 def tov_rhs(r, y, eos: EOS, *, sigma_vac: float, chi_vac: float, screening_factor: float, include_in_gravity: bool):
     m, P, yt = y
     if P <= 0.0 or r <= 0.0:
         return [0.0, 0.0, 0.0]
+    # Always the analytic closure, even with a table attached: one call of it (~1.4 us for SLy)
+    # is cheaper than a per-call table lookup in Python (~1.6 us); the table serves array code.
     P_cgs = P / P_to_geom
     _, eps_cgs, deps_dP_cgs = eos.rho_eps_depsdP_of_P(P_cgs)
 
@@ -169,7 +360,410 @@ def tov_rhs(r, y, eos: EOS, *, sigma_vac: float, chi_vac: float, screening_facto
     dyt = -(yt**2)/r - (yt*F)/r - r*Q
     return [dm, dP, dyt]
 
-def integrate_star(eos: EOS, rho_c_cgs: float, *, sigma_vac: float, chi_vac: float, screening_factor: float, include_in_gravity: bool, r0=1e-3, rmax=3e6, max_step=5e4, rtol=3e-6, atol=1e-9, store_profile: bool=False):
+# --- Persistent star cache ---
+# Star records are keyed by a canonical hash of everything that determines them: the EOS
+# (factory parameters, segment boundaries and, when tabulated, the table itself), rho_c,
+# delta = sigma*chi*S, include_in_gravity and the solver settings. I bump _SOLVER_VERSION whenever
+# a change alters the records, so stale entries are never served.
+_SOLVER_VERSION = 2
+_CACHE_MISS = object()
+
+
+def _eos_fingerprint(eos: EOS) -> str:
+    """Stable hash of the EOS physics (computed once per EOS instance; the name is not part of it)."""
+    fp = eos.__dict__.get("_fingerprint")
+    if fp is None:
+        h = hashlib.sha256(json.dumps({"params": {k: float(v) for k, v in sorted(eos.params.items())},
+                                       "P_breaks": [float(p) for p in eos.P_breaks_cgs]},
+                                      sort_keys=True).encode())
+        if eos.table is not None:
+            for a in (eos.table.x_lo, eos.table.x_hi, eos.table.q_lo, eos.table.q_hi, eos.table.d_lo, eos.table.d_hi):
+                h.update(np.ascontiguousarray(a, dtype=float).tobytes())
+        fp = h.hexdigest()
+        object.__setattr__(eos, "_fingerprint", fp)
+    return fp
+
+
+def star_cache_key(eos: EOS, rho_c_cgs: float, *, delta: float, include_in_gravity: bool, **solver) -> str:
+    """Canonical key of one star: EOS fingerprint, rho_c, delta, include_in_gravity and solver settings
+    (engine, formulation, tolerances, ...; pass only the settings that affect the result)."""
+    import scipy
+    payload = {"eos": _eos_fingerprint(eos), "rho_c": float(rho_c_cgs).hex(), "delta": float(delta).hex(),
+               "inc_g": bool(include_in_gravity), "version": _SOLVER_VERSION, "scipy": scipy.__version__,
+               "solver": {k: (float(v).hex() if isinstance(v, float) else v) for k, v in sorted(solver.items())}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class StarCache:
+    """SQLite store of star records (JSON) with size-bounded LRU eviction.
+
+    One file `stars.sqlite` in `directory`; safe to share between processes (WAL mode). Once the
+    stored records exceed max_mb, the least recently used ones are evicted down to 90% of it.
+    Failed integrations are cached too (as None).
+    """
+    _EVICT_EVERY = 64
+
+    def __init__(self, directory: str, *, max_mb: float = 256.0):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "stars.sqlite")
+        self.max_bytes = int(max_mb * 2**20)
+        self._db = sqlite3.connect(self.path, timeout=60.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS stars (key TEXT PRIMARY KEY, record TEXT NOT NULL, "
+                         "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS stars_lru ON stars (last_used)")
+        self._db.commit()
+        self._puts = 0
+        self.hits = self.misses = 0
+
+    def get(self, key: str):
+        """The cached record (possibly None for a cached failure), or _CACHE_MISS."""
+        row = self._db.execute("SELECT record FROM stars WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return _CACHE_MISS
+        self.hits += 1
+        with self._db:
+            self._db.execute("UPDATE stars SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, record) -> None:
+        if record is not None and record.get("profile") is not None:
+            return  # records with profiles are never cached
+        blob = json.dumps(record)
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO stars VALUES (?, ?, ?, ?)", (key, blob, len(blob), time.time()))
+        self._puts += 1
+        if self._puts % self._EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used records until the store is below 90% of max_mb."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM stars").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(0.9 * self.max_bytes)
+        with self._db:
+            cutoff = self._db.execute(
+                "SELECT last_used FROM (SELECT last_used, SUM(size) OVER (ORDER BY last_used) AS run FROM stars) "
+                "WHERE run >= ? ORDER BY last_used LIMIT 1", (excess,)).fetchone()
+            if cutoff is not None:
+                self._db.execute("DELETE FROM stars WHERE last_used <= ?", (cutoff[0],))
+
+    def clear(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM stars")
+
+
+_STAR_CACHES: dict = {}
+
+
+def star_cache(directory: str | None = None) -> StarCache | None:
+    """The process-wide StarCache for `directory` (default $SFST_CACHE); None when caching is off.
+
+    The size bound is $SFST_CACHE_MAX_MB (default 256).
+    """
+    directory = DEFAULT_CACHE if directory is None else directory
+    if not directory or directory.lower() in ("0", "off", "none"):
+        return None
+    # Keyed by pid as well: an SQLite connection must not be shared with forked pool workers.
+    key = (os.getpid(), os.path.abspath(directory))
+    if key not in _STAR_CACHES:
+        _STAR_CACHES[key] = StarCache(key[1], max_mb=float(os.getenv("SFST_CACHE_MAX_MB", "256")))
+    return _STAR_CACHES[key]
+
+
+# --- Cooperative budgets (wall time / RHS evaluations) ---
+# The integration loops charge every RHS evaluation to the active budget and check it, so a
+# pathological star (e.g. one creeping towards rmax with tiny steps) or a whole scan stops cleanly
+# instead of stalling its caller.
+
+def _env_limit(name: str, cast):
+    v = os.getenv(name, "")
+    return cast(v) if v else None
+
+
+class BudgetExceeded(RuntimeError):
+    """An integration ran out of its budget.
+
+    scope is "star" (one integration) or "scan" (everything inside a `budget` block); resource is
+    "wall_s" or "rhs_evals". Star overruns are absorbed by integrate_star / solve_ladder (the star
+    becomes None, is not cached and is counted in BudgetReport.stars_exceeded); scan overruns
+    propagate to whoever opened the `budget` block.
+    """
+
+    def __init__(self, scope: str, resource: str, limit: float, used: float):
+        super().__init__(scope, resource, limit, used)
+        self.scope, self.resource, self.limit, self.used = scope, resource, limit, used
+
+    def __str__(self) -> str:
+        return f"{self.scope} budget exceeded: {self.resource} {self.used:.6g} > {self.limit:.6g}"
+
+    def as_dict(self) -> dict:
+        return {"status": "budget_exceeded", "scope": self.scope, "resource": self.resource,
+                "limit": self.limit, "used": self.used}
+
+
+def budget_reason(record: dict | None) -> str:
+    """Audit-table reason for a BudgetExceeded.as_dict() record (a summary's "budget"); "" for none."""
+    if not record:
+        return ""
+    return (f"budget_exceeded:{record.get('scope', '?')}_{record.get('resource', '?')}"
+            f" used={record.get('used')} limit={record.get('limit')}")
+
+
+@dataclass
+class BudgetReport:
+    """Limits and usage of one `budget` block (None = unlimited)."""
+    scan_wall_s: float | None = None
+    scan_rhs_evals: int | None = None
+    star_wall_s: float | None = None
+    star_rhs_evals: int | None = None
+    parent: "BudgetReport | None" = None
+    t0: float = field(default_factory=time.monotonic)
+    rhs_evals: int = 0
+    stars_exceeded: int = 0
+    star_resources: set = field(default_factory=set)  # resources ("wall_s", "rhs_evals") those stars ran out of
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.t0
+
+    def charge(self, n: int) -> None:
+        """Count n RHS evaluations here and in the enclosing blocks; raise when a scan limit is crossed."""
+        self.rhs_evals += n
+        if self.scan_rhs_evals is not None and self.rhs_evals > self.scan_rhs_evals:
+            raise BudgetExceeded("scan", "rhs_evals", self.scan_rhs_evals, self.rhs_evals)
+        if self.scan_wall_s is not None and self.elapsed() > self.scan_wall_s:
+            raise BudgetExceeded("scan", "wall_s", self.scan_wall_s, self.elapsed())
+        if self.parent is not None:
+            self.parent.charge(n)
+
+    def note_star_exceeded(self, k: int = 1, resources=()) -> None:
+        self.stars_exceeded += k
+        self.star_resources.update(resources)
+        if self.parent is not None:
+            self.parent.note_star_exceeded(k, resources)
+
+    def remaining(self) -> dict:
+        """`budget` keyword arguments that leave a child (e.g. a worker process) what is left here."""
+        return {"scan_wall_s": None if self.scan_wall_s is None else max(self.scan_wall_s - self.elapsed(), 0.0),
+                "scan_rhs_evals": None if self.scan_rhs_evals is None else max(self.scan_rhs_evals - self.rhs_evals, 0),
+                "star_wall_s": self.star_wall_s, "star_rhs_evals": self.star_rhs_evals}
+
+    def as_dict(self) -> dict:
+        return {"scan_wall_s": self.scan_wall_s, "scan_rhs_evals": self.scan_rhs_evals,
+                "star_wall_s": self.star_wall_s, "star_rhs_evals": self.star_rhs_evals,
+                "wall_s": self.elapsed(), "rhs_evals": self.rhs_evals, "stars_exceeded": self.stars_exceeded,
+                "star_resources": sorted(self.star_resources)}
+
+
+_BUDGET: contextvars.ContextVar = contextvars.ContextVar("sfst_budget", default=None)
+STAR_BUDGET_S = _env_limit("SFST_STAR_BUDGET_S", float)      # per-star defaults outside any budget block
+STAR_BUDGET_RHS = _env_limit("SFST_STAR_BUDGET_RHS", int)
+
+
+@contextmanager
+def budget(*, scan_wall_s: float | None = None, scan_rhs_evals: int | None = None,
+           star_wall_s: float | None = None, star_rhs_evals: int | None = None):
+    """Cooperative budgets for every integration inside the block; yields its BudgetReport.
+
+    scan_* bound the whole block (all stars, all engines); crossing one raises BudgetExceeded
+    (scope "scan") out of the integration that crossed it. star_* bound each single integration
+    (defaults $SFST_STAR_BUDGET_S / $SFST_STAR_BUDGET_RHS); such stars come back as None. Blocks
+    nest: evaluations are charged to every enclosing block. Worker processes of solve_ladder
+    (jobs > 1) run under what is left of the block.
+    """
+    parent = _BUDGET.get()
+    if parent is not None:
+        star_wall_s = parent.star_wall_s if star_wall_s is None else star_wall_s
+        star_rhs_evals = parent.star_rhs_evals if star_rhs_evals is None else star_rhs_evals
+    rep = BudgetReport(scan_wall_s=scan_wall_s, scan_rhs_evals=scan_rhs_evals,
+                       star_wall_s=STAR_BUDGET_S if star_wall_s is None else star_wall_s,
+                       star_rhs_evals=STAR_BUDGET_RHS if star_rhs_evals is None else star_rhs_evals, parent=parent)
+    token = _BUDGET.set(rep)
+    try:
+        yield rep
+    finally:
+        _BUDGET.reset(token)
+
+
+def _star_limits():
+    """(active BudgetReport or None, star wall limit, star RHS limit)."""
+    rep = _BUDGET.get()
+    if rep is None:
+        return None, STAR_BUDGET_S, STAR_BUDGET_RHS
+    return rep, rep.star_wall_s, rep.star_rhs_evals
+
+
+def _metered(fun):
+    """Wrap a scalar RHS so that each call is charged to the star and scan budgets (fun itself when unbounded)."""
+    rep, wall_s, rhs_evals = _star_limits()
+    if rep is None and wall_s is None and rhs_evals is None:
+        return fun
+    t0 = time.monotonic()
+    n = 0
+
+    def wrapped(t, y):
+        nonlocal n
+        n += 1
+        if rhs_evals is not None and n > rhs_evals:
+            raise BudgetExceeded("star", "rhs_evals", rhs_evals, n)
+        if wall_s is not None and time.monotonic() - t0 > wall_s:
+            raise BudgetExceeded("star", "wall_s", wall_s, time.monotonic() - t0)
+        if rep is not None:
+            rep.charge(1)
+        return fun(t, y)
+    return wrapped
+
+
+def _within_star_budget(eos: EOS, rho_c_cgs: float, kw: dict):
+    """_integrate_star, returning (record, exceeded); a star over its own budget gives (None, True)."""
+    try:
+        return _integrate_star(eos, rho_c_cgs, **kw), False
+    except BudgetExceeded as e:
+        if e.scope != "star":
+            raise
+        rep = _BUDGET.get()
+        if rep is not None:
+            rep.note_star_exceeded(resources=(e.resource,))
+        return None, True
+
+
+# --- Streamed profiles (profile_store.py) ---
+_PROFILE_SINK: contextvars.ContextVar = contextvars.ContextVar("sfst_profile_sink", default=None)
+
+
+@contextmanager
+def profile_sink(store, mode: str = "a"):
+    """Stream the profile of every star integrated inside the block into one ProfileStore.
+
+    `store` is a ProfileStore or its directory (opened with `mode`); yields the store. Each
+    integrator pushes its accepted steps into the store while it runs (r, m, P_geom, y_tidal,
+    eps_grav, eps_vac_inertial, W_prof; the samples of store_profile=True), and successful
+    records carry the star's "profile_id" (see ProfileStore.profile). Outside any block
+    $SFST_PROFILE_STORE is the sink; profile_sink(None) switches streaming off. Stars are not
+    served from the StarCache while a sink is active (a cached star has no steps to stream).
+    """
+    from profile_store import ProfileStore
+    if store is not None and not isinstance(store, ProfileStore):
+        store = ProfileStore(store, mode)
+    token = _PROFILE_SINK.set(False if store is None else store)
+    try:
+        yield store
+    finally:
+        _PROFILE_SINK.reset(token)
+
+
+def _profile_store():
+    """The active ProfileStore, or None."""
+    store = _PROFILE_SINK.get()
+    if store is None and DEFAULT_PROFILE_STORE:
+        from profile_store import open_store
+        return open_store(DEFAULT_PROFILE_STORE)
+    return store or None
+
+
+def _profile_writer(eos: EOS, rho_c_cgs: float, *, sigma_vac: float, chi_vac: float, screening_factor: float,
+                    include_in_gravity: bool, engine: str, formulation: str, to_radius=None):
+    """A StarWriter for one star in the active store (None without one).
+
+    Samples are (r, [m, P_geom, y]) unless `to_radius(t, Y) -> (r, m, P_geom, y)` maps the
+    integrator's own variables; the derived columns are those of _star_record.
+    """
+    store = _profile_store()
+    if store is None:
+        return None
+    delta = sigma_vac*chi_vac*screening_factor
+    eps_vac_geom = delta * P_to_geom
+
+    def derive(t, Y):
+        r, m, P, yt = (t, Y[0], Y[1], Y[2]) if to_radius is None else to_radius(t, Y)
+        eps = eos.eval_geom(P)[1]
+        return {"r": r, "m": m, "P_geom": P, "y_tidal": yt, "eps_grav": eps, "eps_vac_inertial": delta * eps,
+                "W_prof": np.abs(eps_vac_geom) / (np.abs(eps + P) + 1e-99)}
+    meta = {"eos": eos.name, "rho_c": float(rho_c_cgs), "sigma_vac": float(sigma_vac), "chi_vac": float(chi_vac),
+            "screening_factor": float(screening_factor), "include_in_gravity": bool(include_in_gravity),
+            "engine": engine, "formulation": formulation}
+    return store.star(meta, derive)
+
+
+def _finish_profile(writer, rec, last=None) -> None:
+    """Index a streamed star under its record (failed stars are left unindexed)."""
+    if writer is not None and rec is not None:
+        rec["profile_id"] = writer.finish(last, M_msun=rec["M_msun"], R_km=rec["R_km"], Lambda=rec["Lambda"])
+
+
+def _streaming(solver, writer):
+    """`solver` (an OdeSolver class) pushing each accepted step to `writer`; solver itself without one."""
+    if writer is None:
+        return solver
+
+    class Streaming(solver):
+        def step(self):
+            message = super().step()
+            if self.status != "failed":
+                writer.push(self.t, self.y)
+            return message
+    return Streaming
+
+
+def _cacheable(rec):
+    """The record as stored in the StarCache (profile ids belong to the store, not the star)."""
+    if rec is None or "profile_id" not in rec:
+        return rec
+    return {k: v for k, v in rec.items() if k != "profile_id"}
+
+
+def integrate_star(eos: EOS, rho_c_cgs: float, *, sigma_vac: float, chi_vac: float, screening_factor: float, include_in_gravity: bool, r0=1e-3, rmax=3e6, max_step=5e4, rtol=3e-6, atol=1e-9, store_profile: bool=False, formulation: str = "radius", sensitivities: bool = False):
+    """Integrate one star from the center to the surface.
+
+    formulation="radius" (default) integrates in r up to the P=0 event; formulation="enthalpy"
+    delegates to integrate_star_enthalpy (fixed endpoint h=0; r0/rmax/max_step unused).
+    sensitivities=True adds d/dsigma and d2/dsigma2 of M, R, Λ to the record; these are always
+    integrated in the enthalpy formulation, where the surface does not move with sigma.
+    With $SFST_CACHE set, records are served from / stored in the persistent StarCache.
+    With store_profile=True the record is the store_profile=False one (W_max and W_center are the
+    center estimate) and its "profile" is a LazyProfile, materialized only when accessed. A star that runs out of its `budget` is
+    returned as None (and not cached). Inside a profile_sink the profile is streamed to the
+    store instead and the record carries its "profile_id".
+    """
+    kw = dict(sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor,
+              include_in_gravity=include_in_gravity, r0=r0, rmax=rmax, max_step=max_step, rtol=rtol, atol=atol,
+              store_profile=store_profile, formulation=formulation, sensitivities=sensitivities)
+    if store_profile:
+        # The star itself is solved (or served from the cache) without a profile; the record keeps
+        # only a LazyProfile recipe, whose arrays are integrated when first accessed.
+        rec = integrate_star(eos, rho_c_cgs, **dict(kw, store_profile=False))
+        if rec is not None:
+            rec = dict(rec, profile=LazyProfile(eos, rho_c_cgs, "scalar", kw))
+        return rec
+    cache = star_cache()
+    if cache is None:
+        return _within_star_budget(eos, rho_c_cgs, kw)[0]
+    solver = dict(engine="scalar", formulation="enthalpy" if sensitivities else formulation,
+                  sensitivities=bool(sensitivities), rtol=float(rtol), atol=float(atol))
+    if solver["formulation"] == "radius":
+        solver.update(r0=float(r0), rmax=float(rmax), max_step=float(max_step))
+    key = star_cache_key(eos, rho_c_cgs, delta=sigma_vac*chi_vac*screening_factor,
+                         include_in_gravity=include_in_gravity, **solver)
+    rec = cache.get(key) if _profile_store() is None else _CACHE_MISS
+    if rec is _CACHE_MISS:
+        rec, exceeded = _within_star_budget(eos, rho_c_cgs, kw)
+        if not exceeded:  # a budget overrun says nothing about the star itself
+            cache.put(key, _cacheable(rec))
+    return rec
+
+
+def _integrate_star(eos: EOS, rho_c_cgs: float, *, sigma_vac: float, chi_vac: float, screening_factor: float, include_in_gravity: bool, r0, rmax, max_step, rtol, atol, store_profile: bool, formulation: str, sensitivities: bool):
+    """integrate_star without the cache."""
+    if formulation == "enthalpy" or sensitivities:
+        return integrate_star_enthalpy(eos, rho_c_cgs, sigma_vac=sigma_vac, chi_vac=chi_vac,
+                                       screening_factor=screening_factor, include_in_gravity=include_in_gravity,
+                                       rtol=rtol, atol=atol, store_profile=store_profile,
+                                       sensitivities=sensitivities)
+    if formulation != "radius":
+        raise ValueError(f"unknown formulation {formulation!r} (expected 'radius' or 'enthalpy')")
     P_c_cgs, eps_c_cgs = eos.P_of_rho(rho_c_cgs)
     P0 = P_c_cgs * P_to_geom
     eps0 = eps_c_cgs * P_to_geom * (1.0 + (sigma_vac*chi_vac*screening_factor/ (eps_c_cgs * P_to_geom)) if include_in_gravity else 1.0)
@@ -181,8 +775,12 @@ def integrate_star(eos: EOS, rho_c_cgs: float, *, sigma_vac: float, chi_vac: flo
     surface.terminal=True
     surface.direction=-1
 
-    sol = solve_ivp(lambda r,y: tov_rhs(r,y,eos, sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor, include_in_gravity=include_in_gravity), (r0, rmax), y_init,
-                    events=surface, max_step=max_step, rtol=rtol, atol=atol)
+    writer = _profile_writer(eos, rho_c_cgs, sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor,
+                             include_in_gravity=include_in_gravity, engine="scalar", formulation="radius")
+    if writer is not None:
+        writer.push(r0, y_init)
+    sol = solve_ivp(_metered(lambda r,y: tov_rhs(r,y,eos, sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor, include_in_gravity=include_in_gravity)), (r0, rmax), y_init,
+                    method=_streaming(RK45, writer), events=surface, max_step=max_step, rtol=rtol, atol=atol)
 
     if len(sol.t_events[0]) == 0:
         return None
@@ -190,30 +788,85 @@ def integrate_star(eos: EOS, rho_c_cgs: float, *, sigma_vac: float, chi_vac: flo
     R = float(sol.t_events[0][0])
     m = float(sol.y_events[0][0][0])
     yR = float(sol.y_events[0][0][2])
-    C = m/R
+    rec = _star_record(eos, rho_c_cgs, R, m, yR, eps0=eps0, P0=P0, sigma_vac=sigma_vac, chi_vac=chi_vac,
+                       screening_factor=screening_factor,
+                       r_prof=sol.t if store_profile else None, y_prof=sol.y if store_profile else None)
+    # solve_ivp ends on the event point, which replaces the last accepted step.
+    _finish_profile(writer, rec, last=(R, sol.y_events[0][0]))
+    return rec
+
 
+def _love_numbers(C, yR):
+    """Tidal Love number k2 and dimensionless deformability Λ from compactness C and y(R)."""
     term1 = (8*C**5/5) * (1-2*C)**2 * (2 + 2*C*(yR-1) - yR)
     term2 = 2*C*(6 - 3*yR + 3*C*(5*yR-8))
     term2 += 4*C**3*(13 - 11*yR + C*(3*yR-2) + 2*C**2*(1+yR))
     term2 += 3*(1-2*C)**2*(2 - yR + 2*C*(yR-1))*np.log(1-2*C)
     k2 = term1/term2
     Lambda = (2.0/3.0)*k2/(C**5)
+    return k2, Lambda
 
-    if store_profile:
+
+class LazyProfile:
+    """Radial profile of one star, materialized on first access.
+
+    Only the recipe (EOS, ρ_c, engine, solver settings) is kept; the first access integrates the
+    star again with the same settings (deterministic, so the samples are those of the original
+    run) and holds the profile as one structured array with fields r, m, P_geom, eps_grav,
+    W_prof (geometrized units). profile["r"] etc. work as with the former dict; release() drops
+    the array again.
+    """
+    fields = ("r", "m", "P_geom", "eps_grav", "W_prof")
+
+    def __init__(self, eos: EOS, rho_c_cgs: float, engine: str, star_kw: dict):
+        self.eos, self.rho_c, self.engine, self.star_kw = eos, float(rho_c_cgs), engine, star_kw
+        self._array = None
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._array is None:
+            with profile_sink(None):  # the star was streamed (if at all) by its original run
+                if self.engine == "batched":
+                    rec = _integrate_stars_batched(self.eos, [self.rho_c], **self.star_kw)[0]
+                else:
+                    rec = _integrate_star(self.eos, self.rho_c, **self.star_kw)
+            if rec is None:
+                raise RuntimeError(f"re-integration of the star at rho_c={self.rho_c:.6g} failed")
+            self._array = rec["profile"]
+        return self._array
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.array[name]
+
+    def keys(self):
+        return self.fields
+
+    def release(self) -> None:
+        self._array = None
+
+    def __getstate__(self):
+        return {**self.__dict__, "_array": None}
+
+
+def _star_record(eos: EOS, rho_c_cgs: float, R: float, m: float, yR: float, *, eps0: float, P0: float,
+                 sigma_vac: float, chi_vac: float, screening_factor: float, r_prof=None, y_prof=None):
+    """Assemble the per-star result record shared by all integration engines."""
+    C = m/R
+    k2, Lambda = _love_numbers(C, yR)
+
+    if r_prof is not None:
         # Build simple profiles for diagnostics (gravity-source energy density)
-        r_prof = sol.t
-        m_prof = sol.y[0]
-        P_prof_geom = sol.y[1]
-        # Convert P back to cgs to compute eps
-        P_prof_cgs = P_prof_geom / P_to_geom
-        eps_prof_cgs = np.array([eos.rho_eps_depsdP_of_P(float(P))[1] for P in P_prof_cgs])
-        eps_prof_geom = eps_prof_cgs * P_to_geom
+        m_prof = y_prof[0]
+        P_prof_geom = y_prof[1]
+        eps_prof_geom = eos.eval_geom(P_prof_geom)[1]
         # WFaktor diagnostic: dimensionless ratio of inertial vacuum energy density to (eps+P).
         eps_vac_geom = (sigma_vac*chi_vac*screening_factor) * P_to_geom
         W_prof = np.abs(eps_vac_geom) / (np.abs(eps_prof_geom + P_prof_geom) + 1e-99)
         W_max = float(np.nanmax(W_prof))
         W_center = float(W_prof[0]) if len(W_prof)>0 else float("nan")
-        profile = {"r": r_prof, "m": m_prof, "P_geom": P_prof_geom, "eps_grav": eps_prof_geom, "W_prof": W_prof}
+        profile = np.empty(len(r_prof), dtype=[(f, float) for f in LazyProfile.fields])
+        for f, v in zip(LazyProfile.fields, (r_prof, m_prof, P_prof_geom, eps_prof_geom, W_prof)):
+            profile[f] = v
     else:
         profile = None
         # Minimal WFaktor estimate (center only) when profile is not stored.
@@ -234,38 +887,860 @@ def integrate_star(eos: EOS, rho_c_cgs: float, *, sigma_vac: float, chi_vac: flo
     }
 
 
+# --- Enthalpy formulation (Lindblom 1992) ---
+# The independent variable is the enthalpy of the bare EOS, dh = dP/(eps + P), so that
+# dr/dh = -r(r-2m)/(m + 4 pi r^3 P) * (eps+P)/(eps_inertial+P) and the surface is the fixed
+# endpoint h=0. h(P) does not depend on the inertial insertion delta: delta only enters the
+# right-hand side algebraically, which is what makes the delta-derivatives below cheap.
+# I do not carry P in the state: near the surface P ~ h^(Gamma/(Gamma-1)) and dP/dh = eps+P
+# with eps ~ P^(1/Gamma) is not Lipschitz at P=0, which is what throttles the step size.
+# P is read off a per-EOS table of h(P) instead, and the state is (u = r^2, mu = m/r^3, y),
+# all smooth at the center. The integration variable is s = sqrt(h).
+# Internally lengths are in km so that all state components are O(1).
+_KM = 1.0e5
+_GL_X, _GL_W = np.polynomial.legendre.leggauss(8)
+
+
+def _hermite(xs, ys, ds, x: float) -> float:
+    """Scalar cubic Hermite interpolation on knot lists; linear extrapolation outside."""
+    if x <= xs[0]:
+        return ys[0] + ds[0] * (x - xs[0])
+    if x >= xs[-1]:
+        return ys[-1] + ds[-1] * (x - xs[-1])
+    k = bisect.bisect_right(xs, x) - 1
+    H = xs[k+1] - xs[k]
+    t = (x - xs[k]) / H
+    t2, t3 = t*t, t*t*t
+    return ((2*t3 - 3*t2 + 1) * ys[k] + (t3 - 2*t2 + t) * H * ds[k]
+            + (-2*t3 + 3*t2) * ys[k+1] + (t3 - t2) * H * ds[k+1])
+
+
+def log_enthalpy(eos: EOS, P_geom: float, *, delta: float = 0.0) -> float:
+    """h(P) = int_0^P dP' / ((1+delta) eps + P'), evaluated as an integral over ln P'."""
+    from scipy.integrate import quad
+
+    def integrand(x):
+        P = math.exp(x)
+        eps = float(eos.eval_geom(P)[1])
+        return P / ((1.0 + delta) * eps + P)
+
+    x_c = math.log(P_geom)
+    breaks = [math.log(p * P_to_geom) for p in eos.P_breaks_cgs if p * P_to_geom < P_geom]
+    val, _ = quad(integrand, x_c - 80.0, x_c, points=breaks or None, limit=200, epsabs=0.0, epsrel=1e-10)
+    return val
+
+
+@dataclass(frozen=True)
+class EnthalpyTable:
+    """Cubic Hermite table of ln h versus ln P (geometrized) for one EOS (delta=0 enthalpy).
+
+    The knot slopes d ln h / d ln P = P / ((eps + P) h) are exact, so the inverse P(h) uses the
+    same knots with reciprocal slopes. Outside the knots both directions extrapolate as power
+    laws (the single-polytrope limit at low P).
+    """
+    x: np.ndarray   # ln P at the knots
+    w: np.ndarray   # ln h at the knots
+    g: np.ndarray   # d ln h / d ln P at the knots
+
+    def h_of_P(self, P_geom: float) -> float:
+        return math.exp(_hermite(self._x, self._w, self._g, math.log(P_geom)))
+
+    def P_of_h(self, h: float) -> float:
+        return math.exp(_hermite(self._w, self._x, self._g_inv, math.log(h)))
+
+    def __post_init__(self):
+        object.__setattr__(self, "_x", self.x.tolist())
+        object.__setattr__(self, "_w", self.w.tolist())
+        object.__setattr__(self, "_g", self.g.tolist())
+        object.__setattr__(self, "_g_inv", (1.0 / self.g).tolist())
+
+
+def enthalpy_table(eos: EOS, *, log10P_min: float = 20.0, log10P_max: float = 38.0,
+                   n_per_decade: int = 96) -> EnthalpyTable:
+    """Build (once per EOS instance) the EnthalpyTable used by integrate_star_enthalpy.
+
+    Knots are log-spaced in P with the EOS segment boundaries inserted; h is accumulated with
+    8-point Gauss-Legendre per interval, starting from log_enthalpy at the lowest knot.
+    """
+    key = (log10P_min, log10P_max, n_per_decade)
+    cache = eos.__dict__.get("_enthalpy_tables")
+    if cache is None:
+        cache = {}
+        object.__setattr__(eos, "_enthalpy_tables", cache)
+    if key in cache:
+        return cache[key]
+
+    edges = ([10**log10P_min] + sorted(p for p in eos.P_breaks_cgs if 10**log10P_min < p < 10**log10P_max)
+             + [10**log10P_max])
+    xs = []
+    for a, b in zip(edges[:-1], edges[1:]):
+        n = max(int(np.ceil(np.log10(b / a) * n_per_decade)), 4) + 1
+        x = np.linspace(math.log(a * P_to_geom), math.log(b * P_to_geom), n)
+        xs.append(x if not xs else x[1:])
+    x = np.concatenate(xs)
+
+    def dh_dlnP(xx):
+        P = np.exp(xx)
+        eps = eos.eval_geom(P)[1]
+        return P / (eps + P)
+
+    mid, half = 0.5 * (x[1:] + x[:-1]), 0.5 * (x[1:] - x[:-1])
+    nodes = mid[:, None] + half[:, None] * _GL_X[None, :]
+    incr = (dh_dlnP(nodes.ravel()).reshape(nodes.shape) * _GL_W[None, :]).sum(axis=1) * half
+    h0 = log_enthalpy(eos, math.exp(x[0]))
+    h = np.concatenate([[h0], h0 + np.cumsum(incr)])
+    table = EnthalpyTable(x=x, w=np.log(h), g=dh_dlnP(x) / h)
+    cache[key] = table
+    return table
+
+
+class _Jet2:
+    """Second-order Taylor number in delta: value v and derivatives d1 = df/ddelta, d2 = d2f/ddelta2.
+
+    Enough arithmetic (+ - * / integer powers, sqrt, log) to push the enthalpy RHS and
+    _love_numbers through unchanged, which yields the first- and second-order variational
+    equations without hand-written Jacobians.
+    """
+    __slots__ = ("v", "d1", "d2")
+
+    def __init__(self, v, d1=0.0, d2=0.0):
+        self.v, self.d1, self.d2 = v, d1, d2
+
+    def _chain(self, f0, f1, f2):
+        return _Jet2(f0, f1*self.d1, f2*self.d1*self.d1 + f1*self.d2)
+
+    def __add__(self, o):
+        if isinstance(o, _Jet2):
+            return _Jet2(self.v + o.v, self.d1 + o.d1, self.d2 + o.d2)
+        return _Jet2(self.v + o, self.d1, self.d2)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return _Jet2(-self.v, -self.d1, -self.d2)
+
+    def __sub__(self, o):
+        return self + (-o)
+
+    def __rsub__(self, o):
+        return (-self) + o
+
+    def __mul__(self, o):
+        if isinstance(o, _Jet2):
+            return _Jet2(self.v*o.v, self.d1*o.v + self.v*o.d1, self.d2*o.v + 2.0*self.d1*o.d1 + self.v*o.d2)
+        return _Jet2(self.v*o, self.d1*o, self.d2*o)
+
+    __rmul__ = __mul__
+
+    def _recip(self):
+        r = 1.0 / self.v
+        return self._chain(r, -r*r, 2.0*r*r*r)
+
+    def __truediv__(self, o):
+        if isinstance(o, _Jet2):
+            return self * o._recip()
+        return _Jet2(self.v/o, self.d1/o, self.d2/o)
+
+    def __rtruediv__(self, o):
+        return self._recip() * o
+
+    def __pow__(self, n: int):
+        v = self.v
+        return self._chain(v**n, n*v**(n-1), n*(n-1)*v**(n-2) if n > 1 else 0.0)
+
+    def sqrt(self):
+        r = math.sqrt(self.v)
+        return self._chain(r, 0.5/r, -0.25/(r*self.v))
+
+    def log(self):
+        return self._chain(math.log(self.v), 1.0/self.v, -1.0/(self.v*self.v))
+
+
+def _enthalpy_derivs(s, P, eps, deps_dP, u, mu, yt, delta, include_in_gravity: bool):
+    """d/ds of (u, mu, y) at s = sqrt(h); plain arithmetic so u, mu, yt, delta may be _Jet2."""
+    eps_inertial = (1.0 + delta) * eps
+    eps_dm = eps_inertial if include_in_gravity else eps
+    D = mu + 4.0*np.pi*P
+    C1 = 1.0 - 2.0*mu*u
+    du_dh = -2.0*C1 / D * ((eps + P) / (eps_inertial + P))   # = 2 r dr/dh
+    F = (1.0 - 4.0*np.pi*u*(eps_dm - P)) / C1
+    uQ = 4.0*np.pi*u*(5.0*eps_dm + 9.0*P + (eps_dm+P)*deps_dP)/C1 - 6.0 - 4.0*u*u*D*D/C1**2
+    ds_fac = 2.0*s * du_dh / (2.0*u)                          # (dh/ds) (dr/dh) / r
+    return 2.0*s*du_dh, (4.0*np.pi*eps_dm - 3.0*mu)*ds_fac, (-(yt*yt) - yt*F - uQ)*ds_fac
+
+
+def _enthalpy_eos_at(s, eos: EOS, htab: EnthalpyTable, h_floor: float):
+    """(P, eps, deps/dP) in km units at s = sqrt(h); h is floored at h_floor so that the stage
+    evaluated exactly at the surface (s=0) takes the one-sided limit of the RHS."""
+    P_g = htab.P_of_h(max(s*s, h_floor))
+    _, eps_g, deps_dP = eos.eval_geom(P_g)
+    return P_g * _KM**2, float(eps_g) * _KM**2, float(deps_dP)
+
+
+def tov_rhs_enthalpy(s, z, eos: EOS, htab: EnthalpyTable, *, delta: float, include_in_gravity: bool,
+                     h_floor: float = 0.0):
+    """d/ds of z = (u=r^2, mu=m/r^3, y) in km units, with s = sqrt(h)."""
+    P, eps, deps_dP = _enthalpy_eos_at(s, eos, htab, h_floor)
+    return list(_enthalpy_derivs(s, P, eps, deps_dP, z[0], z[1], z[2], delta, include_in_gravity))
+
+
+def tov_rhs_enthalpy_tangent(s, z, eos: EOS, htab: EnthalpyTable, *, delta: float, include_in_gravity: bool,
+                             h_floor: float = 0.0):
+    """tov_rhs_enthalpy plus first- and second-order variational equations in delta.
+
+    z = (u, mu, y, du/dd, dmu/dd, dy/dd, d2u/dd2, d2mu/dd2, d2y/dd2), d = delta.
+    """
+    P, eps, deps_dP = _enthalpy_eos_at(s, eos, htab, h_floor)
+    u, mu, yt = (_Jet2(z[i], z[i+3], z[i+6]) for i in range(3))
+    out = _enthalpy_derivs(s, P, eps, deps_dP, u, mu, yt, _Jet2(delta, 1.0), include_in_gravity)
+    return [f.v for f in out] + [f.d1 for f in out] + [f.d2 for f in out]
+
+
+def integrate_star_enthalpy(eos: EOS, rho_c_cgs: float, *, sigma_vac: float, chi_vac: float, screening_factor: float,
+                            include_in_gravity: bool, rtol=3e-6, atol=1e-9, store_profile: bool=False,
+                            r_start_km: float = 0.1, sensitivities: bool = False):
+    """Integrate one star in s = sqrt(h) from the center (h=h_c) to the surface (h=0).
+
+    No surface event search and no rmax guess are needed: M, R and the Hinderer y(R) are the
+    state at h=0. The integrator is restarted at the enthalpies of the EOS breakpoints (known in
+    advance here), where d eps/dP jumps and the y equation has a kink.
+    Returns the same record as integrate_star (None if the integration fails).
+
+    sensitivities=True also integrates the first- and second-order variational equations in
+    delta = sigma*chi*S (at fixed rho_c) and adds dM_dsigma, d2M_dsigma2, dR_dsigma, d2R_dsigma2,
+    dLambda_dsigma, d2Lambda_dsigma2 (M in M_sun, R in km) to the record, taken at the given sigma.
+    """
+    delta0 = sigma_vac*chi_vac*screening_factor
+    P_c_cgs, eps_c_cgs = eos.P_of_rho(rho_c_cgs)
+    P0 = P_c_cgs * P_to_geom
+    eps0 = eps_c_cgs * P_to_geom * (1.0 + (delta0 / (eps_c_cgs * P_to_geom)) if include_in_gravity else 1.0)
+
+    htab = enthalpy_table(eos)
+    h_c = htab.h_of_P(P0)
+
+    # Leading-order center series (Lindblom 1992, eq. 8-9). The start h0 is fixed (delta-free,
+    # r = r_start_km at delta=0); the starting radius then carries the delta dependence.
+    P_c = P0 * _KM**2
+    eps_c = float(eos.eval_geom(P0)[1]) * _KM**2
+    delta = _Jet2(delta0, 1.0) if sensitivities else delta0
+    eps_in_c = (1.0 + delta) * eps_c
+    eps_dm_c = eps_in_c if include_in_gravity else eps_c
+    dh0 = 2.0*np.pi/3.0 * (eps_c + 3.0*P_c) * r_start_km**2
+    h0 = h_c - dh0
+    mu0 = 4.0/3.0*np.pi*eps_dm_c
+    u0 = dh0 * 2.0*((eps_c + P_c)/(eps_in_c + P_c)) / (mu0 + 4.0*np.pi*P_c)
+    if sensitivities:
+        u0, mu0 = (a if isinstance(a, _Jet2) else _Jet2(a) for a in (u0, mu0))
+        z = [u0.v, mu0.v, 2.0, u0.d1, mu0.d1, 0.0, u0.d2, mu0.d2, 0.0]
+        rhs_fn = tov_rhs_enthalpy_tangent
+    else:
+        z = [u0, mu0, 2.0]
+        rhs_fn = tov_rhs_enthalpy
+
+    def rhs(sv, zz):
+        return rhs_fn(sv, zz, eos, htab, delta=delta0, include_in_gravity=include_in_gravity, h_floor=1e-16*h_c)
+    rhs = _metered(rhs)  # one star budget over all segments
+
+    s_breaks = [math.sqrt(htab.h_of_P(p * P_to_geom)) for p in sorted(eos.P_breaks_cgs, reverse=True)
+                if p * P_to_geom < P0]
+    s_nodes = [math.sqrt(h0)] + [sb for sb in s_breaks if sb*sb < h0] + [0.0]
+
+    def to_radius(sp, zp):
+        P_prof = np.array([htab.P_of_h(sv*sv) if sv > 0 else 0.0 for sv in sp])
+        return np.sqrt(zp[0]) * _KM, zp[1] * zp[0]**1.5 * _KM, P_prof, zp[2]
+    writer = _profile_writer(eos, rho_c_cgs, sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor,
+                             include_in_gravity=include_in_gravity, engine="scalar", formulation="enthalpy",
+                             to_radius=to_radius)
+    method = _streaming(RK45, writer)
+    t_seg, z_seg = [], []
+    for s_a, s_b in zip(s_nodes[:-1], s_nodes[1:]):
+        if writer is not None:
+            writer.push(s_a, z)
+        sol = solve_ivp(rhs, (s_a, s_b), z, method=method, rtol=rtol, atol=atol)
+        if sol.status != 0:
+            return None
+        t_seg.append(sol.t)
+        z_seg.append(sol.y)
+        z = sol.y[:, -1]
+
+    u_R, mu_R, yR = z[:3]
+    R = math.sqrt(u_R) * _KM
+    m = mu_R * u_R**1.5 * _KM
+    if store_profile:
+        r_prof, m_prof, P_prof, y_tidal = to_radius(np.concatenate(t_seg), np.hstack(z_seg))
+        y_prof = np.vstack([m_prof, P_prof, y_tidal])
+    else:
+        r_prof = y_prof = None
+    rec = _star_record(eos, rho_c_cgs, R, m, float(yR), eps0=eps0, P0=P0, sigma_vac=sigma_vac, chi_vac=chi_vac,
+                       screening_factor=screening_factor, r_prof=r_prof, y_prof=y_prof)
+    if sensitivities:
+        u, mu, y = (_Jet2(z[i], z[i+3], z[i+6]) for i in range(3))
+        R_km = u.sqrt()
+        M_msun = mu * u * R_km * (_KM / Msun_geom_cm)
+        _, Lam = _love_numbers(mu * u, y)          # C = m/R = mu r^2 = mu u
+        g = chi_vac*screening_factor                # d delta / d sigma
+        for name, jet in (("M", M_msun), ("R", R_km), ("Lambda", Lam)):
+            rec[f"d{name}_dsigma"] = g * jet.d1
+            rec[f"d2{name}_dsigma2"] = g * g * jet.d2
+    _finish_profile(writer, rec)
+    return rec
+
+
+# --- Lockstep batched engine (whole central-density ladder as NumPy arrays) ---
+# Same Dormand-Prince 5(4) tableau, error norm and step-size controller as scipy's RK45,
+# applied per star; the surface (P=0) is located on the RK45 dense-output polynomial.
+_RK_SAFETY = 0.9
+_RK_MIN_FACTOR = 0.2
+_RK_MAX_FACTOR = 10.0
+_RK_ERR_EXP = -1.0 / (RK45.error_estimator_order + 1)
+
+
+def tov_rhs_batch(r, Y, eos: EOS, *, delta, include_in_gravity):
+    """Array version of `tov_rhs`.
+
+    r has shape (N,), Y has shape (3, N) with rows (m, P, y); `delta` (=sigma*chi*S) and
+    `include_in_gravity` are per-star arrays of shape (N,). Same physics as `tov_rhs`.
+    """
+    out = np.zeros_like(Y)
+    live = (Y[1] > 0.0) & (r > 0.0)
+    if not live.any():
+        return out
+    r = r[live]
+    m, P, yt = Y[0, live], Y[1, live], Y[2, live]
+    _, eps_grav, deps_dP_cgs = eos.eval_geom(P)
+    eps_vac_inertial = delta[live] * eps_grav
+    eps_inertial = eps_grav + eps_vac_inertial
+    eps_for_dm = np.where(include_in_gravity[live], eps_inertial, eps_grav)
+    cs2 = 1.0 / deps_dP_cgs
+
+    C1 = 1.0 - 2.0*m/r
+    out[0, live] = 4.0*np.pi*r**2 * eps_for_dm
+    out[1, live] = -(eps_inertial+P) * (m + 4.0*np.pi*r**3 * P) / (r*(r-2.0*m))
+
+    eps_bg = eps_for_dm
+    F = (1.0 - 4.0*np.pi*r**2*(eps_bg - P)) / C1
+    Q = (4.0*np.pi*(5.0*eps_bg + 9.0*P + (eps_bg+P)/cs2))/C1 - 6.0/(r**2) - 4.0*(m + 4.0*np.pi*r**3*P)**2/(r**4 * C1**2)
+    out[2, live] = -(yt**2)/r - (yt*F)/r - r*Q
+    return out
+
+
+def _lincomb(c, K):
+    """sum_j c[j] * K[j], accumulated element-wise in a fixed order.
+
+    I avoid np.tensordot here: BLAS rounds a star's column differently depending on the batch
+    width, and a star's result must not depend on which other stars share its batch.
+    """
+    acc = c[0] * K[0]
+    for cj, Kj in zip(c[1:], K[1:]):
+        if cj != 0.0:
+            acc = acc + cj * Kj
+    return acc
+
+
+def _rms(x):
+    """Column-wise RMS norm (scipy's `norm` applied per star)."""
+    return np.sqrt(np.mean(x**2, axis=0))
+
+
+def _dense_eval(Q, y_old, h, x):
+    """Evaluate the RK45 quartic interpolant at fractional positions x (per star)."""
+    p = np.cumprod(np.repeat(x[None, :], Q.shape[2], axis=0), axis=0)  # (4, k): x, x^2, x^3, x^4
+    return y_old + h * np.einsum("ikj,jk->ik", Q, p)
+
+
+def integrate_stars_batched(eos: EOS, rho_cs, *, sigma_vac, chi_vac, screening_factor, include_in_gravity,
+                            r0=1e-3, rmax=3e6, max_step=5e4, rtol=3e-6, atol=1e-9, store_profile: bool=False):
+    """Integrate a whole ladder of central densities in lockstep.
+
+    All stars are advanced together as (3, N) arrays with per-star step control and per-star
+    surface termination. sigma_vac/chi_vac/screening_factor/include_in_gravity may be scalars or
+    per-star arrays. Returns a list aligned with `rho_cs` holding records of the same form as
+    `integrate_star` (None where no surface was found before rmax); the values agree with it to
+    integrator tolerance (see README, "Solver performance options").
+    With $SFST_CACHE set, cached stars are taken from the StarCache and only the others are integrated.
+    With store_profile=True the records are the store_profile=False ones with LazyProfile recipes
+    as "profile" (see integrate_star).
+    Inside a profile_sink every star is streamed and no star is taken from the cache.
+    Stars that run out of their `budget` are None; in lockstep, a star's wall time is the batch's.
+    """
+    kw = dict(r0=r0, rmax=rmax, max_step=max_step, rtol=rtol, atol=atol, store_profile=store_profile)
+    rho_cs = np.atleast_1d(np.asarray(rho_cs, dtype=float))
+    n = rho_cs.size
+    sig = np.broadcast_to(np.asarray(sigma_vac, dtype=float), (n,))
+    chi = np.broadcast_to(np.asarray(chi_vac, dtype=float), (n,))
+    scr = np.broadcast_to(np.asarray(screening_factor, dtype=float), (n,))
+    inc_g = np.broadcast_to(np.asarray(include_in_gravity, dtype=bool), (n,))
+    if store_profile:
+        # As in integrate_star: solve without profiles and keep LazyProfile recipes (single-star
+        # re-integration is bitwise identical to the star's run inside the batch).
+        records = integrate_stars_batched(eos, rho_cs, sigma_vac=sig, chi_vac=chi, screening_factor=scr,
+                                          include_in_gravity=inc_g, **dict(kw, store_profile=False))
+        return [None if rec is None else dict(rec, profile=LazyProfile(eos, rho_cs[i], "batched", dict(
+                    kw, sigma_vac=float(sig[i]), chi_vac=float(chi[i]), screening_factor=float(scr[i]),
+                    include_in_gravity=bool(inc_g[i]))))
+                for i, rec in enumerate(records)]
+    cache = star_cache()
+    if cache is None:
+        return _integrate_stars_batched(eos, rho_cs, sigma_vac=sig, chi_vac=chi, screening_factor=scr,
+                                        include_in_gravity=inc_g, **kw)
+    keys = [star_cache_key(eos, rho_cs[i], delta=sig[i]*chi[i]*scr[i], include_in_gravity=inc_g[i],
+                           engine="batched", formulation="radius", sensitivities=False, rtol=float(rtol),
+                           atol=float(atol), r0=float(r0), rmax=float(rmax), max_step=float(max_step))
+            for i in range(n)]
+    streaming = _profile_store() is not None
+    records = [_CACHE_MISS if streaming else cache.get(k) for k in keys]
+    miss = np.array([rec is _CACHE_MISS for rec in records], dtype=bool)
+    if miss.any():
+        exceeded = []
+        solved = _integrate_stars_batched(eos, rho_cs[miss], sigma_vac=sig[miss], chi_vac=chi[miss],
+                                          screening_factor=scr[miss], include_in_gravity=inc_g[miss],
+                                          exceeded=exceeded, **kw)
+        for j, (i, rec) in enumerate(zip(np.nonzero(miss)[0], solved)):
+            records[i] = rec
+            if j not in exceeded:  # stars stopped by their budget are not cached
+                cache.put(keys[i], _cacheable(rec))
+    return records
+
+
+def _integrate_stars_batched(eos: EOS, rho_cs, *, sigma_vac, chi_vac, screening_factor, include_in_gravity,
+                             r0, rmax, max_step, rtol, atol, store_profile: bool, exceeded: list | None = None):
+    """integrate_stars_batched without the cache; the indices of stars stopped by their budget are
+    appended to `exceeded`."""
+    rho_cs = np.atleast_1d(np.asarray(rho_cs, dtype=float))
+    n = rho_cs.size
+    sig = np.broadcast_to(np.asarray(sigma_vac, dtype=float), (n,))
+    chi = np.broadcast_to(np.asarray(chi_vac, dtype=float), (n,))
+    scr = np.broadcast_to(np.asarray(screening_factor, dtype=float), (n,))
+    inc_g = np.broadcast_to(np.asarray(include_in_gravity, dtype=bool), (n,))
+    delta = sig * chi * scr
+    if n == 0:
+        return []
+
+    # Initial conditions: identical to integrate_star.
+    P0 = np.empty(n)
+    eps0 = np.empty(n)
+    for i, rc in enumerate(rho_cs):
+        P_c_cgs, eps_c_cgs = eos.P_of_rho(float(rc))
+        P0[i] = P_c_cgs * P_to_geom
+        eps0[i] = eps_c_cgs * P_to_geom * (1.0 + (delta[i] / (eps_c_cgs * P_to_geom)) if inc_g[i] else 1.0)
+    m0 = 4.0/3.0*np.pi * r0**3 * eps0
+    y = np.vstack([m0, P0, np.full(n, 2.0)])
+    t = np.full(n, float(r0))
+
+    rep, star_wall_s, star_rhs = _star_limits()
+    metered = rep is not None or star_wall_s is not None or star_rhs is not None
+    nevals = np.zeros(n, dtype=np.int64)  # RHS evaluations per star
+    over = np.zeros(n, dtype=bool)        # stopped by the star budget
+    over_resources = set()
+    t_start = time.monotonic()
+
+    def rhs(idx, tt, yy):
+        if metered:
+            nevals[idx] += 1
+            if rep is not None:
+                rep.charge(idx.size)
+        return tov_rhs_batch(tt, yy, eos, delta=delta[idx], include_in_gravity=inc_g[idx])
+
+    all_idx = np.arange(n)
+    f = rhs(all_idx, t, y)
+
+    # Initial step selection (Hairer, Norsett & Wanner II.4; as scipy's select_initial_step).
+    interval = abs(rmax - r0)
+    scale = atol + np.abs(y) * rtol
+    d0 = _rms(y / scale)
+    d1 = _rms(f / scale)
+    h0 = np.where((d0 < 1e-5) | (d1 < 1e-5), 1e-6, 0.01 * d0 / np.where(d1 > 0, d1, 1.0))
+    h0 = np.minimum(h0, interval)
+    f1 = rhs(all_idx, t + h0, y + h0 * f)
+    d2 = _rms((f1 - f) / scale) / h0
+    dmax = np.maximum(d1, d2)
+    h1 = np.where((d1 <= 1e-15) & (d2 <= 1e-15), np.maximum(1e-6, h0 * 1e-3),
+                  (0.01 / np.where(dmax > 0, dmax, 1.0)) ** (1.0 / (RK45.error_estimator_order + 1)))
+    h_abs = np.minimum.reduce([100 * h0, h1, np.full(n, interval), np.full(n, float(max_step))])
+
+    A, B, Cc, E, Pm = RK45.A, RK45.B, RK45.C, RK45.E, RK45.P
+    n_stages = RK45.n_stages
+
+    fresh = np.ones(n, dtype=bool)      # start of a new step (h clamped to [min_step, max_step])
+    rejected = np.zeros(n, dtype=bool)  # a trial of the current step was already rejected
+    active = np.ones(n, dtype=bool)
+    surface = np.full((4, n), np.nan)   # R, m, P, y at the surface
+    prof_t = [[float(r0)] for _ in range(n)] if store_profile else None
+    prof_y = [[y[:, i].copy()] for i in range(n)] if store_profile else None
+    writers = [None] * n
+    if _profile_store() is not None:
+        writers = [_profile_writer(eos, float(rho_cs[i]), sigma_vac=float(sig[i]), chi_vac=float(chi[i]),
+                                   screening_factor=float(scr[i]), include_in_gravity=bool(inc_g[i]),
+                                   engine="batched", formulation="radius") for i in range(n)]
+        for i, w in enumerate(writers):
+            w.push(r0, y[:, i])
+
+    while active.any():
+        if star_rhs is not None or star_wall_s is not None:
+            by_rhs = active & (nevals > star_rhs) if star_rhs is not None else np.zeros(n, dtype=bool)
+            by_wall = np.zeros(n, dtype=bool)
+            if star_wall_s is not None and time.monotonic() - t_start > star_wall_s:
+                by_wall = active & ~by_rhs
+            spent = by_rhs | by_wall
+            if spent.any():
+                active[spent] = False
+                over[spent] = True
+                over_resources.update(r for r, hit in (("rhs_evals", by_rhs), ("wall_s", by_wall)) if hit.any())
+                continue
+        idx = np.nonzero(active)[0]
+        ti, yi, fi = t[idx], y[:, idx], f[:, idx]
+        min_step = 10 * np.abs(np.nextafter(ti, np.inf) - ti)
+        hi = h_abs[idx]
+        fr = fresh[idx]
+        hi = np.where(fr & (hi > max_step), max_step, np.where(fr & (hi < min_step), min_step, hi))
+        too_small = hi < min_step
+        if too_small.any():
+            active[idx[too_small]] = False
+            keep = ~too_small
+            idx, ti, yi, fi, hi, min_step = idx[keep], ti[keep], yi[:, keep], fi[:, keep], hi[keep], min_step[keep]
+            if idx.size == 0:
+                continue
+
+        t_new = np.minimum(ti + hi, rmax)
+        h = t_new - ti
+
+        K = np.empty((n_stages + 1, 3, idx.size))
+        K[0] = fi
+        for s_, (a, c) in enumerate(zip(A[1:], Cc[1:]), start=1):
+            dy = _lincomb(a[:s_], K[:s_]) * h
+            K[s_] = rhs(idx, ti + c * h, yi + dy)
+        y_new = yi + h * _lincomb(B, K[:-1])
+        f_new = rhs(idx, ti + h, y_new)
+        K[-1] = f_new
+
+        err = _lincomb(E, K) * h
+        scale = atol + np.maximum(np.abs(yi), np.abs(y_new)) * rtol
+        err_norm = _rms(err / scale)
+        with np.errstate(divide="ignore"):
+            grow = _RK_SAFETY * err_norm ** _RK_ERR_EXP
+        acc = err_norm < 1
+
+        # Rejected trials: shrink and retry on the next pass.
+        rej = ~acc
+        h_abs[idx[rej]] = hi[rej] * np.maximum(_RK_MIN_FACTOR, grow[rej])
+        rejected[idx[rej]] = True
+        fresh[idx[rej]] = False
+        if not acc.any():
+            continue
+
+        # Accepted steps: update step size and commit the new state.
+        ia = idx[acc]
+        factor = np.where(err_norm[acc] == 0, _RK_MAX_FACTOR, np.minimum(_RK_MAX_FACTOR, grow[acc]))
+        factor = np.where(rejected[ia], np.minimum(1.0, factor), factor)
+        h_abs[ia] = hi[acc] * factor
+        rejected[ia] = False
+        fresh[ia] = True
+
+        P_old = yi[1, acc]
+        y_old = yi[:, acc]
+        t_old = ti[acc]
+        t[ia] = t_new[acc]
+        y[:, ia] = y_new[:, acc]
+        f[:, ia] = f_new[:, acc]
+
+        # Surface event: P crosses zero from above during the step.
+        hit = (P_old >= 0) & (y_new[1, acc] <= 0)
+        if hit.any():
+            ih = ia[hit]
+            Qd = np.einsum("sik,sj->ikj", K[:, :, acc][:, :, hit], Pm)
+            hh = h[acc][hit]
+            yo = y_old[:, hit]
+            lo = np.zeros(ih.size)
+            hi_x = np.ones(ih.size)
+            tol = 4 * np.finfo(float).eps * np.abs(t_old[hit] + hh)
+            for _ in range(100):
+                # Bisect each star until its own bracket converges (not until all of them have),
+                # so the root does not depend on the other stars in the batch.
+                todo = (hi_x - lo) * hh > tol
+                if not todo.any():
+                    break
+                mid = 0.5 * (lo + hi_x)
+                Pmid = _dense_eval(Qd, yo, hh, mid)[1]
+                pos = Pmid > 0
+                lo = np.where(todo & pos, mid, lo)
+                hi_x = np.where(todo & ~pos, mid, hi_x)
+            x_root = 0.5 * (lo + hi_x)
+            y_root = _dense_eval(Qd, yo, hh, x_root)
+            surface[0, ih] = t_old[hit] + x_root * hh
+            surface[1:, ih] = y_root
+            active[ih] = False
+            if store_profile:
+                for j, i in enumerate(ih):
+                    prof_t[i].append(float(surface[0, i]))
+                    prof_y[i].append(y_root[:, j].copy())
+            if writers[0] is not None:
+                for j, i in enumerate(ih):
+                    writers[i].push(surface[0, i], y_root[:, j])
+
+        if store_profile:
+            for i in ia[~hit]:
+                prof_t[i].append(float(t[i]))
+                prof_y[i].append(y[:, i].copy())
+        if writers[0] is not None:
+            for i in ia[~hit]:
+                writers[i].push(t[i], y[:, i])
+
+        # Reached rmax without a surface.
+        active[ia[~hit & (t_new[acc] >= rmax)]] = False
+
+    if over.any():
+        if rep is not None:
+            rep.note_star_exceeded(int(over.sum()), over_resources)
+        if exceeded is not None:
+            exceeded.extend(int(i) for i in np.nonzero(over)[0])
+    records = []
+    for i in range(n):
+        if over[i] or not np.isfinite(surface[0, i]):
+            records.append(None)
+            continue
+        records.append(_star_record(
+            eos, float(rho_cs[i]), float(surface[0, i]), float(surface[1, i]), float(surface[3, i]),
+            eps0=float(eps0[i]), P0=float(P0[i]), sigma_vac=float(sig[i]), chi_vac=float(chi[i]),
+            screening_factor=float(scr[i]),
+            r_prof=np.asarray(prof_t[i]) if store_profile else None,
+            y_prof=np.asarray(prof_y[i]).T if store_profile else None,
+        ))
+        _finish_profile(writers[i], records[-1])
+    return records
+
+
+def solve_ladder(eos: EOS, rho_cs, *, engine: str | None = None, jobs: int | None = None, **star_kw):
+    """Solve a central-density ladder; returns one `integrate_star` record (or None) per ρ_c.
+
+    engine="scalar" calls integrate_star once per star, engine="batched" advances the whole
+    ladder in lockstep (integrate_stars_batched). Defaults to $SFST_ENGINE (scalar).
+    The batched engine only implements formulation="radius" without sensitivities.
+    jobs > 1 (default $SFST_JOBS) fans the stars out over worker processes (_solve_case_points).
+    """
+    engine = engine or DEFAULT_ENGINE
+    jobs = DEFAULT_JOBS if jobs is None else jobs
+    if jobs > 1:
+        n = len(rho_cs)
+        cols = {k: np.broadcast_to(np.asarray(star_kw.pop(k)), (n,))
+                for k in ("sigma_vac", "chi_vac", "screening_factor", "include_in_gravity")}
+        cases = {i: {k: cols[k][i].item() for k in cols} for i in range(n)}
+        return _solve_case_points(eos, cases, [(i, float(rc)) for i, rc in enumerate(rho_cs)],
+                                  engine=engine, jobs=jobs, **star_kw)
+    if engine == "batched":
+        if star_kw.pop("formulation", "radius") != "radius":
+            raise ValueError("engine='batched' only supports formulation='radius'")
+        if star_kw.pop("sensitivities", False):
+            raise ValueError("engine='batched' does not integrate sensitivities; use engine='scalar'")
+        return integrate_stars_batched(eos, rho_cs, **star_kw)
+    if engine != "scalar":
+        raise ValueError(f"unknown engine {engine!r} (expected 'scalar' or 'batched')")
+    return [integrate_star(eos, float(rc), **star_kw) for rc in rho_cs]
+
+def _scan_needs(df: pd.DataFrame, target_M: float):
+    """Which tails of a ρ_c ladder still need stars: (need_lower, need_upper).
+
+    The lower tail is needed while target_M lies below the lightest star; the upper tail while
+    the heaviest star sits at the high-ρ_c end (M_max not yet bracketed by a turnover).
+    """
+    if len(df) < 4:
+        return True, True
+    M = df.sort_values("rho_c").M_msun.to_numpy()
+    M = M[np.isfinite(M)]
+    if len(M) < 4:
+        return True, True
+    return bool(target_M < M.min()), int(np.argmax(M)) == len(M) - 1
+
 def adaptive_scan_for_target(eos: EOS, target_M: float, *, sigma_vac: float, chi_vac: float, screening_factor: float,
                              include_in_gravity: bool, n_points: int, log10_rho_min: float = 14.2, log10_rho_max: float = 15.9,
-                             max_expansions: int = 6):
-    """Scan central densities and (if needed) expand the range until the sequence brackets target_M.
-    Returns dataframe and a small dict with bracketing diagnostics.
+                             max_expansions: int = 6, engine: str | None = None, formulation: str = "radius",
+                             **solver_kw):
+    """Scan central densities and (if needed) expand the range until the sequence brackets target_M and M_max.
+    Returns dataframe and a small dict with bracketing diagnostics. solver_kw (rtol, atol, max_step, ...)
+    is passed through to the star integrator.
+
+    The initial ladder is solved once. Each expansion widens only the tail(s) still needed by
+    0.15 dex (clamped to [13.8, 16.2]) and solves just the new stars, on the ladder's own log
+    spacing, re-checking the bracket after every star so the scan stops as soon as it is complete.
     """
-    diag = {"bracketed": False, "log10_rho_min": log10_rho_min, "log10_rho_max": log10_rho_max, "expansions": 0}
-    for _ in range(max_expansions):
-        rhos = np.logspace(log10_rho_min, log10_rho_max, n_points)
-        rows=[]
-        for rc in rhos:
-            res = integrate_star(eos, rc, sigma_vac=sigma_vac, chi_vac=chi_vac,
-                                 screening_factor=screening_factor, include_in_gravity=include_in_gravity)
-            if res is not None:
-                rows.append(res)
-        df = pd.DataFrame(rows)
+    case = dict(sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor,
+                include_in_gravity=include_in_gravity)
+    return adaptive_scan_cases(eos, target_M, {None: case}, n_points=n_points, log10_rho_min=log10_rho_min,
+                               log10_rho_max=log10_rho_max, max_expansions=max_expansions, engine=engine,
+                               formulation=formulation, **solver_kw)[None]
+
+_POOLS: dict = {}
+
+def _process_pool(jobs: int):
+    """Process-wide ProcessPoolExecutor with `jobs` workers (created on first use)."""
+    from concurrent.futures import ProcessPoolExecutor
+    if jobs not in _POOLS:
+        _POOLS[jobs] = ProcessPoolExecutor(max_workers=jobs)
+    return _POOLS[jobs]
+
+def _star_cost(rho_c_cgs: float) -> float:
+    """Relative cost of one star for chunking: the RK45 step count is roughly flat below
+    ~1e15 g/cm^3 and grows towards the high-ρ_c (stiff, compact) end of the ladder."""
+    return 1.0 + max(0.0, math.log10(rho_c_cgs) - 15.0)
+
+def _cost_chunks(costs, n_chunks: int):
+    """Partition indices into n_chunks of similar total cost (greedy, most expensive star first)."""
+    import heapq
+    loads = [(0.0, j) for j in range(n_chunks)]
+    chunks = [[] for _ in range(n_chunks)]
+    for i in sorted(range(len(costs)), key=lambda i: -costs[i]):
+        load, j = heapq.heappop(loads)
+        chunks[j].append(i)
+        heapq.heappush(loads, (load + costs[i], j))
+    return [sorted(c) for c in chunks if c]
+
+def _solve_chunk(limits, eos: EOS, cases: dict, points, engine: str, star_kw: dict, profiles: str | None = None):
+    """Worker side of _solve_case_points: one chunk under what was left of the caller's budget,
+    streaming into the caller's profile store (directory `profiles`), if any."""
+    # A forked worker inherits whatever budget block was open when the pool started; that one is not ours.
+    _BUDGET.set(None)
+    if profiles is None:
+        _PROFILE_SINK.set(False)
+    else:
+        from profile_store import open_store
+        _PROFILE_SINK.set(open_store(profiles))
+    if limits is None:
+        return _solve_case_points(eos, cases, points, engine=engine, jobs=1, **star_kw), 0, 0, []
+    with budget(**limits) as rep:
+        records = _solve_case_points(eos, cases, points, engine=engine, jobs=1, **star_kw)
+    return records, rep.rhs_evals, rep.stars_exceeded, sorted(rep.star_resources)
+
+def _solve_case_points(eos: EOS, cases: dict, points, *, engine: str | None, jobs: int | None = None, **star_kw):
+    """Solve (case label, ρ_c) points in one solve_ladder call; per-star case parameters are passed
+    as arrays, so the batched engine carries one state block per (case, ρ_c) in a single lockstep
+    integration. Returns the records aligned with `points`.
+
+    With jobs > 1 (default $SFST_JOBS) the points are split into 2*jobs chunks of similar
+    estimated cost (_star_cost) and solved in worker processes; the records are put back in
+    `points` order, so the result does not depend on jobs or on completion order. Each chunk
+    runs under what is left of the caller's `budget`, and its usage is charged back to it.
+    Workers stream into the caller's profile_sink store; all stars share it.
+    """
+    if not points:
+        return []
+    engine = engine or DEFAULT_ENGINE
+    jobs = DEFAULT_JOBS if jobs is None else jobs
+    if jobs > 1 and len(points) > 1:
+        chunks = _cost_chunks([_star_cost(rc) for _, rc in points], min(len(points), 2 * jobs))
+        pool = _process_pool(jobs)
+        rep = _BUDGET.get()
+        limits = rep.remaining() if rep is not None else None
+        store = _profile_store()
+        profiles = str(store.path) if store is not None else None
+        futures = [pool.submit(_solve_chunk, limits, eos, {c: cases[c] for c in {points[i][0] for i in ch}},
+                               [points[i] for i in ch], engine, star_kw, profiles) for ch in chunks]
+        records = [None] * len(points)
+        for ch, fut in zip(chunks, futures):
+            recs, n_evals, n_exceeded, resources = fut.result()
+            if rep is not None:
+                rep.note_star_exceeded(n_exceeded, resources)
+                rep.charge(n_evals)
+            for i, rec in zip(ch, recs):
+                records[i] = rec
+        return records
+    rho = np.array([rc for _, rc in points], dtype=float)
+    if engine == "batched":
+        per_star = {k: np.array([cases[c][k] for c, _ in points])
+                    for k in ("sigma_vac", "chi_vac", "screening_factor", "include_in_gravity")}
+        return solve_ladder(eos, rho, engine="batched", jobs=1, **per_star, **star_kw)
+    if engine != "scalar":
+        raise ValueError(f"unknown engine {engine!r} (expected 'scalar' or 'batched')")
+    return [integrate_star(eos, float(rc), **cases[c], **star_kw) for c, rc in points]
+
+def solve_cases(eos: EOS, cases: dict, rho_cs, *, engine: str | None = None, jobs: int | None = None, **star_kw):
+    """Solve the same ρ_c ladder for several cases of one EOS in one solver call.
+
+    cases maps a label to dict(sigma_vac, chi_vac, screening_factor, include_in_gravity); all
+    (case, ρ_c) stars go through _solve_case_points (one lockstep batch with engine="batched").
+    Returns {label: [record or None per ρ_c]}, identical to one solve_ladder call per case.
+    """
+    points = [(c, float(rc)) for c in cases for rc in rho_cs]
+    recs = iter(_solve_case_points(eos, cases, points, engine=engine, jobs=jobs, **star_kw))
+    return {c: [next(recs) for _ in rho_cs] for c in cases}
+
+def adaptive_scan_cases(eos: EOS, target_M: float, cases: dict, *, n_points: int, log10_rho_min: float = 14.2,
+                        log10_rho_max: float = 15.9, max_expansions: int = 6, engine: str | None = None,
+                        formulation: str = "radius", **solver_kw):
+    """adaptive_scan_for_target for several cases of one EOS at once.
+
+    cases maps a label to dict(sigma_vac, chi_vac, screening_factor, include_in_gravity). Every
+    initial ladder and every expansion star of all cases go through one solver call per pass
+    (_solve_case_points), so with engine="batched" the four canonical cases share one lockstep
+    integration and its vectorized EOS lookups. Per case the stars, the bracketing logic and the
+    diagnostics are exactly those of adaptive_scan_for_target. Returns {label: (df, diag)}.
+    """
+    x0 = log10_rho_min
+    step = (log10_rho_max - log10_rho_min) / max(n_points - 1, 1)
+    star_kw = dict(formulation=formulation, **solver_kw)
+    st = {c: {"stars": {}, "k_lo": 0, "k_hi": n_points - 1, "lo": log10_rho_min, "hi": log10_rho_max,
+              "diag": {"bracketed": False, "mmax_bracketed": False, "log10_rho_min": log10_rho_min,
+                       "log10_rho_max": log10_rho_max, "expansions": 0, "n_integrations": 0}}
+          for c in cases}
+
+    def solve(ks_by_case):
+        # ks_by_case: {label: [ladder index k, ...]}, log10 ρ_c = x0 + k*step
+        points = [(c, k) for c, ks in ks_by_case.items() for k in ks]
+        recs = _solve_case_points(eos, cases, [(c, 10.0**(x0 + step*k)) for c, k in points],
+                                  engine=engine, **star_kw)
+        for (c, k), res in zip(points, recs):
+            st[c]["stars"][k] = res
+            st[c]["diag"]["n_integrations"] += 1
+        for c in ks_by_case:
+            s_ = st[c]
+            s_["df"] = pd.DataFrame([s_["stars"][k] for k in sorted(s_["stars"]) if s_["stars"][k] is not None])
+            s_["need_lo"], s_["need_hi"] = _scan_needs(s_["df"], target_M)
+
+    solve({c: list(range(n_points)) for c in cases})
+    while True:
+        # Widen the needed tails of every case that can still expand (same rule as the single-case scan).
+        growing = []
+        for c, s_ in st.items():
+            if not (s_["need_lo"] or s_["need_hi"]) or s_["diag"]["expansions"] >= max_expansions - 1:
+                continue
+            lo = max(13.8, s_["lo"] - 0.15) if s_["need_lo"] else s_["lo"]
+            hi = min(16.2, s_["hi"] + 0.15) if s_["need_hi"] else s_["hi"]
+            if (lo, hi) == (s_["lo"], s_["hi"]):
+                continue  # the needed tails are already at the clamp
+            s_["lo"], s_["hi"] = lo, hi
+            s_["diag"]["expansions"] += 1
+            growing.append(c)
+        if not growing:
+            break
+        # Grow outwards one star per case and pass; a tail stops as soon as it is no longer needed.
+        for side in ("lo", "hi"):
+            while True:
+                batch = {}
+                for c in growing:
+                    s_ = st[c]
+                    if side == "lo" and s_["need_lo"] and x0 + step*(s_["k_lo"] - 1) >= s_["lo"] - 1e-9:
+                        s_["k_lo"] -= 1
+                        batch[c] = [s_["k_lo"]]
+                    elif side == "hi" and s_["need_hi"] and x0 + step*(s_["k_hi"] + 1) <= s_["hi"] + 1e-9:
+                        s_["k_hi"] += 1
+                        batch[c] = [s_["k_hi"]]
+                if not batch:
+                    break
+                solve(batch)
+
+    out = {}
+    for c, s_ in st.items():
+        df, diag = s_["df"], s_["diag"]
         if len(df) >= 4:
             mmin, mmax = df.M_msun.min(), df.M_msun.max()
-            if (mmin <= target_M <= mmax) and np.isfinite(mmin) and np.isfinite(mmax):
-                diag["bracketed"] = True
-                break
-        # expand range: lower slightly and raise upper
-        log10_rho_min = max(13.8, log10_rho_min - 0.15)
-        log10_rho_max = min(16.2, log10_rho_max + 0.15)
-        diag["expansions"] += 1
-    diag["log10_rho_min"] = log10_rho_min
-    diag["log10_rho_max"] = log10_rho_max
-    return df, diag
+            diag["bracketed"] = bool(np.isfinite(mmin) and np.isfinite(mmax) and mmin <= target_M <= mmax)
+            diag["mmax_bracketed"] = not s_["need_hi"]
+        diag["log10_rho_min"] = s_["lo"]
+        diag["log10_rho_max"] = s_["hi"]
+        out[c] = (df, diag)
+    return out
 
 def scan_eos(eos: EOS, *, sigma_vac: float, chi_vac: float, screening_factor: float,
             include_in_gravity: bool, n_points: int = (10 if FAST_CI else 18),
-            target_M: float = 1.4):
+            target_M: float = 1.4, engine: str | None = None, formulation: str = "radius", jobs: int | None = None):
     """Generate an M–R–Λ sequence by scanning central density.
 
     Key fix (reviewer-critical): I adaptively expand the density range until the sequence brackets `target_M`,
@@ -275,11 +1750,25 @@ def scan_eos(eos: EOS, *, sigma_vac: float, chi_vac: float, screening_factor: fl
         eos, target_M,
         sigma_vac=sigma_vac, chi_vac=chi_vac,
         screening_factor=screening_factor, include_in_gravity=include_in_gravity,
-        n_points=n_points
+        n_points=n_points, engine=engine, formulation=formulation, jobs=jobs
     )
     df.attrs["scan_diag"] = diag
     return df
 
+def scan_eos_cases(eos: EOS, cases: dict, *, n_points: int = (10 if FAST_CI else 18), target_M: float = 1.4,
+                   engine: str | None = None, formulation: str = "radius", jobs: int | None = None):
+    """scan_eos for several cases of one EOS in shared integrations (see adaptive_scan_cases).
+
+    cases maps a label to dict(sigma_vac, chi_vac, screening_factor, include_in_gravity); returns
+    {label: df} with df.attrs["scan_diag"] set, identical to calling scan_eos per case.
+    """
+    out = {}
+    for label, (df, diag) in adaptive_scan_cases(eos, target_M, cases, n_points=n_points, engine=engine,
+                                                 formulation=formulation, jobs=jobs).items():
+        df.attrs["scan_diag"] = diag
+        out[label] = df
+    return out
+
 def interp_at_mass(df: pd.DataFrame, target: float = 1.4):
     """Interpolate R and Λ at a target mass.
 
@@ -329,26 +1818,165 @@ def interp_at_mass(df: pd.DataFrame, target: float = 1.4):
     L = np.interp(target, d.M_msun.values, d.Lambda.values)
     return float(R), float(L), "ok"
 
-def run_canonical(outdir: str = "outputs", *, sigma_legacy: float = 0.0, chi_legacy: float = 0.0, sigma_vac: float = 0.0, chi_vac: float = 0.0, screening_factor: float = 1.0, include_in_gravity: bool = False):
+def headline_observables(eos: EOS, *, sigma_vac: float, chi_vac: float, screening_factor: float,
+                         include_in_gravity: bool, target_M: float = 1.4, n_coarse: int = 5,
+                         log10_rho_min: float = 14.2, log10_rho_max: float = 15.9,
+                         xtol_mmax: float = 1e-2, xtol_target: float = 1e-6,
+                         engine: str | None = None, formulation: str = "radius", **solver_kw):
+    """M_max and R, Λ at target_M by root finding in log10 ρ_c instead of a dense scan.
+
+    A coarse ladder (adaptive_scan_for_target with n_coarse points) brackets the turnover and the
+    target mass. M_max then comes from a bounded Brent (golden-section/parabolic) search around the
+    coarse maximum, and the target star from brentq on M(ρ_c) - target_M over the first crossing on
+    the stable branch, so R and Λ are those of an integrated star (no interpolation bias).
+
+    Returns (obs, df): obs holds Mmax, R_Mmax, rho_c_Mmax, R_target, Lambda_target, rho_c_target,
+    status, mmax_bracketed and n_integrations; df has one row per integrated star, sorted by ρ_c.
+    """
+    from scipy.optimize import brentq, minimize_scalar
+
+    coarse, diag = adaptive_scan_for_target(
+        eos, target_M, sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor,
+        include_in_gravity=include_in_gravity, n_points=n_coarse, log10_rho_min=log10_rho_min,
+        log10_rho_max=log10_rho_max, engine=engine, formulation=formulation, **solver_kw)
+    stars = {float(np.log10(rec["rho_c"])): rec for rec in coarse.to_dict("records")}
+    n_extra = 0
+
+    def star(x):
+        nonlocal n_extra
+        x = float(x)
+        if x not in stars:
+            stars[x] = solve_ladder(eos, [10.0**x], engine=engine, sigma_vac=sigma_vac, chi_vac=chi_vac,
+                                    screening_factor=screening_factor, include_in_gravity=include_in_gravity,
+                                    formulation=formulation, **solver_kw)[0]
+            n_extra += 1
+        return stars[x]
+
+    def mass(x):
+        rec = star(x)
+        return rec["M_msun"] if rec is not None and np.isfinite(rec["M_msun"]) else float("nan")
+
+    nan = float("nan")
+    obs = {"Mmax": nan, "R_Mmax": nan, "rho_c_Mmax": nan, "R_target": nan, "Lambda_target": nan,
+           "rho_c_target": nan, "status": "insufficient_points", "mmax_bracketed": bool(diag["mmax_bracketed"])}
+    xs = sorted(x for x, rec in stars.items() if rec is not None and np.isfinite(rec["M_msun"]))
+    if len(xs) >= 4:
+        Ms = [stars[x]["M_msun"] for x in xs]
+        i = int(np.argmax(Ms))
+        if 0 < i < len(xs) - 1:
+            minimize_scalar(lambda x: -np.nan_to_num(mass(x), nan=0.0), bounds=(xs[i-1], xs[i+1]),
+                            method="bounded", options={"xatol": xtol_mmax})
+        # Best star seen near the turnover (the optimizer's own iterates are all in `stars`).
+        x_pk = max((x for x, rec in stars.items() if rec is not None and np.isfinite(rec["M_msun"])),
+                   key=lambda x: stars[x]["M_msun"])
+        pk = stars[x_pk]
+        obs.update(Mmax=float(pk["M_msun"]), R_Mmax=float(pk["R_km"]), rho_c_Mmax=float(pk["rho_c"]))
+
+        # Stable branch: everything below the turnover; first crossing of target_M.
+        xb = sorted(x for x, rec in stars.items() if x <= x_pk and rec is not None and np.isfinite(rec["M_msun"]))
+        Mb = [stars[x]["M_msun"] for x in xb]
+        obs["status"] = f"target_out_of_range: [{min(Mb):.3f},{max(Mb):.3f}]"
+        for a, b, Ma, Mbb in zip(xb[:-1], xb[1:], Mb[:-1], Mb[1:]):
+            if Ma <= target_M <= Mbb:
+                if Ma == target_M or Mbb == target_M:
+                    x_t = a if Ma == target_M else b
+                else:
+                    x_t = brentq(lambda x: mass(x) - target_M, a, b, xtol=xtol_target)
+                rec = star(x_t)
+                if rec is not None:
+                    obs.update(R_target=float(rec["R_km"]), Lambda_target=float(rec["Lambda"]),
+                               rho_c_target=float(rec["rho_c"]), status="ok")
+                break
+    obs["n_integrations"] = diag["n_integrations"] + n_extra
+    df = pd.DataFrame([stars[x] for x in sorted(stars) if stars[x] is not None])
+    df.attrs["scan_diag"] = {**diag, "n_integrations": obs["n_integrations"]}
+    return obs, df
+
+def tangent_sensitivities(df: pd.DataFrame, target_M: float = 1.4):
+    """Coefficients of Δobs = α σ + β σ² for M_max, R(target_M) and Λ(target_M) from one sequence.
+
+    df is a ρ_c ladder integrated with sensitivities=True (columns dM_dsigma, d2M_dsigma2, ...,
+    all at fixed ρ_c). The fixed-ρ_c derivatives are converted with cubic splines in log10 ρ_c:
+    at fixed mass via the implicit function theorem on M(ρ_c, σ) = target_M, and for M_max via
+    the envelope theorem at the turnover. Λ is handled as ln Λ. Returns {obs: {"value", "alpha",
+    "beta"}} for obs in Mmax, R_target, Lambda_target, with α = dobs/dσ and β = ½ d²obs/dσ² at
+    the sequence's σ (an observable is omitted when its turnover/crossing is not bracketed).
+    """
+    from scipy.interpolate import CubicSpline
+    from scipy.optimize import brentq
+
+    d = df[np.isfinite(df["M_msun"])].sort_values("rho_c")
+    if len(d) < 5:
+        raise ValueError("need at least 5 stars for the spline conversion")
+    x = np.log10(d["rho_c"].to_numpy())
+    lnL = np.log(d["Lambda"].to_numpy())
+    L1 = d["dLambda_dsigma"].to_numpy() / d["Lambda"].to_numpy()
+    L2 = d["d2Lambda_dsigma2"].to_numpy() / d["Lambda"].to_numpy() - L1**2
+    sp = {
+        "M": [CubicSpline(x, d[c].to_numpy()) for c in ("M_msun", "dM_dsigma", "d2M_dsigma2")],
+        "R": [CubicSpline(x, d[c].to_numpy()) for c in ("R_km", "dR_dsigma", "d2R_dsigma2")],
+        "lnL": [CubicSpline(x, v) for v in (lnL, L1, L2)],
+    }
+    M0, M1, M2 = sp["M"]
+    out = {}
+
+    # M_max: dMmax/dσ = M1, d²Mmax/dσ² = M2 - (∂x M1)² / ∂xx M0 at the turnover.
+    i = int(np.argmax(d["M_msun"].to_numpy()))
+    x_pk = x[i]
+    if 0 < i < len(x) - 1:
+        x_pk = brentq(M0.derivative(), x[i-1], x[i+1]) if M0(x[i-1], 1) * M0(x[i+1], 1) < 0 else x[i]
+        out["Mmax"] = {"value": float(M0(x_pk)), "alpha": float(M1(x_pk)),
+                       "beta": 0.5*float(M2(x_pk) - M1(x_pk, 1)**2 / M0(x_pk, 2))}
+
+    # Fixed mass on the stable branch: x*(σ) = x0 + a σ + b σ² with M(x*(σ), σ) = target_M.
+    xs = x[x <= x_pk]
+    Ms = M0(xs)
+    j = np.nonzero((Ms[:-1] - target_M) * (Ms[1:] - target_M) <= 0)[0]
+    if len(j):
+        x0 = brentq(lambda t: M0(t) - target_M, xs[j[0]], xs[j[0]+1])
+        a = -M1(x0) / M0(x0, 1)
+        b = -(0.5*M0(x0, 2)*a*a + M1(x0, 1)*a + 0.5*M2(x0)) / M0(x0, 1)
+        coef = {}
+        for key, (Q0, Q1, Q2) in (("R", sp["R"]), ("lnL", sp["lnL"])):
+            alpha = Q0(x0, 1)*a + Q1(x0)
+            beta = Q0(x0, 1)*b + 0.5*Q0(x0, 2)*a*a + Q1(x0, 1)*a + 0.5*Q2(x0)
+            coef[key] = (float(Q0(x0)), float(alpha), float(beta))
+        out["R_target"] = dict(zip(("value", "alpha", "beta"), coef["R"]))
+        lam, qa, qb = math.exp(coef["lnL"][0]), coef["lnL"][1], coef["lnL"][2]
+        out["Lambda_target"] = {"value": lam, "alpha": lam*qa, "beta": lam*(qb + 0.5*qa*qa)}
+    return out
+
+def run_canonical(outdir: str = "outputs", *, sigma_legacy: float = 0.0, chi_legacy: float = 0.0, sigma_vac: float = 0.0, chi_vac: float = 0.0, screening_factor: float = 1.0, include_in_gravity: bool = False, engine: str | None = None, mode: str | None = None, jobs: int | None = None, eos_list: list | None = None, cases: dict | None = None, n_points: int | None = None, target_M: float = 1.4):
+    """Canonical EOS x case runs. mode="scan" (default, $SFST_MODE) interpolates on a ρ_c ladder;
+    mode="root" computes the headline observables with headline_observables (mr_lambda.csv then
+    holds only the stars that root finding integrated). jobs > 1 (default $SFST_JOBS) solves the
+    stars in worker processes; the outputs are the same as with jobs=1.
+    eos_list (EOS objects, default every CANONICAL_EOS) and cases ({label: dict(sigma_vac, chi_vac,
+    screening_factor, include_in_gravity)}, default A-D built from the σ/χ arguments) override the
+    sets; scripts/run_canonical_runs.py takes both from config/scan_manifest.yaml."""
     import pathlib, matplotlib.pyplot as plt
+    mode = mode or DEFAULT_MODE
+    if mode not in ("scan", "root"):
+        raise ValueError(f"unknown mode {mode!r} (expected 'scan' or 'root')")
     outpath = pathlib.Path(outdir)
     outpath.mkdir(parents=True, exist_ok=True)
 
-    eos_list = [
-        # Realistic piecewise-polytrope parameterizations (Read et al. 2009; see ppeos_tables reference in Appendix A).
-        make_piecewise_eos(34.384, 3.005, 2.988, 2.851, "SLy-PP(Read2009)"),
-        make_piecewise_eos(34.269, 2.830, 3.445, 3.348, "AP4-PP(Read2009)"),
-        make_piecewise_eos(34.669, 2.909, 2.246, 2.144, "H4-PP(Read2009)"),
-        make_piecewise_eos(34.495, 2.921, 3.132, 2.995, "MPA1-PP(Read2009)"),
-        make_piecewise_eos(34.031, 2.628, 2.885, 2.951, "WFF1-PP(Read2009)"),
-        # Toy EOS for diagnostics / coverage
-        make_polytrope_eos(K=3.0e5, Gamma=2.0, name="Poly2(toy)"),
-    ]
-
+    if eos_list is None:
+        eos_list = [canonical_eos(name) for name in CANONICAL_EOS]
+    if cases is None:
+        cases = {label: dict(sigma_vac=s, chi_vac=ch, screening_factor=screening_factor, include_in_gravity=inc_g)
+                 for label, (s, ch, inc_g) in [("A_baseline", (0.0, 0.0, False)), ("B_legacy", (sigma_legacy, chi_legacy, False)), ("C_sigma_chi", (sigma_vac, chi_vac, False)), ("D_sigma_chi_gravity", (sigma_vac, chi_vac, True))]}
+    scan_kw = {} if n_points is None else {"n_points": n_points}
     summary=[]
     for eos in eos_list:
-        for label, (s, ch, inc_g) in [("A_baseline", (0.0, 0.0, False)), ("B_legacy", (sigma_legacy, chi_legacy, False)), ("C_sigma_chi", (sigma_vac, chi_vac, False)), ("D_sigma_chi_gravity", (sigma_vac, chi_vac, True))]:
-            df = scan_eos(eos, sigma_vac=s, chi_vac=ch, screening_factor=screening_factor, include_in_gravity=inc_g)
+        if mode == "scan":
+            # All four cases in shared integrations (one lockstep batch per pass with engine="batched").
+            scans = scan_eos_cases(eos, cases, target_M=target_M, engine=engine, jobs=jobs, **scan_kw)
+        for label, case in cases.items():
+            if mode == "root":
+                obs, df = headline_observables(eos, **case, target_M=target_M, engine=engine, jobs=jobs)
+            else:
+                df = scans[label]
             run_dir = outpath/eos.name/label
             run_dir.mkdir(parents=True, exist_ok=True)
             df.to_csv(run_dir/"mr_lambda.csv", index=False)
@@ -362,17 +1990,28 @@ def run_canonical(outdir: str = "outputs", *, sigma_legacy: float = 0.0, chi_leg
             plt.savefig(run_dir/"mr.png", dpi=150)
             plt.close()
 
-            Mmax=float(df.M_msun.max())
-            Rmax=float(df.loc[df.M_msun.idxmax(),"R_km"])
-            Wmax=float(df.loc[df.M_msun.idxmax(),"W_max"]) if "W_max" in df.columns else float("nan")
-            R14,L14,status14 = interp_at_mass(df,1.4)
-            scan_diag = getattr(df, "attrs", {}).get("scan_diag", {})
-            summary.append({"EOS":eos.name,"case":label,"sigma_vac":s, "chi_vac":ch, "inc_g":inc_g, "screening_factor":screening_factor,"Mmax":Mmax,"R_Mmax":Rmax,"R_1.4":R14,"Lambda_1.4":L14,"W_max":Wmax,"status_1.4":status14,"scan_bracketed":scan_diag.get("bracketed",None),"scan_log10_rho_min":scan_diag.get("log10_rho_min",None),"scan_log10_rho_max":scan_diag.get("log10_rho_max",None),"scan_expansions":scan_diag.get("expansions",None)})
+            summary.append(canonical_summary_row(eos.name, label, case, df, obs=obs if mode == "root" else None))
 
     summary_df = pd.DataFrame(summary)
     summary_df.to_csv(outpath/"summary_canonical_runs.csv", index=False)
+    canonical_sensitivities(summary_df).to_csv(outpath/"sensitivities_from_canonical.csv", index=False)
+
+    return summary_df
 
-    # sensitivities from baseline -> sigma_chi (finite difference per Δsigma, holding chi fixed)
+def canonical_summary_row(eos_name: str, label: str, case: dict, df: pd.DataFrame, *, obs: dict | None = None) -> dict:
+    """One summary_canonical_runs.csv row; obs is the headline_observables dict in root mode."""
+    Mmax=float(df.M_msun.max())
+    Rmax=float(df.loc[df.M_msun.idxmax(),"R_km"])
+    Wmax=float(df.loc[df.M_msun.idxmax(),"W_max"]) if "W_max" in df.columns else float("nan")
+    if obs is not None:
+        R14,L14,status14 = obs["R_target"],obs["Lambda_target"],obs["status"]
+    else:
+        R14,L14,status14 = interp_at_mass(df,1.4)
+    scan_diag = getattr(df, "attrs", {}).get("scan_diag", {})
+    return {"EOS":eos_name,"case":label,"sigma_vac":case["sigma_vac"], "chi_vac":case["chi_vac"], "inc_g":case["include_in_gravity"], "screening_factor":case["screening_factor"],"Mmax":Mmax,"R_Mmax":Rmax,"R_1.4":R14,"Lambda_1.4":L14,"W_max":Wmax,"status_1.4":status14,"scan_bracketed":scan_diag.get("bracketed",None),"scan_log10_rho_min":scan_diag.get("log10_rho_min",None),"scan_log10_rho_max":scan_diag.get("log10_rho_max",None),"scan_expansions":scan_diag.get("expansions",None),"scan_mmax_bracketed":scan_diag.get("mmax_bracketed",None),"scan_n_integrations":scan_diag.get("n_integrations",None)}
+
+def canonical_sensitivities(summary_df: pd.DataFrame) -> pd.DataFrame:
+    """sensitivities_from_canonical.csv: baseline -> sigma_chi finite difference per Δsigma, holding chi fixed."""
     sens=[]
     for eosname in summary_df.EOS.unique():
         sub=summary_df[summary_df.EOS==eosname].set_index("case")
@@ -383,29 +2022,30 @@ def run_canonical(outdir: str = "outputs", *, sigma_legacy: float = 0.0, chi_leg
                 c=sub.loc["C_sigma_chi",obs]
                 if np.isfinite(a) and np.isfinite(c) and d!=0:
                     sens.append({"EOS":eosname,"obs":obs,"S_obs_per_sigma":float((c-a)/d),"sigma_span":d})
-    pd.DataFrame(sens).to_csv(outpath/"sensitivities_from_canonical.csv", index=False)
-
-    return summary_df
+    return pd.DataFrame(sens)
 
 # --- Diagnostics helpers (used for CI artefacts and reviewer plots) ---
 class solve_star:
     @staticmethod
     def scan_family(eos, *, sigma_vac, chi_vac, screening_factor, include_in_gravity,
-                    n_points=None, rtol=1e-8, atol=1e-10, store_profiles=False):
+                    n_points=None, rtol=1e-8, atol=1e-10, max_step=5e4, log10_rho_min=14.2, log10_rho_max=15.6,
+                    store_profiles=False, engine=None, formulation="radius", sensitivities=False, jobs=None):
         """Scan a central-density ladder to build a mass-radius family.
-        If store_profiles=True, returns a list of dict profiles in attribute _profiles on the returned DataFrame.
+        If store_profiles=True, returns the LazyProfile of every star in attribute _profiles on the returned
+        DataFrame; a profile is only integrated and held in memory once it is accessed.
         """
         import numpy as _np
         import pandas as _pd
         # Use same ladder as scan_eos but with optional n_points override
         if n_points is None:
             n_points = 10 if FAST_CI else 18
-        rho_cs = _np.logspace(14.2, 15.6, n_points)  # in g/cm^3 scale proxy
+        rho_cs = _np.logspace(log10_rho_min, log10_rho_max, n_points)  # in g/cm^3 scale proxy
         rows=[]
         profiles=[]
-        for rho_c in rho_cs:
-            res = integrate_star(eos, rho_c, sigma_vac=sigma_vac, chi_vac=chi_vac, screening_factor=screening_factor,
-                                    include_in_gravity=include_in_gravity, rtol=rtol, atol=atol, store_profile=store_profiles)
+        for res in solve_ladder(eos, rho_cs, engine=engine, sigma_vac=sigma_vac, chi_vac=chi_vac,
+                                screening_factor=screening_factor, include_in_gravity=include_in_gravity,
+                                rtol=rtol, atol=atol, max_step=max_step, store_profile=store_profiles, formulation=formulation,
+                                sensitivities=sensitivities, jobs=jobs):
             rows.append(res)
             if store_profiles:
                 profiles.append(res.get('profile'))
@@ -0,0 +1,41 @@
+"""Tests for the lockstep batched integrator (sfst_qfis_repro.integrate_stars_batched).
+
+The batched and per-star engines use their own step sequences, so they agree to integrator
+tolerance rather than bitwise; these bounds are the ones the README states.
+
+    python -m pytest -q tests/test_batched_engine.py
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import sfst_qfis_repro as sq  # noqa: E402
+
+# Relative bounds at the default rtol=3e-6 (observed on SLy: M, R <~1e-6 and Λ <~2e-4).
+BOUNDS = {"M_msun": 1e-5, "R_km": 1e-5, "Lambda": 1e-3}
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(sq, "DEFAULT_CACHE", "")
+
+
+@pytest.mark.parametrize("sigma, include_in_gravity", [(0.0, False), (0.06, True)])
+def test_batched_matches_scalar_on_a_ladder(sigma, include_in_gravity):
+    eos = sq.canonical_eos("SLy")
+    rho_cs = np.logspace(14.3, 15.5, 12)
+    kw = dict(sigma_vac=sigma, chi_vac=1.0, screening_factor=1.0, include_in_gravity=include_in_gravity)
+    batched = sq.integrate_stars_batched(eos, rho_cs, **kw)
+    scalar = [sq.integrate_star(eos, rho_c, **kw) for rho_c in rho_cs]
+
+    assert all(rec is not None for rec in batched + scalar)
+    for b, s in zip(batched, scalar):
+        assert b.keys() == s.keys()
+        for field, bound in BOUNDS.items():
+            assert abs(b[field] - s[field]) <= bound * abs(s[field]), (s["rho_c"], field, b[field], s[field])
@@ -0,0 +1,62 @@
+"""Tests for store_profile=True (sfst_qfis_repro.LazyProfile).
+
+The solve itself builds no profile and goes through the StarCache; the profile is integrated on
+first access and equals the one the star's own run would have built.
+
+    python -m pytest -q tests/test_lazy_profile.py
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import sfst_qfis_repro as sq  # noqa: E402
+
+KW = dict(sigma_vac=0.06, chi_vac=1.0, screening_factor=1.0, include_in_gravity=True)
+NUMERICS = dict(r0=1e-3, rmax=3e6, max_step=5e4, rtol=3e-6, atol=1e-9)
+
+
+@pytest.fixture
+def profiles_built(tmp_path, monkeypatch):
+    monkeypatch.setattr(sq, "DEFAULT_CACHE", str(tmp_path / "cache"))
+    built = []
+    star_record = sq._star_record
+
+    def spy(*args, r_prof=None, **kw):
+        built.append(r_prof is not None)
+        return star_record(*args, r_prof=r_prof, **kw)
+
+    monkeypatch.setattr(sq, "_star_record", spy)
+    return built
+
+
+def test_scalar_profile_is_lazy_and_cached(profiles_built):
+    eos = sq.canonical_eos("SLy")
+    rec = sq.integrate_star(eos, 1e15, store_profile=True, **KW)
+    assert profiles_built == [False]
+    assert sq.integrate_star(eos, 1e15, store_profile=True, **KW)["M_msun"] == rec["M_msun"]
+    assert profiles_built == [False]  # second call served from the StarCache
+
+    eager = sq._integrate_star(eos, 1e15, store_profile=True, formulation="radius", sensitivities=False,
+                               **KW, **NUMERICS)
+    assert np.array_equal(rec["profile"].array, eager["profile"])
+    assert rec["M_msun"] == eager["M_msun"]
+
+
+def test_batched_profile_is_lazy_and_cached(profiles_built):
+    eos = sq.canonical_eos("SLy")
+    rho_cs = [1e15, 1.2e15]
+    recs = sq.integrate_stars_batched(eos, rho_cs, store_profile=True, **KW)
+    assert profiles_built == [False, False]
+    sq.integrate_stars_batched(eos, rho_cs, store_profile=True, **KW)
+    assert profiles_built == [False, False]
+
+    arr = {k: np.array([v]) for k, v in KW.items()}
+    eager = sq._integrate_stars_batched(eos, [rho_cs[1]], store_profile=True, **arr, **NUMERICS)[0]
+    assert np.array_equal(recs[1]["profile"].array, eager["profile"])
+    assert recs[1]["M_msun"] == eager["M_msun"]
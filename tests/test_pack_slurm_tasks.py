@@ -0,0 +1,52 @@
+"""Tests for scripts/pack_slurm_tasks.py.
+
+compute_tov_case is replaced by a stub, so a plan is packed and run-pack writes its run
+directories without solving anything.
+
+    python -m pytest -q tests/test_pack_slurm_tasks.py
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+
+@pytest.fixture
+def packer(monkeypatch):
+    monkeypatch.delenv("SFST_RUN_LAYOUT", raising=False)
+    spec = importlib.util.spec_from_file_location("pack_slurm_tasks", REPO_ROOT / "scripts" / "pack_slurm_tasks.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+
+    def stub(eos, sigma, run_tag, extra=None, output_base=None):
+        return {"run_tag": run_tag, "eos": eos, "sigma": sigma, "seed": extra["seed"]}
+
+    monkeypatch.setattr(mod.scan_wrappers, "compute_tov_case", stub)
+    return mod
+
+
+def test_duplicate_points_in_one_pack_get_distinct_runs(tmp_path, packer):
+    # Seed replicates share a physics key, so they land in one pack and run within the same second.
+    params = tmp_path / "params.csv"
+    params.write_text("eos,g,Gamma,seed\nSLy,0,1e2,1\nSLy,0,1e2,2\nSLy,0,1e2,3\n", encoding="utf-8")
+    plan = packer.write_plan(params, tmp_path / "plan", target_minutes=60.0, safety=1.5, mem="12G",
+                             partition="standard", workdir=tmp_path)
+    assert len(plan["packs"]) == 1
+    assert plan["packs"][0]["points"] == [0, 1, 2]
+
+    assert packer.run_pack(tmp_path / "plan" / "plan.json", 0, "local") == 0
+
+    runs = sorted(Path(plan["output_base"]).glob("*/summary.json"))
+    assert len(runs) == 3
+    assert sorted(json.loads(p.read_text())["seed"] for p in runs) == [1, 2, 3]
+    assert sorted(p.parent.name.rsplit("_", 1)[1] for p in runs) == ["r1", "r2", "r3"]
+    metas = [p.parent.joinpath("meta.txt").read_text() for p in runs]
+    assert sorted(m.split("seed: ")[1].split()[0] for m in metas) == ["1", "2", "3"]
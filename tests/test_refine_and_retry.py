@@ -0,0 +1,80 @@
+"""Tests for the speculative mode of scripts/refine_and_retry_cli.py.
+
+Attempts run in forked child processes. I use a stub attempt whose outcome and duration depend
+on the level, and one real run of the default wrapper backend.
+
+    python -m pytest -q tests/test_refine_and_retry.py
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+import run_pack  # noqa: E402
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="needs fork")
+
+LEVELS = [(1.5, 1e-6), (2.0, 1e-7), (3.0, 1e-8)]
+
+
+@pytest.fixture
+def refine(tmp_path, monkeypatch):
+    monkeypatch.delenv("SFST_RUN_LAYOUT", raising=False)
+    monkeypatch.delenv("SFST_DUMMY", raising=False)
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location("refine_and_retry_cli", REPO_ROOT / "scripts" / "refine_and_retry_cli.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    monkeypatch.setattr(mod, "DIAG_BASE", tmp_path / "outputs" / "diagnostics")
+    return mod
+
+
+def _log(mod, rid):
+    return json.loads((mod.DIAG_BASE / rid / "refinement_log.json").read_text())
+
+
+def test_resolving_level_is_accepted_and_higher_levels_cancelled(refine):
+    mod = refine
+
+    def stub(eos, sigma, run_tag, extra, gf, nt, timeout):
+        # Level 1 fails fast, level 2 resolves after a moment, level 3 would run for a minute.
+        level = LEVELS.index((gf, nt)) + 1
+        time.sleep({1: 0.1, 2: 0.5, 3: 60.0}[level])
+        summary = {"converged": level >= 2, "max_epsratio": 0.02}
+        run_pack.write_run_file(mod.DIAG_BASE, run_tag, "summary.json", json.dumps(summary))
+
+    target = {"orig_run_id": "run0", "eos": "SLy", "sigma": 0.02, "extra": {}, "priority": 1.0}
+    t0 = time.time()
+    finals = mod.run_speculative([target], LEVELS, backend="wrapper", cores=3, timeout=120, wrapper_fn=stub, poll=0.05)
+    assert finals == {"run0": "RESOLVED"}
+    assert time.time() - t0 < 30
+
+    log = _log(mod, "run0")
+    assert sorted(e["attempt"] for e in log if e["status"] == "ATTEMPT_START") == [1, 2, 3]
+    results = {e["attempt"]: e["state"] for e in log if e["status"] == "ATTEMPT_RESULT"}
+    assert results == {1: "UNRESOLVED", 2: "RESOLVED"}
+    assert [e["attempt"] for e in log if e["status"] == "ATTEMPT_CANCELLED"] == [3]
+    assert (mod.DIAG_BASE / "run0_ref3_gf3.0_nt1e-08" / "diagnosis.txt").read_text().startswith("CANCELLED")
+    end = log[-1]
+    assert end["status"] == "END" and end["final_state"] == "RESOLVED" and end["accepted_attempt"] == 2
+
+
+def test_default_wrapper_solves_and_resolves(refine):
+    # No SFST_DUMMY: the default wrapper backend runs the real solve, so the cheapest level resolves.
+    mod = refine
+    target = {"orig_run_id": "run0", "eos": "SLy", "sigma": 0.02, "extra": {}, "priority": 1.0}
+    finals = mod.run_speculative([target], LEVELS, backend="wrapper", cores=3, timeout=600, poll=0.05)
+    assert finals == {"run0": "RESOLVED"}
+    assert "SFST_DUMMY" not in os.environ
+    summary = mod.parse_summary("run0_ref1_gf1.5_nt1e-06")
+    assert summary["converged"] is True
+    assert _log(mod, "run0")[-1]["accepted_attempt"] == 1
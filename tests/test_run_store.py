@@ -0,0 +1,50 @@
+"""Multi-process tests for run_store.py.
+
+I run concurrent write_table calls from forked processes against one temporary output
+directory, so the re-import / upsert / export sequence is exercised under real lock contention.
+
+    python -m pytest -q tests/test_run_store.py
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import run_store  # noqa: E402
+
+WRITERS = 8
+ROWS = 20
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="needs fork")
+
+
+def _writer(csv_path, w):
+    # One upsert per row, so the writers interleave inside the table rather than per batch.
+    for i in range(ROWS):
+        run_store.write_table(csv_path, [{"run_id": f"w{w}_r{i:02d}", "EOS": "SLy", "writer": w, "i": i}])
+
+
+def test_concurrent_writers_keep_every_row(tmp_path):
+    ctx = mp.get_context("fork")
+    csv_path = tmp_path / "audit_index.csv"
+    procs = [ctx.Process(target=_writer, args=(str(csv_path), w)) for w in range(WRITERS)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    expected = sorted(f"w{w}_r{i:02d}" for w in range(WRITERS) for i in range(ROWS))
+    df = run_store.read_table(csv_path)
+    assert len(df) == WRITERS * ROWS
+    assert sorted(df["run_id"]) == expected
+    exported = pd.read_csv(csv_path)
+    assert len(exported) == WRITERS * ROWS
+    assert sorted(exported["run_id"]) == expected
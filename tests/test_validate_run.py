@@ -0,0 +1,81 @@
+"""Tests for scripts/validate_run.py.
+
+classify_table is the vectorized gate that validate_run applies; classify_row is the row-by-row
+reference it must reproduce. I fuzz a run table with every kind of cell the gates see (finite
+values on both sides of each threshold, NaN, ±inf, None, numeric and non-numeric strings, budget
+markers) and compare the two, directly and after a CSV round trip.
+
+    python -m pytest -q tests/test_validate_run.py
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+spec = importlib.util.spec_from_file_location("validate_run", REPO_ROOT / "scripts" / "validate_run.py")
+validate_run = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(validate_run)
+
+N_ROWS = 2000
+
+
+def _cfg():
+    return yaml.safe_load((REPO_ROOT / "config" / "validate_config.yaml").read_text(encoding="utf-8"))
+
+
+def _fuzzed_table(cfg, n, seed=0):
+    rng = np.random.default_rng(seed)
+    # Finite values around every threshold (and exactly on them), then the pathological cells.
+    edges = [float(cfg[k]) for k in ("max_epsratio_interpretable", "max_epsratio_stress",
+                                     "wfaktor_max_threshold", "delta_total_threshold_pct")]
+    finite = edges + [0.0, -1.0, 0.05, 0.2, 1.0, 2.0, 12.0, 60.0, 1e3]
+    odd = [np.nan, np.inf, -np.inf, None, "nan", "inf", "-inf", "1e-2", " 0.25 "]
+    # classify_row itself raises on these in max_epsratio and wfaktor_max, so only the other fields get them.
+    unparseable = ["", "abc", "n/a"]
+
+    def cell(f, p_odd):
+        pool = odd if f in ("max_epsratio", "wfaktor_max") else odd + unparseable
+        return pool[rng.integers(len(pool))] if rng.random() < p_odd else finite[rng.integers(len(finite))]
+
+    rows = []
+    for _ in range(n):
+        # Mostly-clean rows as well as mostly-broken ones, so every status is well represented.
+        p_odd = (0.0, 0.05, 0.4)[rng.integers(3)]
+        row = {f: cell(f, p_odd) for f in validate_run.NUMERIC_FIELDS if rng.random() < 0.98}
+        for f in validate_run.BUDGET_STATUS_FIELDS:
+            if rng.random() < 0.2:
+                row[f] = ["ok", "budget_exceeded", " budget_exceeded ", None, np.nan, ""][rng.integers(6)]
+        if rng.random() < 0.5:
+            row["budget_resource"] = ["wall", "rhs", "", None, np.nan][rng.integers(5)]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _assert_same(df, cfg):
+    status, reasons = validate_run.classify_table(df, cfg)
+    expected = [validate_run.classify_row(r, cfg) for r in df.to_dict("records")]
+    assert list(status) == [s for s, _ in expected]
+    assert reasons == [r for _, r in expected]
+
+
+@pytest.mark.parametrize("tighten", [1.0, 0.5])
+def test_classify_table_matches_classify_row(tmp_path, tighten):
+    cfg = _cfg()
+    for k in ("max_epsratio_interpretable", "max_epsratio_stress", "wfaktor_max_threshold", "delta_total_threshold_pct"):
+        cfg[k] = float(cfg[k]) * tighten
+    df = _fuzzed_table(cfg, N_ROWS)
+    _assert_same(df, cfg)
+
+    # As validate_run reads it: through a CSV, with its own column dtypes.
+    df.to_csv(tmp_path / "runs_summary.csv", index=False)
+    _assert_same(pd.read_csv(tmp_path / "runs_summary.csv"), cfg)
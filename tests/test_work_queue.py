@@ -0,0 +1,148 @@
+"""Multi-process tests for work_queue.py.
+
+I run real work() loops in forked processes against a temporary queue, with solve_task replaced
+by a stub that never touches scan_wrappers, so the claim/lease/requeue logic is exercised exactly
+as it is on a shared filesystem, only faster (sub-second leases).
+
+    python -m pytest -q tests/test_work_queue.py
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing as mp
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import work_queue  # noqa: E402
+
+LEASE = 0.6
+POLL = 0.05
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="needs fork and SIGKILL")
+
+
+def _stub_solve(task, output_base=None):
+    """Stand-in for solve_task: log the call, sleep, then succeed or fail as the task asks."""
+    with open(Path(output_base) / "solves.log", "a", encoding="utf-8") as f:
+        f.write(f"{task['id']} {os.getpid()}\n")
+    time.sleep(task.get("sleep", 0.0))
+    if task.get("fail"):
+        raise RuntimeError("stub failure")
+    return {"run_tag": task["run_tag"], "ok": True}
+
+
+def _hang_solve(task, output_base=None):
+    time.sleep(3600)
+
+
+def _worker(root, name, max_attempts, hang=False):
+    work_queue.solve_task = _hang_solve if hang else _stub_solve
+    queue = work_queue.WorkQueue(root, lease=LEASE)
+    work_queue.work(queue, worker=name, max_attempts=max_attempts, poll=POLL, output_base=str(root))
+
+
+def _start(ctx, root, name, max_attempts=3, hang=False):
+    p = ctx.Process(target=_worker, args=(str(root), name, max_attempts, hang))
+    p.start()
+    return p
+
+
+def _wait_for(predicate, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _tasks(n, **fields):
+    return [{"id": f"t{i:02d}", "run_tag": f"t{i:02d}", **fields} for i in range(n)]
+
+
+@pytest.fixture
+def ctx():
+    return mp.get_context("fork")
+
+
+def test_killed_worker_task_is_requeued_and_every_task_completes_once(tmp_path, ctx):
+    queue = work_queue.WorkQueue(tmp_path, lease=LEASE)
+    assert queue.enqueue(_tasks(12, sleep=0.05)) == 12
+
+    # The victim claims first and hangs inside its solve, so its lease is live when it is killed.
+    victim = _start(ctx, tmp_path, "victim", hang=True)
+    assert _wait_for(lambda: any((tmp_path / "running").glob("*@victim.json")))
+    stolen = next((tmp_path / "running").glob("*@victim.json")).stem.split("@")[0]
+    workers = [_start(ctx, tmp_path, f"w{i}") for i in range(3)]
+    os.kill(victim.pid, signal.SIGKILL)
+    victim.join(5)
+
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 12, "failed": 0}
+    done = {p.stem: json.loads(p.read_text()) for p in (tmp_path / "done").glob("*.json")}
+    assert sorted(done) == [f"t{i:02d}" for i in range(12)]
+    assert all(rec["worker"] != "victim" for rec in done.values())
+
+    # Exactly once: the surviving workers solved every task once, the stolen one included (the
+    # victim's hanging stub does not log).
+    solves = [line.split()[0] for line in (tmp_path / "solves.log").read_text().splitlines()]
+    assert sorted(solves) == sorted(done)
+
+    # The stolen task came back through requeue_expired, with the expired lease on record.
+    rec = done[stolen]
+    assert rec["attempts"] == 1
+    assert [h["event"] for h in rec["history"]] == ["lease_expired"]
+    assert rec["history"][0]["worker"] == "victim"
+    assert rec["history"][0]["age_s"] > LEASE * 0.5
+
+
+def test_task_goes_to_failed_after_max_attempts(tmp_path, ctx):
+    queue = work_queue.WorkQueue(tmp_path, lease=LEASE)
+    queue.enqueue(_tasks(1, fail=True) + [{"id": "ok", "run_tag": "ok"}])
+
+    workers = [_start(ctx, tmp_path, f"w{i}", max_attempts=2) for i in range(2)]
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 1, "failed": 1}
+    failed = json.loads((tmp_path / "failed" / "t00.json").read_text())
+    assert failed["attempts"] == 2
+    assert [h["event"] for h in failed["history"]] == ["error", "error"]
+    assert failed["history"][-1]["error"] == "RuntimeError: stub failure"
+    solves = (tmp_path / "solves.log").read_text().split()
+    assert solves[::2].count("t00") == 2
+
+    # retry puts it back with a fresh attempt count.
+    assert queue.retry_failed() == 1
+    assert json.loads((tmp_path / "pending" / "t00.json").read_text())["attempts"] == 0
+
+
+def test_expired_lease_exhausts_attempts_into_failed(tmp_path, ctx):
+    queue = work_queue.WorkQueue(tmp_path, lease=LEASE)
+    queue.enqueue(_tasks(1))
+
+    # Every worker that claims the task is killed mid-solve; with max_attempts=2 the second
+    # expired lease sends it to failed/ instead of pending/.
+    for attempt in range(2):
+        victim = _start(ctx, tmp_path, f"victim{attempt}", max_attempts=2, hang=True)
+        assert _wait_for(lambda: any((tmp_path / "running").glob(f"*@victim{attempt}.json")))
+        os.kill(victim.pid, signal.SIGKILL)
+        victim.join(5)
+        time.sleep(LEASE * 1.5)
+        assert queue.requeue_expired(max_attempts=2) == 1
+
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 0, "failed": 1}
+    failed = json.loads((tmp_path / "failed" / "t00.json").read_text())
+    assert failed["attempts"] == 2
+    assert [h["worker"] for h in failed["history"]] == ["victim0", "victim1"]
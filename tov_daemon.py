@@ -0,0 +1,170 @@
+"""tov_daemon.py
+
+Opt-in resident solver daemon for run_tov.py.
+
+Slurm array tasks and refinement controllers call `python run_tov.py ...` once per point; most
+of such a call is spent importing numpy/scipy/pandas and rebuilding EOS closures. The daemon
+keeps all of that warm in one process (modules, EOS objects and their tables, the persistent
+star cache) and answers run requests over a Unix socket:
+
+    python run_tov.py --daemon                 # serve (foreground) on $SFST_TOV_SOCKET
+    python run_tov.py --connect --eos SLy ...  # ask the daemon; solve in-process if none is running
+
+Protocol: one JSON object per line in each direction.
+  {"op": "run", "eos", "sigma", "run_tag", "extra", "timeout", "output_base", "env"} -> compute_tov_case result
+  {"op": "ping"} -> {"ok": true, "pid", "served"}
+  {"op": "shutdown"} -> {"ok": true}
+Errors come back as {"error": "..."}. Requests are served one at a time, in arrival order.
+"env" carries the client's FORWARDED_ENV settings (run layout, container name, canonicalization,
+RHS budget); the daemon solves each run under the client's settings, not its own.
+
+This module only imports the standard library at top level, so clients stay fast.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import tempfile
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_SOCKET = os.getenv("SFST_TOV_SOCKET",
+                           os.path.join(tempfile.gettempdir(), f"sfst_tov_{os.getuid()}.sock"))
+# Settings that decide what and where a run writes; a run request carries the client's values.
+FORWARDED_ENV = ("SFST_RUN_LAYOUT", "SFST_PACK_NAME", "SFST_CANONICALIZE", "SFST_SCAN_BUDGET_RHS")
+
+
+def _send(conn: socket.socket, obj: Dict[str, Any]) -> None:
+    conn.sendall((json.dumps(obj) + "\n").encode("utf-8"))
+
+
+def _recv(conn: socket.socket) -> Optional[Dict[str, Any]]:
+    buf = b""
+    while not buf.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            return None
+        buf += chunk
+    return json.loads(buf.decode("utf-8"))
+
+
+def request(payload: Dict[str, Any], *, socket_path: str = DEFAULT_SOCKET, timeout: Optional[float] = None):
+    """Send one request to the daemon and return its reply.
+
+    Raises ConnectionError (FileNotFoundError / ConnectionRefusedError) when no daemon listens.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(socket_path)
+        _send(conn, payload)
+        reply = _recv(conn)
+    if reply is None:
+        raise ConnectionError("daemon closed the connection without a reply")
+    return reply
+
+
+def daemon_alive(socket_path: str = DEFAULT_SOCKET) -> bool:
+    try:
+        return bool(request({"op": "ping"}, socket_path=socket_path, timeout=5.0).get("ok"))
+    except (OSError, ValueError):
+        return False
+
+
+def run_via_daemon(eos: str, sigma: float, run_tag: Optional[str], extra: Dict[str, Any], timeout: int, *,
+                   socket_path: str = DEFAULT_SOCKET) -> Optional[Dict[str, Any]]:
+    """compute_tov_case through the daemon; None when no daemon answers (caller falls back).
+
+    Run directories are resolved against the caller's working directory, not the daemon's.
+    """
+    from scan_wrappers import OUTPUT_BASE, TIMEOUT_GRACE
+    payload = {"op": "run", "eos": eos, "sigma": float(sigma), "run_tag": run_tag, "extra": extra,
+               "timeout": int(timeout), "output_base": str(Path(OUTPUT_BASE).resolve()),
+               "env": {name: os.environ.get(name) for name in FORWARDED_ENV}}
+    try:
+        reply = request(payload, socket_path=socket_path, timeout=timeout + TIMEOUT_GRACE + 60)
+    except OSError:
+        # No daemon, or it dropped or timed out this request while serving others
+        # (ConnectionError, BrokenPipeError, socket.timeout): solve in-process instead.
+        return None
+    if "error" in reply and "run_id" not in reply:
+        raise RuntimeError(f"tov daemon: {reply['error']}")
+    return reply
+
+
+@contextmanager
+def _client_env(env: Dict[str, Optional[str]]):
+    """Apply a client's FORWARDED_ENV values (unset: the modules' defaults) for one request."""
+    import run_pack
+    import scan_wrappers
+    layout = env.get("SFST_RUN_LAYOUT") or "dirs"
+    settings = {(scan_wrappers, "RUN_LAYOUT"): layout, (run_pack, "LAYOUT"): layout,
+                (run_pack, "PACK_NAME"): env.get("SFST_PACK_NAME") or "runs",
+                (scan_wrappers, "CANONICALIZE"): (env.get("SFST_CANONICALIZE") or "1") != "0",
+                (scan_wrappers, "SCAN_BUDGET_RHS"): int(env.get("SFST_SCAN_BUDGET_RHS") or "0") or None}
+    saved = {key: getattr(*key) for key in settings}
+    try:
+        for (module, name), value in settings.items():
+            setattr(module, name, value)
+        yield
+    finally:
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET) -> None:
+    """Serve run requests on `socket_path` until a shutdown request (or SIGINT)."""
+    # Solve inline in this process (it is the warm worker) and keep the star cache on.
+    os.environ.setdefault("SFST_TOV_BACKEND", "inline")
+    os.environ.setdefault("SFST_CACHE", str(Path("outputs/.cache").resolve()))
+    import scan_wrappers
+    import sfst_qfis_repro
+    for name in sfst_qfis_repro.CANONICAL_EOS:  # warm the EOS objects
+        sfst_qfis_repro.canonical_eos(name)
+
+    if os.path.exists(socket_path):
+        if daemon_alive(socket_path):
+            raise RuntimeError(f"a tov daemon is already running on {socket_path}")
+        os.unlink(socket_path)  # stale socket from a daemon that did not shut down cleanly
+
+    served = 0
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        srv.bind(socket_path)
+        srv.listen(64)
+        print(f"tov daemon (pid {os.getpid()}) listening on {socket_path}", flush=True)
+        while True:
+            conn, _ = srv.accept()
+            with conn:
+                try:
+                    req = _recv(conn)
+                    if req is None:
+                        continue
+                    op = req.get("op")
+                    if op == "ping":
+                        _send(conn, {"ok": True, "pid": os.getpid(), "served": served})
+                    elif op == "shutdown":
+                        _send(conn, {"ok": True})
+                        return
+                    elif op == "run":
+                        with _client_env(req["env"]) if "env" in req else nullcontext():
+                            res = scan_wrappers.compute_tov_case(
+                                eos=req["eos"], sigma=float(req["sigma"]), run_tag=req.get("run_tag"),
+                                extra=req.get("extra") or {},
+                                timeout=int(req.get("timeout", scan_wrappers.DEFAULT_TIMEOUT)),
+                                output_base=Path(req["output_base"]) if req.get("output_base") else None)
+                        served += 1
+                        _send(conn, res)
+                    else:
+                        _send(conn, {"error": f"unknown op {op!r}"})
+                except Exception as e:  # one bad request must not take the resident daemon down
+                    try:
+                        _send(conn, {"error": f"{type(e).__name__}: {e}"})
+                    except OSError:
+                        pass
+    finally:
+        srv.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,358 @@
+"""work_queue.py
+
+Shared-filesystem work queue for multi-node scans (alternative to slurm/run_array.sbatch).
+
+Instead of one array task per params.csv row, I put every row into a queue directory on the
+shared filesystem and let any number of long-lived workers, on any nodes, pull points from it
+until it is empty. Cheap points no longer hold an allocation each, and expensive ones no longer
+stall a fixed slice of the array.
+
+    python work_queue.py enqueue slurm/params_example.csv    # rows: eos,g,Gamma,seed
+    python work_queue.py work                                 # run as many of these as you like
+    python work_queue.py status
+    python work_queue.py retry                                # failed/ -> pending/
+
+Layout of the queue directory ($SFST_QUEUE, default outputs/queue):
+  pending/<task>.json             waiting to be claimed
+  running/<task>@<worker>.json    claimed; the file's mtime is the worker's lease
+  done/<task>.json                task + compute_tov_case result
+  failed/<task>.json              gave up after --max-attempts
+
+Claiming is a single os.rename of pending/<task>.json into running/, which succeeds for exactly
+one worker. While a task runs, a heartbeat thread touches its running/ file every lease/4 seconds.
+Any worker that finds a running/ file older than the lease (its worker died, or its node went
+away) moves it back to pending/ with attempts + 1; that requeue is again a single rename, so only
+one worker performs it. Lease ages are measured against the shared filesystem's clock (the mtime
+of a freshly touched <queue>/.clock), not the local one, so clock skew between nodes does not
+expire leases. A worker that receives SIGTERM/SIGINT (e.g. at the Slurm time limit) hands its
+task back to pending/ without counting an attempt.
+
+Each task goes through scan_wrappers.compute_tov_case exactly as in run_array.sbatch
+(sigma = g^2/Gamma, extra = {g, Gamma, seed}); the run tag is the task id, so a requeued task
+rewrites the same run directory. Workers solve inline (SFST_TOV_BACKEND=inline), one point at a
+time; start one worker per core.
+
+This module only imports the standard library at top level; scan_wrappers is imported by the
+first worker that solves something.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import re
+import signal
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_QUEUE = os.getenv("SFST_QUEUE", "outputs/queue")
+DEFAULT_LEASE = float(os.getenv("SFST_QUEUE_LEASE", "120"))  # seconds without heartbeat before requeue
+STATES = ("pending", "running", "done", "failed")
+
+
+def _write_json_atomic(path: Path, obj: Any) -> None:
+    tmp = path.with_name(f".{path.name}.{socket.gethostname()}-{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(obj, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def task_id(index: int, eos: str, g: str, gamma: str, seed: str) -> str:
+    """Stable, filesystem-safe task id (also used as run tag) for one params.csv row."""
+    return re.sub(r"[^A-Za-z0-9._+-]", "-", f"{index:05d}_{eos}_g{g}_G{gamma}_s{seed}")
+
+
+class WorkQueue:
+    """A queue directory on a (possibly shared) filesystem. See the module docstring for the layout."""
+
+    def __init__(self, root=DEFAULT_QUEUE, lease: float = DEFAULT_LEASE):
+        self.root = Path(root)
+        self.lease = float(lease)
+        for state in STATES:
+            (self.root / state).mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, state: str) -> Path:
+        return self.root / state
+
+    def fs_now(self) -> float:
+        """Current time on the filesystem's clock (the mtime of a file touched just now)."""
+        clock = self.root / ".clock"
+        try:
+            os.utime(clock)
+        except FileNotFoundError:
+            clock.touch()
+        return clock.stat().st_mtime
+
+    # -- producers ---------------------------------------------------------------------------
+
+    def known_ids(self) -> set:
+        return {p.stem.split("@")[0] for state in STATES for p in self._dir(state).glob("*.json")}
+
+    def enqueue(self, tasks: List[Dict[str, Any]]) -> int:
+        """Add tasks (dicts with an "id") that are not in the queue yet; returns how many were added."""
+        known = self.known_ids()
+        added = 0
+        for task in tasks:
+            if task["id"] in known:
+                continue
+            _write_json_atomic(self._dir("pending") / f"{task['id']}.json", {"attempts": 0, "history": [], **task})
+            known.add(task["id"])
+            added += 1
+        return added
+
+    def retry_failed(self) -> int:
+        n = 0
+        for path in sorted(self._dir("failed").glob("*.json")):
+            task = _read_json(path)
+            if task is None:
+                continue
+            task["attempts"] = 0
+            _write_json_atomic(self._dir("pending") / path.name, task)
+            path.unlink()
+            n += 1
+        return n
+
+    # -- leases ------------------------------------------------------------------------------
+
+    def claim(self, worker: str) -> Optional[Path]:
+        """Claim one pending task; returns its running/ path, or None when nothing is pending."""
+        for path in sorted(self._dir("pending").glob("*.json")):
+            target = self._dir("running") / f"{path.stem}@{worker}.json"
+            try:
+                os.utime(path)  # the rename keeps the mtime: start the lease fresh
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue  # another worker was faster
+            return target
+        return None
+
+    def _release(self, running: Path, *, failed: bool, note: Dict[str, Any], max_attempts: int) -> Optional[str]:
+        """Move a running/ task back to pending/ (or to failed/); None if it is no longer ours."""
+        grabbed = running.with_name(running.name + ".release")
+        try:
+            os.rename(running, grabbed)
+        except FileNotFoundError:
+            return None
+        task = _read_json(grabbed) or {}
+        task["history"] = task.get("history", []) + [note]
+        if failed:
+            task["attempts"] = task.get("attempts", 0) + 1
+        state = "failed" if task.get("attempts", 0) >= max_attempts else "pending"
+        _write_json_atomic(self._dir(state) / f"{running.name.split('@')[0]}.json", task)
+        grabbed.unlink()
+        return state
+
+    def requeue_expired(self, *, max_attempts: int) -> int:
+        """Requeue running/ tasks whose lease has not been renewed within self.lease seconds."""
+        now = self.fs_now()
+        n = 0
+        for path in self._dir("running").iterdir():
+            try:
+                age = now - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age <= self.lease:
+                continue
+            if path.name.endswith(".release"):
+                # A release that died between its two renames: finish it.
+                released, path = path, path.with_name(path.name[:-len(".release")])
+                try:
+                    os.rename(released, path)
+                except FileNotFoundError:
+                    continue
+            worker = path.stem.split("@", 1)[-1]
+            state = self._release(path, failed=True, max_attempts=max_attempts,
+                                  note={"event": "lease_expired", "worker": worker, "age_s": round(age, 1)})
+            if state is not None:
+                n += 1
+                print(f"requeued {path.stem.split('@')[0]} (lease of {worker} expired {age:.0f}s ago) -> {state}",
+                      flush=True)
+        return n
+
+    def complete(self, running: Path, record: Dict[str, Any]) -> None:
+        _write_json_atomic(self._dir("done") / f"{running.name.split('@')[0]}.json", record)
+        try:
+            running.unlink()
+        except FileNotFoundError:
+            pass  # the lease had expired and the task was requeued; done/ wins when it is claimed again
+
+    def counts(self) -> Dict[str, int]:
+        return {state: sum(1 for p in self._dir(state).iterdir() if p.name.endswith(".json"))
+                for state in STATES}
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps one running/ lease alive; sets .lost when the file disappears (the task was requeued)."""
+
+    def __init__(self, path: Path, interval: float):
+        super().__init__(daemon=True)
+        self.path, self.interval = path, interval
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                self.lost = True
+                return
+            except OSError:
+                pass  # transient NFS hiccup; the next beat retries
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def solve_task(task: Dict[str, Any], output_base: Optional[str] = None) -> Dict[str, Any]:
+    import scan_wrappers
+    return scan_wrappers.compute_tov_case(eos=task["eos"], sigma=float(task["sigma"]), run_tag=task["run_tag"],
+                                          extra=task.get("extra") or {},
+                                          output_base=Path(output_base) if output_base else None)
+
+
+class _Interrupted(BaseException):
+    pass
+
+
+def _on_signal(signum, frame):
+    raise _Interrupted(signal.Signals(signum).name)
+
+
+def work(queue: WorkQueue, *, worker: Optional[str] = None, max_attempts: int = 3, poll: float = 10.0,
+         max_tasks: Optional[int] = None, wait: bool = True, output_base: Optional[str] = None) -> int:
+    """Claim and solve tasks until the queue is drained; returns the number of tasks this worker finished.
+
+    With wait=True a worker whose pending/ is empty keeps polling while other workers still hold
+    leases (their tasks may come back); it exits once pending/ and running/ are both empty.
+    """
+    os.environ.setdefault("SFST_TOV_BACKEND", "inline")
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, _on_signal)
+    finished = 0
+    print(f"worker {worker} on {queue.root} (lease {queue.lease:g}s)", flush=True)
+    while max_tasks is None or finished < max_tasks:
+        queue.requeue_expired(max_attempts=max_attempts)
+        running = queue.claim(worker)
+        if running is None:
+            counts = queue.counts()
+            if not wait or counts["running"] == 0:
+                break
+            time.sleep(poll)
+            continue
+
+        task = _read_json(running) or {}
+        tid = running.name.split("@")[0]
+        if (queue.root / "done" / f"{tid}.json").exists():
+            running.unlink()  # finished by a worker whose lease had expired; nothing left to do
+            continue
+
+        beat = _Heartbeat(running, max(queue.lease / 4.0, 0.05))
+        beat.start()
+        t0 = time.time()
+        try:
+            try:
+                result = solve_task(task, output_base)
+                error = result.get("error")
+            except Exception as e:  # keep the worker alive; the task is retried
+                result, error = None, f"{type(e).__name__}: {e}"
+        except _Interrupted as e:
+            beat.stop()
+            queue._release(running, failed=False, max_attempts=max_attempts,
+                           note={"event": "interrupted", "worker": worker, "signal": str(e)})
+            print(f"{tid}: {e}, handed back to pending/", flush=True)
+            raise SystemExit(128 + getattr(signal, str(e)).value)
+        beat.stop()
+        wall = time.time() - t0
+
+        if error:
+            state = queue._release(running, failed=True, max_attempts=max_attempts,
+                                   note={"event": "error", "worker": worker, "error": error, "wall_s": round(wall, 3)})
+            print(f"{tid}: error ({error}) -> {state}", flush=True)
+            continue
+        queue.complete(running, {**task, "worker": worker, "wall_s": wall, "lease_lost": beat.lost,
+                                 "finished_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                                 "result": result})
+        finished += 1
+        print(f"{tid}: done in {wall:.1f}s", flush=True)
+    print(f"worker {worker}: finished {finished} task(s)", flush=True)
+    return finished
+
+
+def tasks_from_params(path) -> List[Dict[str, Any]]:
+    """Queue tasks for a run_array.sbatch params file (header, then eos,g,Gamma,seed rows)."""
+    tasks = []
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.reader(f) if r and not r[0].startswith("#")]
+    for index, (eos, g, gamma, seed) in enumerate(rows[1:], start=1):
+        eos, g, gamma, seed = (s.strip() for s in (eos, g, gamma, seed))
+        tid = task_id(index, eos, g, gamma, seed)
+        tasks.append({"id": tid, "run_tag": tid, "eos": eos, "sigma": float(g) ** 2 / float(gamma),
+                      "extra": {"g": float(g), "Gamma": float(gamma), "seed": int(seed)}})
+    return tasks
+
+
+def print_status(queue: WorkQueue) -> None:
+    counts = queue.counts()
+    print("  ".join(f"{state}: {counts[state]}" for state in STATES))
+    now = queue.fs_now()
+    for path in sorted(queue.root.joinpath("running").glob("*.json")):
+        tid, _, worker = path.stem.partition("@")
+        age = now - path.stat().st_mtime
+        print(f"  running {tid} on {worker} (heartbeat {age:.0f}s ago{', EXPIRED' if age > queue.lease else ''})")
+    for path in sorted(queue.root.joinpath("failed").glob("*.json")):
+        task = _read_json(path) or {}
+        last = (task.get("history") or [{}])[-1]
+        print(f"  failed {path.stem}: {last.get('error') or last.get('event')}")
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Shared-filesystem work queue for compute_tov_case scans")
+    ap.add_argument("--queue", default=DEFAULT_QUEUE, help="Queue directory (default: $SFST_QUEUE or outputs/queue)")
+    ap.add_argument("--lease", type=float, default=DEFAULT_LEASE,
+                    help="Seconds without heartbeat before a claimed task is requeued (default: $SFST_QUEUE_LEASE or 120)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("enqueue", help="Add the rows of a params.csv (eos,g,Gamma,seed) to the queue")
+    p.add_argument("params", nargs="+")
+    p = sub.add_parser("work", help="Claim and solve tasks until the queue is drained")
+    p.add_argument("--worker", help="Worker name (default: <host>-<pid>)")
+    p.add_argument("--max-attempts", type=int, default=3, help="Failures/expired leases before a task goes to failed/")
+    p.add_argument("--max-tasks", type=int, help="Exit after this many finished tasks")
+    p.add_argument("--poll", type=float, default=10.0, help="Seconds between polls while others hold leases")
+    p.add_argument("--no-wait", dest="wait", action="store_false", help="Exit as soon as pending/ is empty")
+    p.add_argument("--output-base", help="Run directory base (default: scan_wrappers.OUTPUT_BASE)")
+    sub.add_parser("status", help="Counts per state, live leases and failures")
+    sub.add_parser("retry", help="Move failed tasks back to pending with their attempts reset")
+    args = ap.parse_args(argv)
+
+    queue = WorkQueue(args.queue, lease=args.lease)
+    if args.cmd == "enqueue":
+        tasks = [t for path in args.params for t in tasks_from_params(path)]
+        print(f"enqueued {queue.enqueue(tasks)} of {len(tasks)} task(s) into {queue.root}")
+    elif args.cmd == "work":
+        try:
+            work(queue, worker=args.worker, max_attempts=args.max_attempts, poll=args.poll,
+                 max_tasks=args.max_tasks, wait=args.wait, output_base=args.output_base)
+        except _Interrupted as e:  # between tasks: nothing is claimed, just stop
+            raise SystemExit(128 + getattr(signal, str(e)).value)
+    elif args.cmd == "status":
+        print_status(queue)
+    elif args.cmd == "retry":
+        print(f"moved {queue.retry_failed()} failed task(s) back to pending/")
+
+
+if __name__ == "__main__":
+    main()